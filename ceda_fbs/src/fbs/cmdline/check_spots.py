@@ -24,6 +24,7 @@ from collections import OrderedDict
 import hashlib
 
 import ceda_fbs.proc.common_util.util as util
+from ceda_fbs.proc.common_util.path_store import PathStore
 
 
 class IncompatibleIndexError(Exception):
@@ -210,12 +211,12 @@ class InaccurateSpot():
 
             all_records = self.get_all_records_in_spot()
 
-            deleted_files = set(all_records) - set(self.input_file_list)
+            deleted_files = PathStore(all_records) - self.input_file_list
 
             content_to_delete = []
             for file in deleted_files:
                 content_to_delete.append({
-                    'id': hashlib.sha1(file).hexdigest()
+                    'id': hashlib.sha1(file.encode('utf-8')).hexdigest()
                 })
 
             self.ES.delete_files(content_to_delete)
@@ -6,12 +6,18 @@ Creates the "ceda_all_datasets.ini" file that lists
 all "/data" directories under "/badc" and "/neodc"
 and other directories such as /edc.
 
+Also writes the precompiled snapshot of the spot mapping
+loaded by the scanning jobs, to the second argument or
+next to the output file.
+
 """
 
 import requests
 import os
 import sys
 
+from ceda_fbs.proc.common_util.spot_snapshot import read_spot_file, write_snapshot
+
 
 def use_data_dir(path):
     """
@@ -30,6 +36,7 @@ def use_data_dir(path):
     return path
 
 OUTPUT_FILE = sys.argv[1]
+SNAPSHOT_FILE = sys.argv[2] if len(sys.argv) > 2 else OUTPUT_FILE + ".snapshot"
 
 # Download the spot mappings from the cedaarchiveapp
 url = "http://cedaarchiveapp.ceda.ac.uk/cedaarchiveapp/fileset/download_conf/"
@@ -57,6 +64,5 @@ with open(OUTPUT_FILE,'w') as output:
     outputlist = map(lambda x: x+"\n", sorted(output_list))
     output.writelines(outputlist)
 
-
-
-
+print( "Writing snapshot to %s" % SNAPSHOT_FILE)
+write_snapshot(read_spot_file(OUTPUT_FILE), SNAPSHOT_FILE, OUTPUT_FILE)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+"""
+Stand-in for the SLURM sbatch command, running job arrays on the local host.
+
+Accepts the options used by LotusRunner and runs each task of the array
+with SLURM_ARRAY_TASK_ID set, at most throttle tasks at a time, before
+returning. Set sbatch in the [lotus] section of the configuration to this
+script to test submissions off LOTUS.
+
+Usage:
+  fake_sbatch.py [--parsable] [-p <queue>] [-t <time>] [--array=<indexes>]
+                 [-o <output>] [-e <error>] [--dependency=<dependency>]
+                 SCRIPT [ARGS ...]
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parse_array(indexes):
+    """
+    :param str indexes: Array indexes, e.g. "0-9%2" or "1,3,5"
+    :return: Tuple of (list of indexes, throttle or None)
+    """
+    throttle = None
+    if '%' in indexes:
+        indexes, throttle = indexes.split('%')
+        throttle = int(throttle)
+
+    task_ids = []
+    for part in indexes.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            task_ids.extend(range(int(first), int(last) + 1))
+        else:
+            task_ids.append(int(part))
+
+    return task_ids, throttle
+
+
+def run_task(job_id, task_id, script, args, output, error):
+    """
+    Run one task of the array, as SLURM would on a compute node.
+
+    :return: Exit code of the task
+    """
+    env = dict(os.environ,
+               SLURM_JOB_ID=str(job_id),
+               SLURM_ARRAY_JOB_ID=str(job_id),
+               SLURM_ARRAY_TASK_ID=str(task_id))
+
+    def log_path(pattern):
+        return pattern.replace('%A', str(job_id)).replace('%a', str(task_id)).replace('%j', str(job_id))
+
+    with open(log_path(output), 'w') as stdout, open(log_path(error), 'w') as stderr:
+        return subprocess.call(['bash', script] + args, env=env, stdout=stdout, stderr=stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run SLURM job arrays locally.')
+    parser.add_argument('--parsable', action='store_true')
+    parser.add_argument('-p', '--partition')
+    parser.add_argument('-t', '--time')
+    parser.add_argument('--array', default='0')
+    parser.add_argument('-o', '--output', default=os.devnull)
+    parser.add_argument('-e', '--error', default=os.devnull)
+    parser.add_argument('--dependency')
+    parser.add_argument('script')
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    options = parser.parse_args(argv)
+
+    job_id = os.getpid()
+    task_ids, throttle = parse_array(options.array)
+
+    # Dependencies are met already, as each array runs to completion before returning.
+    with ThreadPoolExecutor(max_workers=throttle or len(task_ids)) as executor:
+        exit_codes = list(executor.map(
+            lambda task_id: run_task(job_id, task_id, options.script, options.args, options.output, options.error),
+            task_ids
+        ))
+
+    failed = sum(1 for code in exit_codes if code)
+    if failed:
+        sys.stderr.write("{} of {} array tasks failed\n".format(failed, len(task_ids)))
+
+    print(job_id if options.parsable else "Submitted batch job {}".format(job_id))
+
+
+if __name__ == '__main__':
+    main()
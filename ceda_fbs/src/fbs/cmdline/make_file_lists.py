@@ -8,6 +8,7 @@ Usage:
                      (-m <location> | --make-list <location>)
                      (--host <hostname>)
                      [--followlinks]
+                     [--compact]
 
 Options:
   -h --help                                  Show this screen.
@@ -25,15 +26,20 @@ Options:
                                              the script will run.
 
   --followlinks                              Follow symlinks in the os walk
+
+  --compact                                  Store the lists in the compact
+                                             binary format (.fbl) instead
+                                             of text.
  """
 
 import os
+import sys
 
 from docopt import docopt
 import datetime
-import subprocess
 
 import ceda_fbs.proc.common_util.util as util
+import ceda_fbs.proc.common_util.file_list as file_lists
 import ceda_fbs.proc.constants.constants as constants
 from ceda_fbs import __version__
 
@@ -69,6 +75,8 @@ def get_stat_and_defs(com_args):
 def store_datasets_to_files(status, config, host):
     """
     Finds and stores all files belonging to each dataset.
+
+    Returns the exit code of each command run on localhost.
     """
 
     # Get file.
@@ -78,12 +86,13 @@ def store_datasets_to_files(status, config, host):
     datasets = util.find_dataset(filename, "all")
     scan_commands = []
     directory_to_save_files = config["make-list"]
+    extension = file_lists.COMPACT_EXTENSION if config['compact'] else ".txt"
 
     # Create the commands that will create the
     # files containing the paths to data files.
     for dataset in datasets:
 
-        command = f"{SCRIPT_DIR}/scan_dataset.py -f {filename} -d  {dataset} --make-list {os.path.join(directory_to_save_files, dataset)}.txt" \
+        command = f"{SCRIPT_DIR}/scan_dataset.py -f {filename} -d  {dataset} --make-list {os.path.join(directory_to_save_files, dataset)}{extension}" \
                   " -c $BASEDIR/ceda-fbs/python/config/ceda_fbs.ini"
 
 
@@ -91,20 +100,20 @@ def store_datasets_to_files(status, config, host):
         if config['followlinks']:
             command += ' --followlinks'
 
-        # If using localhost, execute script immediately
-        if host == 'localhost':
-            print(f"Executing: {command}")
-            subprocess.call(command, shell=True)
+        scan_commands.append(command)
 
-        # Otherwise append to list
-        else:
-            scan_commands.append(command)
+    # Execute commands in parallel on localhost
+    if host == 'localhost':
+        local_runner = util.get_local_runner(config)
+        return local_runner.run_tasks(scan_commands)
 
     # Execute commands on lotus
-    if host == 'lotus':
-        lotus_runner = util.LotusRunner(queue='short-serial')
+    elif host == 'lotus':
+        lotus_runner = util.get_lotus_runner(config, queue='short-serial')
         lotus_runner.run_tasks_in_lotus(scan_commands)
 
+    return []
+
 
 def main():
     """
@@ -124,13 +133,16 @@ def main():
     config = status_and_defaults[0]
 
     if status == constants.Script_status.RUN_SCRIPT_IN_LOCALHOST:
-        store_datasets_to_files(status, config, 'localhost')
+        exit_codes = store_datasets_to_files(status, config, 'localhost')
     else:
-        store_datasets_to_files(status, config, 'lotus')
+        exit_codes = store_datasets_to_files(status, config, 'lotus')
 
     end = datetime.datetime.now()
     print(f"Script ended at : {end} it ran for : {end-start}")
 
+    if any(exit_codes):
+        sys.exit(1)
+
 
 if __name__ == '__main__':
     main()
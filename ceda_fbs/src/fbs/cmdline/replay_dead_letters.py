@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+"""
+Usage:
+  replay_dead_letters.py -h | --help
+  replay_dead_letters.py --version
+  replay_dead_letters.py (-f <filename> | --filename <filename>)
+                         [-i <index> | --index <index>]
+                         [-c <path_to_config_dir> | --config <path_to_config_dir>]
+
+Options:
+  -h --help                           Show this screen.
+
+  --version                           Show version.
+
+  -f --filename=<filename>            Dead-letter file written by scan_dataset.py.
+
+  -i --index=<index>                  Send the documents to this index instead
+                                      of the one they were created for.
+
+  -c --config=<path_to_config_dir>    Specify the main configuration directory.
+ """
+
+import os
+import datetime
+from docopt import docopt
+
+import ceda_fbs.proc.common_util.util as util
+from ceda_fbs import __version__
+from ceda_fbs.es_iface.factory import ElasticsearchClientFactory
+from ceda_fbs.es_iface.bulk_sender import BulkSender
+from ceda_fbs.es_iface.flow_control import FlowController
+from ceda_fbs.es_iface.dead_letter import DeadLetterFile, read_dead_letters
+
+
+def get_config(com_args):
+
+    """
+    Read the configuration file and apply the command line arguments.
+    """
+
+    if 'config' not in com_args or not com_args["config"]:
+        direc = os.path.dirname(__file__)
+        conf_path = os.path.join(direc, "../../../config/ceda_fbs.ini")
+        com_args["config"] = conf_path
+
+    return util.get_settings(com_args["config"], com_args)
+
+
+def replay_dead_letters(config):
+
+    """
+    Send the documents in the dead-letter file to elasticsearch again.
+    Documents which still fail are kept in the dead-letter file with
+    their new error, the file is removed once all have been indexed.
+    """
+
+    filename = config["filename"]
+    index_name = config.get("index")
+    es_conf = config["es-configuration"]
+
+    es = ElasticsearchClientFactory().get_client(config)
+    flow_controller = FlowController(max_chunk_bytes=es_conf.get("bulk-max-chunk-bytes", 20 * 1024 ** 2),
+                                     max_retries=int(es_conf.get("bulk-max-retries", 8)))
+    sender = BulkSender(es,
+                        threads=es_conf.get("bulk-threads", 4),
+                        chunk_size=es_conf.get("bulk-chunk-size", 500),
+                        flow_controller=flow_controller)
+
+    def actions():
+        for action, _ in read_dead_letters(filename):
+            if index_name:
+                action["_index"] = index_name
+            yield action
+
+    indexed = 0
+    tmp_filename = filename + ".tmp"
+
+    # Replace any file left by an earlier replay which did not finish.
+    with DeadLetterFile(tmp_filename, serializer=es.transport.serializer, mode='w') as dead_letters:
+        for ok, action, result in sender.send(actions()):
+            if ok:
+                indexed += 1
+            else:
+                dead_letters.write(action, result)
+
+    failed = dead_letters.count
+
+    if failed:
+        os.replace(tmp_filename, filename)
+    else:
+        os.remove(filename)
+
+    print("Documents indexed: {}, documents still failing: {}".format(indexed, failed))
+
+
+def main():
+
+    # Get command line arguments.
+    com_args = util.sanitise_args(docopt(__doc__, version=__version__))
+    config = get_config(com_args)
+
+    start = datetime.datetime.now()
+    print("Script started at: {}".format(start))
+
+    replay_dead_letters(config)
+
+    end = datetime.datetime.now()
+    print("Script ended at : {} it ran for : {}".format(end, end - start))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -5,6 +5,8 @@ Usage:
   run_commands_in_lotus.py --help
   run_commands_in_lotus.py --version
   run_commands_in_lotus.py (-f <filename> | --filename <filename>)
+                           [-t <throttle> | --throttle <throttle>]
+                           [-c <path_to_config_dir> | --config <path_to_config_dir>]
 
 Options:
   --help                                     Show this screen.
@@ -12,10 +14,15 @@ Options:
   -f --filename=<filename>                   File from where the dataset
                                              will be read
                                              [default: datasets.ini].
+  -t --throttle=<throttle>                   Maximum number of commands
+                                             running at the same time.
+  -c --config=<path_to_config_dir>           Specify the main
+                                             configuration directory.
 """
 
 from docopt import docopt
 import datetime
+import os
 
 import ceda_fbs.proc.common_util.util as util
 from ceda_fbs import __version__
@@ -31,7 +38,17 @@ def main():
     com_args = util.sanitise_args(docopt(__doc__, version=__version__))
     commands_file = com_args["filename"]
 
-    lotus_runner = util.LotusRunner(queue='short-serial')
+    # Searches for the configuration file.
+    if not com_args.get("config"):
+        direc = os.path.dirname(__file__)
+        com_args["config"] = os.path.join(direc, "../../../config/ceda_fbs.ini")
+
+    config = util.get_settings(com_args["config"], com_args)
+
+    if com_args.get("throttle"):
+        config.setdefault("lotus", {})["array-throttle"] = com_args["throttle"]
+
+    lotus_runner = util.get_lotus_runner(config, queue='short-serial')
     lotus_runner.run_tasks_file_in_lotus(commands_file)
 
     end = datetime.datetime.now()
@@ -35,13 +35,14 @@ Options:
  """
 
 import os
-import six
+import sys
 import datetime
 import subprocess
 from tqdm import tqdm
 from docopt import docopt
 
 import ceda_fbs.proc.common_util.util as util
+from ceda_fbs.proc.common_util.job_planner import JobPlanner
 import ceda_fbs.proc.constants.constants as constants
 from ceda_fbs import __version__  # Grab version from package __init__.py
 
@@ -118,7 +119,7 @@ def read_and_scan_datasets_in_lotus(config):
         print( "created command: " + command)
         commands.append(command)
 
-    lotus_runner = util.LotusRunner(queue='short-serial')
+    lotus_runner = util.get_lotus_runner(config, queue='short-serial')
     lotus_runner.run_tasks_in_lotus(commands)
 
 
@@ -135,6 +136,38 @@ def read_and_scan_datasets_sub_in_lotus(config):
         subprocess.call(command, shell=True)
 
 
+def get_job_planner(config, calculate_md5=False):
+    """
+    Create the planner splitting the file lists into jobs of similar expected runtime.
+    The jobs are capped at num-files files.
+    """
+    scanning = config["scanning"]
+
+    return JobPlanner(config["level"],
+                      target_cost=scanning.get("job-cost", 14400),
+                      max_files=int(config["num-files"]),
+                      calculate_md5=calculate_md5,
+                      timings_file=scanning.get("timings-file"),
+                      threads=int(scanning.get("walk-threads", 16)))
+
+
+def plan_scan_jobs(filename, planner):
+    """
+    :param filename: Path to a file list
+    :param planner: JobPlanner
+    :return: List of (start, num_files, cost) tuples for the jobs scanning the list
+    """
+    jobs = planner.plan(filename)
+
+    if not jobs:
+        return []
+
+    print("{}: {} files in {} jobs, longest expected {:.0f}s".format(
+        filename, sum(num_files for _, num_files, _ in jobs), len(jobs), max(cost for _, _, cost in jobs)))
+
+    return jobs
+
+
 def read_datasets_from_files_and_scan_in_lotus(config):
 
     """
@@ -142,8 +175,8 @@ def read_datasets_from_files_and_scan_in_lotus(config):
 
     1. Go to the directory containing the files.
     2. Create a file list.
-    3. Scan each file and determine the number of lines contained.
-    4. create the appropriate commands.
+    3. Estimate the time to scan each file in each list.
+    4. Split the lists into jobs of similar expected runtime.
     5. Store commands in a list.
     6. Go to the next file.
     7. Submit all commands in lotus.
@@ -152,36 +185,18 @@ def read_datasets_from_files_and_scan_in_lotus(config):
     #Get basic options.
     file_paths_dir = config["file-paths-dir"]
     level = config["level"]
-    num_files = config["num-files"]
-    start = config["start"]
-
+    planner = get_job_planner(config, calculate_md5=True)
 
     # Go to directory and create the file list.
     list_of_cache_files = sorted(util.build_file_list(file_paths_dir))
     commands = []
-    step = int(num_files)
 
     for filename in tqdm(list_of_cache_files):
-        num_of_lines = util.find_num_lines_in_file(filename)
-
-        if num_of_lines == 0:
-            continue
-
-        # Calculate number of jobs.
-        number_of_jobs = num_of_lines / int(num_files)
-        remainder = num_of_lines % int(num_files)
-
-        start = 0
-        for i in range(int(number_of_jobs)):
-            _add_scan_cmd_to_list(filename, step, start, level, commands)
-            start += step
-
-        # Include remaining files
-        if remainder > 0:
-            _add_scan_cmd_to_list(filename, remainder, start, level, commands)
+        for start, num_files, _ in plan_scan_jobs(filename, planner):
+            _add_scan_cmd_to_list(filename, num_files, start, level, commands)
 
     # Write each command to a file - which can then be issued to LOTUS
-    util.write_list_to_file(commands, "lotus_commands.txt")
+    util.write_list_to_file(commands, "lotus_commands.txt", index=False)
 
 
 def _add_scan_cmd_to_list(filename, num_files, start, level, commands_list):
@@ -212,86 +227,58 @@ def read_datasets_from_files_and_scan_in_localhost(config):
     #Get basic options.
     file_paths_dir = config["file-paths-dir"]
     level = config["level"]
-    num_files = config["num-files"]
-    start = config["start"]
+    planner = get_job_planner(config)
 
     #Go to directory and create the file list.
     list_of_cache_files = util.build_file_list(file_paths_dir)
     commands = []
-    step = int(num_files)
 
     for filename in list_of_cache_files:
-
-        num_of_lines = util.find_num_lines_in_file(filename)
-
-        if num_of_lines == 0: continue
-
-        #calculate number of jobs.
-        number_of_tasks = num_of_lines  / int(num_files)
-        remainder = num_of_lines  % int(num_files)
-
-        start = 0
-        for i in range(0, number_of_tasks):
-            command = " python %s/scan_dataset.py -f %s --num-files %s  --start %d  -l %s" \
-                        % (SCRIPT_DIR, filename, num_files, start, level)
-            start += step
-            commands.append(command)
-
-        #include remaining files
-        if remainder > 0:
+        for start, num_files, _ in plan_scan_jobs(filename, planner):
             command = "python %s/scan_dataset.py -f %s --num-files %d  --start %d -l %s" \
-                      % (SCRIPT_DIR, filename, remainder, start, level)
+                      % (SCRIPT_DIR, filename, num_files, start, level)
             commands.append(command)
 
-    # Run each command in localhost.
-    number_of_commands = len(commands)
-    for i in range(0, number_of_commands):
-        print( "Executing command : %s" %(commands[i]))
-        subprocess.call(commands[i], shell=True)
+    # Run the commands in parallel in localhost.
+    local_runner = util.get_local_runner(config)
+    return local_runner.run_tasks(commands)
 
 def scan_datasets_in_localhost(config, scan_status):
 
     """
     Uses localhost in order to scan files in the filesystem.
+
+    Returns the exit code of each scan.
     """
 
     #Get basic options.
     file_paths_dir = config["file-paths-dir"]
     level = config["level"]
+    commands = []
 
     # Manage the options given.
     if scan_status == constants.Script_status.READ_AND_SCAN_DATASETS_SUB:
-        dataset_id = config["dataset"]
-        if ',' in dataset_id:
-            dataset_ids_list = dataset_id.split(",")
-            for dataset_id_item in dataset_ids_list:
-                command = "python %s/scan_dataset.py -f %s -d %s -l %s"\
-                          % (SCRIPT_DIR, filename, dataset_id_item, level)
-
-
-                print( "executng : %s" %(command))
-                subprocess.call(command, shell=True)
-        else:
+        for dataset_id in config["dataset"].split(","):
             command = "python %s/scan_dataset.py -f %s -d %s -l %s" \
-                      % (SCRIPT_DIR, filename, dataset_id, level)
-
-
-            print( "executng : %s"  %(command))
-            subprocess.call(command, shell=True)
+                      % (SCRIPT_DIR, file_paths_dir, dataset_id, level)
+            commands.append(command)
 
     elif scan_status == constants.Script_status.READ_AND_SCAN_DATASETS:
         dataset_ids = util.find_dataset(file_paths_dir, "all")
 
-        for key, value in six.iteritems(dataset_ids):
-            dataset_id = key
+        for dataset_id in dataset_ids:
             command = "python %s/scan_dataset.py -f %s -d  %s -l %s"\
-                        % (SCRIPT_DIR, filename, dataset_id, level)
-
-            print( "executng : %s" %(command))
-            subprocess.call(command, shell=True)
+                        % (SCRIPT_DIR, file_paths_dir, dataset_id, level)
+            commands.append(command)
 
     elif scan_status == constants.Script_status.READ_DATASET_FROM_FILE_AND_SCAN:
-        read_datasets_from_files_and_scan_in_localhost(config)
+        return read_datasets_from_files_and_scan_in_localhost(config)
+
+    if commands:
+        local_runner = util.get_local_runner(config)
+        return local_runner.run_tasks(commands)
+
+    return []
 
 
 def main():
@@ -312,11 +299,12 @@ def main():
     config_file, run_status, scan_status = status_and_defaults[0:3]
 
     #Calls appropriate functions.
+    exit_codes = []
     if run_status == constants.Script_status.RUN_SCRIPT_IN_LOTUS:
         scan_datasets_in_lotus(config_file, scan_status)
 
     elif run_status == constants.Script_status.RUN_SCRIPT_IN_LOCALHOST:
-        scan_datasets_in_localhost(config_file, scan_status)
+        exit_codes = scan_datasets_in_localhost(config_file, scan_status)
 
     else:
         print( "Some options could not be recognized.\n")
@@ -327,6 +315,9 @@ def main():
           % (str(end), str(end - start)))
     print( "===============================")
 
+    if any(exit_codes):
+        sys.exit(1)
+
 
 if __name__ == '__main__':
     main()
@@ -8,16 +8,25 @@ Usage:
                   (-d <dataset_id> | --dataset <dataset_id> )
                   (-l <level> | --level <level>)
                   [-c <path_to_config_dir> | --config <path_to_config_dir>]
+                  [-w <workers> | --workers <workers>]
+                  [--state-file <state_file>]
+                  [--changed-only]
+                  [--file-timeout <seconds>]
   scan_dataset.py (-f <filename> | --filename <filename>)
                   (-d <dataset_id> | --dataset <dataset_id>)
                   (-m <location> | --make-list <location>)
                   [-c <path_to_config_dir> | --config <path_to_config_dir>]
+                  [--followlinks]
   scan_dataset.py (-f <filename> | --filename <filename>)
                   [-n <n_files> | --num-files <n_files>]
                   [-s <start_number> | --start <start_number>]
                   (-l <level> | --level <level>)
                   [-i <index> | --index <index>]
                   [-c <path_to_config_dir> | --config <path_to_config_dir>]
+                  [-w <workers> | --workers <workers>]
+                  [--state-file <state_file>]
+                  [--changed-only]
+                  [--file-timeout <seconds>]
                   [--calculate_md5 ]
 
 Options:
@@ -39,6 +48,8 @@ Options:
 
   -m --make-list=<location>           Stores the list of filenames to a file.
 
+  --followlinks                       Walk into symbolic links to directories.
+
   -c --config=<path_to_config_dir>    Specify the main configuration directory.
 
   -n --num-files=<n_files>            Number of files to scan.
@@ -48,47 +59,60 @@ Options:
 
   -i --index=<index>                  The index to update
 
+  -w --workers=<workers>              Number of processes used to extract
+                                      metadata from the files.
+
+  --state-file=<state_file>           Scan incrementally, skipping files which
+                                      have not changed since they were recorded
+                                      in this scan state database.
+
+  --changed-only                      Only extract files whose size or
+                                      modification time differ from the
+                                      document already in the index.
+
+  --file-timeout=<seconds>            Run the file handlers in supervised
+                                      processes and give up on a file after
+                                      this many seconds. Files which time out
+                                      or crash a handler are quarantined and
+                                      indexed at level 1.
+
   --calculate-md5                     Calculate md5 checksums on scan
  """
 
 import os
-import getpass
 import signal
-import pwd
 import datetime
 from docopt import docopt
 
 import ceda_fbs.proc.common_util.util as util
 import ceda_fbs.proc.constants.constants as constants
 from ceda_fbs import __version__  # Grab version from package __init__.py
-from ceda_fbs.proc.extract import ExtractSeq
+from ceda_fbs.proc.extract import ExtractSeq, ExtractParallel
+
+
+# Extractor currently scanning, stopped gracefully by sig_handler.
+active_extractor = None
+stop_signal = None
 
 
 def sig_handler(signum, frame):
 
     """
-    Catches SIGTERM, SIGINT, SIGHUP signals
-    cleans tmp directoy 
-    and terminates the process.
+    Catches SIGTERM, SIGINT, SIGHUP signals.
+    When a scan is running, the files waiting to be scanned are dropped, the
+    bulk requests already sent are completed and a checkpoint is written
+    before the process terminates, so the next run carries on from the files
+    dropped. A second signal terminates the process straight away.
     """
 
-    script_user = getpass.getuser()
-    tmp_dir_files = util.build_file_list("/tmp")
-    print( "Signal {} received deleting tmp files:".format(signum))
-    for filename in tmp_dir_files:
+    global stop_signal
 
-        try:
-            stat_info = os.stat(filename)
-            uid = stat_info.st_uid
-            file_owner = pwd.getpwuid(uid)[0]
+    if active_extractor is None or stop_signal is not None:
+        raise SystemExit(signum)
 
-            if script_user == file_owner:
-                print( filename)
-                os.remove(filename)
-        except:
-            pass
-
-    raise SystemExit(signum)
+    print( "Signal {} received, finishing the bulk requests in progress.".format(signum))
+    stop_signal = signum
+    active_extractor.request_stop()
 
 # Associate the handler with signals:
 signal.signal(signal.SIGTERM, sig_handler)
@@ -110,14 +134,45 @@ def ckeck_com_args_validity(config, status):
         raise ValueError("Level value is out of range, please \
                           use value between 1-3.")
 
+    if int(config.get("workers")) < 1:
+        raise ValueError("Number of workers must be at least 1.")
+
+def get_extractor(conf):
+
+    """
+    Returns the extractor matching the number of workers requested.
+    """
+
+    if int(conf["workers"]) > 1:
+        return ExtractParallel(conf)
+
+    return ExtractSeq(conf)
+
+def run_extractor(extract, scan):
+
+    """
+    Runs the scan, letting sig_handler stop the extractor gracefully.
+    """
+
+    global active_extractor
+
+    active_extractor = extract
+    try:
+        scan()
+    finally:
+        active_extractor = None
+
+    if stop_signal is not None:
+        raise SystemExit(stop_signal)
+
 def read_and_scan_dataset(conf, status):
 
     """
     Reads files from a specific directory in filesystem
     and outputs metadata to elastic search database.
     """
-    extract = ExtractSeq(conf)
-    extract.read_and_scan_dataset()
+    extract = get_extractor(conf)
+    run_extractor(extract, extract.read_and_scan_dataset)
 
 def store_dataset_to_file(conf, status):
 
@@ -136,8 +191,8 @@ def read_dataset_from_file_and_scan(conf, status):
     for each file and posts results to elastic search.
     """
 
-    extract = ExtractSeq(conf)
-    extract.read_dataset_from_file_and_scan()
+    extract = get_extractor(conf)
+    run_extractor(extract, extract.read_dataset_from_file_and_scan)
 
 def get_stat_and_defs(com_args):
 
@@ -164,6 +219,15 @@ def get_stat_and_defs(com_args):
     if "num-files" not in config or not config["num-files"]:
         config["num-files"] = config["scanning"]["num-files"]
 
+    if "workers" not in config or not config["workers"]:
+        config["workers"] = config["scanning"].get("workers", 1)
+
+    if "file-timeout" not in config and config["scanning"].get("file-timeout"):
+        config["file-timeout"] = config["scanning"]["file-timeout"]
+
+    if "state-file" not in config and config["scanning"].get("state-file"):
+        config["state-file"] = config["scanning"]["state-file"]
+
     status_and_defaults.append(config)
 
     if ("make-list" in config) and ("dataset" in config) and ("filename" in config):
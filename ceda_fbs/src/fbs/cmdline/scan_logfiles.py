@@ -49,15 +49,22 @@ def parse_logs(com_args):
             properties_errors = int(words_list[3].split()[3])
             total_files = int(words_list[4].split()[3])
 
+            # Only logged by scans which can skip unchanged files.
+            unchanged = 0
+            if len(words_list) > 5:
+                unchanged = int(words_list[5].split()[3])
+
             if dataset in summary_info:
                 info = summary_info[dataset] 
                 info["indexed"] += indexed
                 info["database_errors"] += database_errors
                 info["properties_errors"] += properties_errors
+                info["unchanged"] += unchanged
             else:
                 summary_info[dataset] = {"indexed": indexed,
                                          "database_errors": database_errors,
                                          "properties_errors": properties_errors,
+                                         "unchanged": unchanged,
                                          "total_files": total_files}
 
     return summary_info
@@ -72,7 +79,8 @@ def validate_results(dict_data):
     for item in dict_data:
         dataset_info = {}
         dataset_info = dict_data[item]
-        indexed_and_errors = dataset_info["indexed"] + dataset_info["database_errors"] + dataset_info["properties_errors"] 
+        indexed_and_errors = dataset_info["indexed"] + dataset_info["database_errors"] + dataset_info["properties_errors"] \
+                             + dataset_info["unchanged"]
         if dataset_info["total_files"] == indexed_and_errors:
             dataset_info["status"] = "ok"
         else:
@@ -0,0 +1,158 @@
+"""
+Bulk indexing with several requests in flight.
+"""
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from elasticsearch.exceptions import TransportError
+
+from .flow_control import FlowController
+
+
+class BulkSender(object):
+    """
+    Sends actions to elasticsearch in bulk requests using a pool of threads,
+    so the caller can carry on producing actions while earlier chunks are
+    on the network. The result of every action is returned, in the order
+    the actions were given.
+
+    Chunks are sized by payload bytes using a FlowController. Requests
+    which fail because the cluster is overloaded or briefly unavailable
+    are retried after a backoff, up to the retry limit of the controller.
+    Actions which still fail are reported to the caller, never raised.
+
+    :param es: Elasticsearch client
+    :param int threads: Maximum number of bulk requests in flight
+    :param int chunk_size: Maximum number of actions sent in each bulk request
+    :param FlowController flow_controller: Flow control shared by the requests
+    """
+
+    def __init__(self, es, threads=4, chunk_size=500, flow_controller=None):
+        self.es = es
+        self.threads = int(threads)
+        self.chunk_size = int(chunk_size)
+        self.flow = flow_controller or FlowController()
+
+    def _chunk_actions(self, actions):
+        """
+        Serialise the actions and group them into chunks no bigger than the
+        current chunk size in bytes set by the flow controller.
+
+        :param actions: Iterable of (key, action) tuples
+        :return: Generator of lists of (key, action, serialised action) tuples
+        """
+        serializer = self.es.transport.serializer
+        chunk = []
+        chunk_bytes = 0
+
+        for key, action in actions:
+            data = serializer.dumps({'index': {'_index': action['_index'], '_id': action['_id']}}) + '\n' \
+                   + serializer.dumps(action['_source']) + '\n'
+            size = len(data.encode('utf-8'))
+
+            if chunk and (chunk_bytes + size > self.flow.chunk_bytes or len(chunk) >= self.chunk_size):
+                yield chunk
+                chunk = []
+                chunk_bytes = 0
+
+            chunk.append((key, action, data))
+            chunk_bytes += size
+
+        if chunk:
+            yield chunk
+
+    def _send_chunk(self, chunk):
+        """
+        Send one bulk request, retrying the actions which failed with a
+        rejection or a transient error.
+
+        :param chunk: List of (key, action, serialised action) tuples
+        :return: List of item results matching the chunk
+        """
+        results = [None] * len(chunk)
+        to_send = list(range(len(chunk)))
+
+        for attempt in range(self.flow.max_retries + 1):
+            self.flow.wait()
+            start = time.monotonic()
+
+            try:
+                response = self.es.bulk(body=''.join(chunk[i][2] for i in to_send))
+            except TransportError as ex:
+                if not self.flow.should_retry_exception(ex):
+                    raise
+
+                for i in to_send:
+                    results[i] = {'status': ex.status_code, 'error': str(ex)}
+
+                self.flow.on_rejected()
+                continue
+
+            self.flow.on_success(time.monotonic() - start)
+
+            failed = []
+            for i, item in zip(to_send, response['items']):
+                results[i] = item.get('index', item)
+
+                if self.flow.should_retry(results[i].get('status'), results[i].get('error')):
+                    failed.append(i)
+
+            if not failed:
+                break
+
+            self.flow.on_rejected()
+            to_send = failed
+
+        return results
+
+    @staticmethod
+    def _collect(chunk, future):
+        """
+        Match the item results of a finished request to its actions.
+
+        :return: Generator of (ok, key, action, result) tuples
+        """
+        try:
+            results = future.result()
+        except Exception as ex:
+            # The whole request failed, report the error against each action.
+            results = [{'status': getattr(ex, 'status_code', None), 'error': str(ex)}] * len(chunk)
+
+        for (key, action, _), result in zip(chunk, results):
+            status = result.get('status')
+            yield isinstance(status, int) and 200 <= status < 300, key, action, result
+
+    def send(self, actions):
+        """
+        Index the actions and report the result for each of them.
+
+        :param actions: Iterable of actions with _index, _id and _source keys
+        :return: Generator of (ok, action, result) tuples in action order
+        """
+        for ok, _, action, result in self.send_keyed((None, action) for action in actions):
+            yield ok, action, result
+
+    def send_keyed(self, actions):
+        """
+        Index the actions and report the result for each of them along with
+        the key it was given with, e.g. the path of the file it describes.
+
+        :param actions: Iterable of (key, action) tuples
+        :return: Generator of (ok, key, action, result) tuples in action order
+        """
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            for chunk in self._chunk_actions(actions):
+                pending.append((chunk, pool.submit(self._send_chunk, chunk)))
+
+                # Block on the oldest request once all the threads are busy.
+                if len(pending) >= self.threads:
+                    yield from self._collect(*pending.popleft())
+
+                while pending and pending[0][1].done():
+                    yield from self._collect(*pending.popleft())
+
+            while pending:
+                yield from self._collect(*pending.popleft())
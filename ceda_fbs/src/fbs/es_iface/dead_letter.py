@@ -0,0 +1,77 @@
+"""
+Dead-letter files for documents which could not be indexed.
+
+Each line of the file is a JSON object holding the bulk action and the
+error returned by elasticsearch, so the documents can be replayed later
+without extracting the metadata again.
+"""
+
+import json
+
+
+class DeadLetterFile(object):
+    """
+    Appends failed actions to a newline delimited JSON file. The file is
+    only created when the first action is written.
+
+    :param str path: Path to the dead-letter file
+    :param serializer: Object with a dumps method, defaults to json
+    :param str mode: Mode the file is opened with, 'w' to replace an existing file
+    """
+
+    def __init__(self, path, serializer=json, mode='a'):
+        self.path = path
+        self.serializer = serializer
+        self.mode = mode
+        self.count = 0
+        self._file = None
+
+    def write(self, action, error):
+        """
+        Record a failed action.
+
+        :param dict action: Bulk action with _index, _id and _source keys
+        :param error: Result or error returned by elasticsearch
+        """
+        if self._file is None:
+            self._file = open(self.path, self.mode)
+
+        record = {
+            'action': {
+                '_index': action['_index'],
+                '_id': action['_id'],
+                '_source': action['_source']
+            },
+            'error': error
+        }
+
+        self._file.write(self.serializer.dumps(record) + '\n')
+        self._file.flush()
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_dead_letters(path):
+    """
+    Read the records from a dead-letter file.
+
+    :param str path: Path to the dead-letter file
+    :return: Generator of (action, error) tuples
+    """
+    with open(path) as reader:
+        for line in reader:
+            if not line.strip():
+                continue
+
+            record = json.loads(line)
+            yield record['action'], record['error']
@@ -0,0 +1,134 @@
+"""
+Flow control for requests to elasticsearch.
+
+Requests are slowed down when the cluster pushes back with HTTP 429 or
+es_rejected_execution_exception, and speeded up again as latency recovers.
+"""
+
+import time
+import logging
+import threading
+from elasticsearch.exceptions import TransportError, ConnectionError
+
+logger = logging.getLogger(__name__)
+
+
+class FlowController(object):
+    """
+    Shared state used to pace requests to the cluster. The size of bulk
+    chunks grows additively while requests complete within the target
+    latency and is halved on every rejection. Rejections also introduce an
+    exponentially increasing delay before the next request, which decays
+    once requests succeed.
+
+    :param int initial_chunk_bytes: Starting size of bulk request payloads
+    :param int min_chunk_bytes: Lower bound for bulk request payloads
+    :param int max_chunk_bytes: Upper bound for bulk request payloads
+    :param float target_latency: Request time in seconds above which chunks shrink
+    :param float initial_backoff: First delay in seconds after a rejection
+    :param float max_backoff: Longest delay in seconds between requests
+    :param int max_retries: Retries of a failed request before giving up
+    """
+
+    # Statuses returned while the cluster is recovering, e.g. during shard relocation.
+    TRANSIENT_STATUSES = (502, 503, 504)
+
+    def __init__(self, initial_chunk_bytes=2 * 1024 ** 2, min_chunk_bytes=128 * 1024,
+                 max_chunk_bytes=20 * 1024 ** 2, target_latency=2.0, initial_backoff=0.5,
+                 max_backoff=60.0, max_retries=8):
+        self.min_chunk_bytes = int(min_chunk_bytes)
+        self.max_chunk_bytes = int(max_chunk_bytes)
+        self.chunk_bytes = min(max(int(initial_chunk_bytes), self.min_chunk_bytes), self.max_chunk_bytes)
+        self.target_latency = target_latency
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.max_retries = max_retries
+
+        self.backoff = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_rejection(status, error=None):
+        """
+        Check whether a response means the cluster is overloaded.
+
+        :param status: HTTP status of the request or bulk item
+        :param error: Error returned with the response
+        :return: True if the request should be retried later
+        """
+        return status == 429 or 'es_rejected_execution_exception' in str(error)
+
+    def should_retry(self, status, error=None):
+        """
+        Check whether a failed request or bulk item is worth retrying.
+
+        :param status: HTTP status of the request or bulk item
+        :param error: Error returned with the response
+        :return: True for rejections and transient cluster errors
+        """
+        return self.is_rejection(status, error) or status in self.TRANSIENT_STATUSES
+
+    def should_retry_exception(self, ex):
+        """
+        Check whether a request which raised the given exception is worth retrying.
+
+        :param TransportError ex: Exception raised by the client
+        :return: True for rejections, transient errors and lost connections
+        """
+        return isinstance(ex, ConnectionError) or self.should_retry(ex.status_code, ex.error)
+
+    def wait(self):
+        """
+        Sleep for the current backoff delay, if any.
+        """
+        delay = self.backoff
+
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_success(self, latency):
+        """
+        Record a request which was accepted by the cluster.
+
+        :param float latency: Time taken by the request in seconds
+        """
+        with self._lock:
+            self.backoff = self.backoff / 2 if self.backoff > self.initial_backoff else 0.0
+
+            if latency <= self.target_latency:
+                self.chunk_bytes = min(self.max_chunk_bytes, self.chunk_bytes + self.min_chunk_bytes)
+            else:
+                self.chunk_bytes = max(self.min_chunk_bytes, int(self.chunk_bytes * 0.75))
+
+    def on_rejected(self):
+        """
+        Record a request, or part of one, rejected by the cluster.
+        """
+        with self._lock:
+            self.backoff = min(self.max_backoff, self.backoff * 2 or self.initial_backoff)
+            self.chunk_bytes = max(self.min_chunk_bytes, self.chunk_bytes // 2)
+
+        logger.warning("Request rejected by elasticsearch, backing off for {}s.".format(self.backoff))
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call an elasticsearch client method, retrying with backoff while the
+        cluster rejects the request or is briefly unavailable.
+
+        :param func: Client method to call
+        :return: Response from the client method
+        """
+        for attempt in range(self.max_retries + 1):
+            self.wait()
+            start = time.monotonic()
+
+            try:
+                response = func(*args, **kwargs)
+            except TransportError as ex:
+                if attempt == self.max_retries or not self.should_retry_exception(ex):
+                    raise
+                self.on_rejected()
+                continue
+
+            self.on_success(time.monotonic() - start)
+            return response
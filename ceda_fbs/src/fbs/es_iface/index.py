@@ -1,11 +1,15 @@
 import json
-import time
 from elasticsearch import Elasticsearch
 from elasticsearch import ElasticsearchException
 from elasticsearch.exceptions import TransportError
 from copy import deepcopy
 import hashlib
 
+from .flow_control import FlowController
+
+# Paces the requests made by this module so the cluster is not overloaded.
+flow_controller = FlowController()
+
 
 def _get_host_string(config):
     """
@@ -36,18 +40,15 @@ def create_index(config, elasticsearch):
 def search_database(es, index_l, query):
     """
     Executes a DSL query and returns the result.
-    A delay is used because high rate of queries cause the 
-    database to return an error.
+    Requests are retried with a backoff when a high rate of
+    queries causes the database to reject them.
     """
-    res = es.search(index=index_l, body=query)
-    time.sleep(0.1)
-    return res
+    return flow_controller.call(es.search, index=index_l, body=query)
 
 
 def index_file(es, index_l, fid, fjson):
     "Indexes a document."
-    es.index(index=index_l, id=fid, body=fjson, request_timeout=60)
-    time.sleep(0.01)
+    flow_controller.call(es.index, index=index_l, id=fid, body=fjson, request_timeout=60)
 
 bulk_requests = []
 bulk = False
@@ -83,12 +84,10 @@ def index_phenomenon(es, index_l, type_l, phenomenon = None, threshold=0):
 
             bulk_requests = []
 
-            es.bulk(index=index_l, doc_type=type_l, body=pjson)
+            flow_controller.call(es.bulk, index=index_l, doc_type=type_l, body=pjson)
     else:
         pjson = json.dumps(phenomenon)
-        es.index(index=index_l, doc_type=type_l, id=pid, body=pjson, request_timeout=60)
-
-        time.sleep(0.2)
+        flow_controller.call(es.index, index=index_l, doc_type=type_l, id=pid, body=pjson, request_timeout=60)
 
     return pid
 
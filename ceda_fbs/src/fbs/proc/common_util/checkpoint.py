@@ -0,0 +1,117 @@
+"""
+Progress checkpoints for scans of a slice of a file list.
+
+A job scanning lines start to start + num-files of a file list records the
+offset below which every file has been dealt with, i.e. indexed, written
+to the dead-letter file or reported as an error. A job which is stopped or
+pre-empted can then be submitted again and carry on from that offset.
+"""
+
+import os
+import json
+import threading
+import logging
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressTracker(object):
+    """
+    Keeps track of the contiguous number of files dealt with, from the start
+    of the slice, while files are acknowledged out of order by the different
+    stages of the scan.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(deque)
+        self._done = set()
+        self._next = 0
+        self.acknowledged = 0
+
+    def add(self, key):
+        """
+        Register the next file of the slice.
+        """
+        with self._lock:
+            self._pending[key].append(self._next)
+            self._next += 1
+
+    def done(self, key):
+        """
+        Mark a registered file as dealt with.
+        """
+        with self._lock:
+            seqs = self._pending.get(key)
+            if not seqs:
+                return
+
+            self._done.add(seqs.popleft())
+            if not seqs:
+                del self._pending[key]
+
+            while self.acknowledged in self._done:
+                self._done.remove(self.acknowledged)
+                self.acknowledged += 1
+
+
+class ScanCheckpoint(object):
+    """
+    Checkpoint file of a job scanning a slice of a file list. The slice is
+    stored along with the offset so that a checkpoint is only used by the
+    same job.
+
+    :param str path: Path to the checkpoint file
+    :param str filename: File list being scanned
+    :param int start: First line of the slice
+    :param int num_files: Number of lines in the slice
+    """
+
+    def __init__(self, path, filename, start, num_files):
+        self.path = path
+        self.slice = {
+            "filename": os.path.abspath(filename),
+            "start": int(start),
+            "num-files": int(num_files)
+        }
+
+    def load(self):
+        """
+        Return the offset in the file list to resume from or None when
+        there is no checkpoint for this slice.
+        """
+        try:
+            with open(self.path) as reader:
+                data = json.load(reader)
+        except (OSError, ValueError):
+            return None
+
+        if any(data.get(key) != value for key, value in self.slice.items()):
+            logger.warning("Ignoring checkpoint {} written for another slice.".format(self.path))
+            return None
+
+        return int(data["offset"])
+
+    def save(self, offset):
+        """
+        Record the offset below which all the files have been dealt with.
+        The file is replaced atomically so that a job killed while writing
+        leaves the previous checkpoint in place.
+        """
+        data = dict(self.slice, offset=int(offset))
+        tmp_path = "{}.tmp".format(self.path)
+
+        with open(tmp_path, "w") as writer:
+            json.dump(data, writer)
+
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        """
+        Remove the checkpoint once the slice has been scanned.
+        """
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,415 @@
+"""
+File lists with a line offset index.
+
+File lists hold one path per line and can have millions of lines. Each list
+is written with a hidden sidecar index, ``.<name>.idx`` next to the list,
+holding the number of lines and the byte offset of every ``stride``-th line.
+A job can then read its slice of the list by seeking to it, and the number
+of lines of a list is known without reading it. The sidecar is hidden so
+that directory walks over the lists do not pick it up.
+
+An index which does not match the size and modification time of its list
+is rebuilt when the list is next read.
+
+Lists whose name ends in ``.fbl`` are written in a compact binary format
+instead. The paths are sorted and front coded, each path being stored as
+the length of the prefix it shares with the previous path, mostly its
+directory, and the rest of the path. The paths are grouped in blocks which
+are compressed separately, with a table of block offsets after the header,
+so any path can be read by decompressing a single block. The functions of
+this module read both formats, recognising compact lists by their header.
+"""
+
+import os
+import zlib
+import struct
+import logging
+from array import array
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAGIC = b"FBSLIDX\0"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<8sHxxIqqq")
+
+# Number of lines between two recorded offsets.
+DEFAULT_STRIDE = 1024
+
+COMPACT_EXTENSION = ".fbl"
+COMPACT_MAGIC = b"FBSLIST\0"
+COMPACT_VERSION = 1
+COMPACT_HEADER = struct.Struct("<8sHxxIq")
+COMPACT_RECORD = struct.Struct("<HH")
+
+# Number of paths in each compressed block of a compact list.
+DEFAULT_BLOCK_SIZE = 4096
+
+
+def _encode(path):
+    return path.encode('utf-8', 'surrogateescape')
+
+
+def _decode(line):
+    return line.rstrip(b'\n').decode('utf-8', 'surrogateescape')
+
+
+def index_path(filename):
+    """
+    :param filename: Path to a file list
+    :return: Path to the sidecar index of the file list
+    """
+    directory, name = os.path.split(filename)
+    return os.path.join(directory, ".{}.idx".format(name))
+
+
+class FileListIndex(object):
+    """
+    Line count and offsets of every stride-th line of a file list.
+
+    :param int count: Number of lines in the list
+    :param int stride: Number of lines between two offsets
+    :param offsets: Byte offset of lines 0, stride, 2 * stride...
+    :param int source_size: Size of the list the index was built for
+    :param int source_mtime: Modification time in ns of the list the index was built for
+    """
+
+    def __init__(self, count, stride, offsets, source_size=0, source_mtime=0):
+        self.count = count
+        self.stride = stride
+        self.offsets = offsets
+        self.source_size = source_size
+        self.source_mtime = source_mtime
+
+    def matches(self, filename):
+        """
+        Whether the index was built for the current content of the list.
+        """
+        try:
+            file_stat = os.stat(filename)
+        except OSError:
+            return False
+
+        return (file_stat.st_size, file_stat.st_mtime_ns) == (self.source_size, self.source_mtime)
+
+    def save(self, filename):
+        """
+        Write the index next to the list, replacing any previous index atomically.
+        """
+        file_stat = os.stat(filename)
+        self.source_size, self.source_mtime = file_stat.st_size, file_stat.st_mtime_ns
+
+        sidecar = index_path(filename)
+        tmp_file = "{}.{}.tmp".format(sidecar, os.getpid())
+
+        with open(tmp_file, 'wb') as writer:
+            writer.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.stride, self.count,
+                                           self.source_size, self.source_mtime))
+            writer.write(self.offsets.tobytes())
+
+        os.replace(tmp_file, sidecar)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Read the index of the list.
+
+        :return: FileListIndex or None if there is no valid index for the current list
+        """
+        try:
+            with open(index_path(filename), 'rb') as reader:
+                header = reader.read(INDEX_HEADER.size)
+                magic, version, stride, count, source_size, source_mtime = INDEX_HEADER.unpack(header)
+
+                offsets = array('Q')
+                offsets.frombytes(reader.read())
+
+        except (OSError, struct.error):
+            return None
+
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            return None
+
+        index = cls(count, stride, offsets, source_size, source_mtime)
+
+        if not index.matches(filename) or len(offsets) != (count + stride - 1) // stride:
+            return None
+
+        return index
+
+    @classmethod
+    def build(cls, filename, stride=DEFAULT_STRIDE):
+        """
+        Read the whole list to build its index.
+        """
+        offsets = array('Q')
+        offset = 0
+        count = 0
+
+        with open(filename, 'rb') as reader:
+            for line in reader:
+                if count % stride == 0:
+                    offsets.append(offset)
+
+                offset += len(line)
+                count += 1
+
+        return cls(count, stride, offsets)
+
+
+def is_compact(filename):
+    """
+    :param filename: Path to a file list
+    :return: Whether the list is in the compact format
+    """
+    with open(filename, 'rb') as reader:
+        return reader.read(len(COMPACT_MAGIC)) == COMPACT_MAGIC
+
+
+class CompactFileList(object):
+    """
+    Random access to the paths of a compact file list. The last block
+    read is kept decoded, so reading consecutive paths decompresses each
+    block once.
+
+    :param str filename: Path to the compact list
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+        with open(filename, 'rb') as reader:
+            magic, version, self.block_size, self.count = COMPACT_HEADER.unpack(reader.read(COMPACT_HEADER.size))
+
+            if magic != COMPACT_MAGIC or version != COMPACT_VERSION:
+                raise ValueError("{} is not a compact file list.".format(filename))
+
+            num_blocks = (self.count + self.block_size - 1) // self.block_size
+            self.block_offsets = array('Q')
+            self.block_offsets.frombytes(reader.read((num_blocks + 1) * 8))
+
+        self._block_number = None
+        self._block = None
+
+    def __len__(self):
+        return self.count
+
+    def _read_block(self, number):
+        """
+        Decompress and decode a block of paths.
+        """
+        if number != self._block_number:
+            with open(self.filename, 'rb') as reader:
+                reader.seek(self.block_offsets[number])
+                data = zlib.decompress(reader.read(self.block_offsets[number + 1] - self.block_offsets[number]))
+
+            paths = []
+            previous = b''
+            position = 0
+
+            while position < len(data):
+                shared, length = COMPACT_RECORD.unpack_from(data, position)
+                position += COMPACT_RECORD.size
+                previous = previous[:shared] + data[position:position + length]
+                position += length
+                paths.append(previous.decode('utf-8', 'surrogateescape'))
+
+            self._block_number = number
+            self._block = paths
+
+        return self._block
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self.count)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+
+            paths = []
+            while start < stop:
+                number, position = divmod(start, self.block_size)
+                block = self._read_block(number)
+                taken = block[position:position + stop - start]
+                paths.extend(taken)
+                start += len(taken)
+
+            return paths
+
+        if item < 0:
+            item += self.count
+        if not 0 <= item < self.count:
+            raise IndexError("file list index out of range")
+
+        number, position = divmod(item, self.block_size)
+        return self._read_block(number)[position]
+
+    def __iter__(self):
+        for number in range(len(self.block_offsets) - 1):
+            yield from self._read_block(number)
+
+
+def write_compact_file_list(paths, filename, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Write the paths to a compact file list. The paths are sorted.
+
+    :param paths: Iterable of paths
+    :param filename: Path to the file list
+    :param int block_size: Number of paths in each compressed block
+    :return: Number of paths written
+    """
+    encoded = sorted(_encode(path) for path in paths)
+    count = len(encoded)
+    num_blocks = (count + block_size - 1) // block_size
+
+    block_offsets = array('Q')
+    offset = COMPACT_HEADER.size + (num_blocks + 1) * 8
+    blocks = []
+
+    for start in range(0, count, block_size):
+        data = bytearray()
+        previous = b''
+
+        for path in encoded[start:start + block_size]:
+            shared = len(os.path.commonprefix([previous, path]))
+            data += COMPACT_RECORD.pack(shared, len(path) - shared)
+            data += path[shared:]
+            previous = path
+
+        block = zlib.compress(bytes(data), 6)
+        block_offsets.append(offset)
+        offset += len(block)
+        blocks.append(block)
+
+    block_offsets.append(offset)
+
+    with open(filename, 'wb') as writer:
+        writer.write(COMPACT_HEADER.pack(COMPACT_MAGIC, COMPACT_VERSION, block_size, count))
+        writer.write(block_offsets.tobytes())
+
+        for block in blocks:
+            writer.write(block)
+
+    return count
+
+
+def get_index(filename):
+    """
+    Return the index of the list, building it and saving it next to the
+    list when it is missing or out of date.
+    """
+    index = FileListIndex.load(filename)
+
+    if index is None:
+        logger.debug("Building line index of file list {}.".format(filename))
+        index = FileListIndex.build(filename)
+
+        try:
+            index.save(filename)
+        except OSError as ex:
+            logger.warning("Could not save line index of file list {}: {}".format(filename, ex))
+
+    return index
+
+
+def count_lines(filename):
+    """
+    :param filename: Path to a file list
+    :return: Number of lines in the list, read from its index when possible
+    """
+    if is_compact(filename):
+        return len(CompactFileList(filename))
+
+    return get_index(filename).count
+
+
+def iter_slice(filename, start, stop=None):
+    """
+    Read lines start to stop of the list, seeking to the nearest indexed line.
+
+    :param filename: Path to a file list
+    :param int start: First line to read
+    :param int stop: Line to stop before, None for the end of the list
+    :return: Generator of paths without the line endings
+    """
+    start = max(int(start), 0)
+
+    if is_compact(filename):
+        compact = CompactFileList(filename)
+        stop = len(compact) if stop is None else min(int(stop), len(compact))
+
+        for i in range(start, stop):
+            yield compact[i]
+        return
+
+    index = get_index(filename)
+    stop = index.count if stop is None else min(int(stop), index.count)
+
+    if start >= stop:
+        return
+
+    with open(filename, 'rb') as reader:
+        reader.seek(index.offsets[start // index.stride])
+
+        for _ in range(start % index.stride):
+            reader.readline()
+
+        for _ in range(stop - start):
+            yield _decode(reader.readline())
+
+
+def read_slice(filename, start, stop=None):
+    """
+    :param filename: Path to a file list
+    :param int start: First line to read
+    :param int stop: Line to stop before, None for the end of the list
+    :return: List of paths without the line endings
+    """
+    return list(iter_slice(filename, start, stop))
+
+
+def iter_file_list(filename):
+    """
+    :param filename: Path to a file list
+    :return: Generator of the paths in the list
+    """
+    if is_compact(filename):
+        yield from CompactFileList(filename)
+        return
+
+    with open(filename, 'rb') as reader:
+        for line in reader:
+            yield _decode(line)
+
+
+def write_file_list(paths, filename, index=True, stride=DEFAULT_STRIDE):
+    """
+    Write the paths to a file list, one per line, along with its index.
+    Lists named with the compact extension are written in the compact format.
+
+    :param paths: Iterable of paths
+    :param filename: Path to the file list
+    :param bool index: Whether to write the sidecar index
+    :param int stride: Number of lines between two offsets of the index
+    :return: Number of paths written
+    """
+    if filename.endswith(COMPACT_EXTENSION):
+        return write_compact_file_list(paths, filename)
+
+    offsets = array('Q')
+    offset = 0
+    count = 0
+
+    with open(filename, 'wb') as writer:
+        for path in paths:
+            line = _encode(path) + b'\n'
+
+            if count % stride == 0:
+                offsets.append(offset)
+
+            writer.write(line)
+            offset += len(line)
+            count += 1
+
+    if index:
+        FileListIndex(count, stride, offsets).save(filename)
+
+    return count
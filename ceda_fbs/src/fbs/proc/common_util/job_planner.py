@@ -0,0 +1,236 @@
+"""
+Split file lists into scan jobs of similar expected runtime.
+
+Splitting a list every num-files lines gives jobs which take minutes next
+to jobs which take days, as the time to read a file depends on its format
+and size. The planner estimates the cost of each file from the handler its
+extension maps to and its size, calibrated with the handler timings recorded
+by previous scans, and cuts the list into contiguous slices of about the
+same total cost. Files expected to take longer than a whole job are given a
+slice of their own.
+
+The list is read in blocks of lines and the sizes of the files of each
+block are read by a pool of threads while the rest of the list is read, so
+a large file among many small ones is still seen and given its own job.
+"""
+
+import os
+import logging
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from ceda_fbs.proc.common_util.timings import HandlerTimings
+import ceda_fbs.proc.common_util.file_list as file_lists
+from ceda_fbs.proc.file_handlers.handler_picker import HandlerPicker
+
+logger = logging.getLogger(__name__)
+
+# Default (seconds per file, seconds per byte) of each handler above level 1.
+DEFAULT_COSTS = {
+    'GenericFile': (0.002, 0.0),
+    'NetCdfFile': (0.05, 2e-10),
+    'NasaAmesFile': (0.02, 5e-9),
+    'PpFile': (0.2, 2e-9),
+    'GribFile': (0.2, 2e-9),
+    'EsaSafeFile': (0.05, 1e-9),
+    'KmzFile': (0.05, 1e-8),
+    'HdfFile': (0.1, 5e-10),
+    'BadcCsvFile': (0.02, 5e-9),
+    'MetadataTagsJsonFile': (0.01, 0.0),
+}
+
+# At level 1 only the file status is read, whatever the handler.
+LEVEL_1_COST = (0.002, 0.0)
+
+# Seconds per byte to calculate the md5 checksum of a file.
+MD5_COST = 1 / 200e6
+
+# Number of files a handler must have been timed on before its history is used.
+MIN_TIMED_FILES = 20
+
+# Lines of a file list whose sizes are read by the same thread.
+SIZE_BLOCK_SIZE = 1000
+
+
+class CostModel(object):
+    """
+    Estimates the seconds taken to scan a file.
+
+    :param level: Level of detail of the scan
+    :param bool calculate_md5: Whether the md5 checksum of the files is calculated
+    :param HandlerTimings timings: Timings of previous scans used to calibrate the defaults
+    """
+
+    def __init__(self, level, calculate_md5=False, timings=None):
+        self.level = int(level)
+        self.calculate_md5 = calculate_md5
+        self.timings = timings
+        self.handler_picker = HandlerPicker()
+        self._costs = {}
+        self._calibrated = set()
+
+    def _default_cost(self, handler):
+        if self.level == 1:
+            return LEVEL_1_COST
+        return DEFAULT_COSTS.get(handler, DEFAULT_COSTS['GenericFile'])
+
+    def get_handler_cost(self, handler):
+        """
+        :param str handler: Name of the handler class
+        :return: Tuple of (seconds per file, seconds per byte) for the handler at this level
+        """
+        cost = self._costs.get(handler)
+
+        if cost is None:
+            per_file, per_byte = self._default_cost(handler)
+            history = self.timings.get(handler, self.level) if self.timings is not None else None
+
+            if history is not None and history[0] >= MIN_TIMED_FILES:
+                files, seconds, size = history
+                predicted = files * per_file + size * per_byte
+
+                if predicted > 0:
+                    # Keep the shape of the default cost and scale it to what was observed.
+                    factor = seconds / predicted
+                    per_file, per_byte = per_file * factor, per_byte * factor
+                    self._calibrated.add(handler)
+
+            cost = self._costs[handler] = (per_file, per_byte)
+
+        return cost
+
+    def get_handler_file_cost(self, handler, size):
+        """
+        :param str handler: Name of the handler class
+        :param size: Size of the file in bytes, None if unknown
+        :return: Expected seconds to scan a file of this size with the handler
+        """
+        per_file, per_byte = self.get_handler_cost(handler)
+        size = size or 0
+        cost = per_file + size * per_byte
+
+        # The timings recorded by the scans already include the md5 checksums.
+        if self.calculate_md5 and handler not in self._calibrated:
+            cost += size * MD5_COST
+
+        return cost
+
+    def get_cost(self, path, size):
+        """
+        :param str path: Path to the file
+        :param int size: Size of the file in bytes, None if unknown
+        :return: Expected seconds to scan the file
+        """
+        return self.get_handler_file_cost(self.handler_picker.get_handler_name(path), size)
+
+
+def _get_size(path):
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return None
+
+
+def _get_sizes(paths):
+    """
+    :param paths: Block of file paths
+    :return: Array of the sizes of the files, 0 for the files which could not be read
+    """
+    return array('q', (_get_size(path) or 0 for path in paths))
+
+
+def plan_slices(costs, target_cost, max_files=None):
+    """
+    Cut a sequence of file costs into contiguous slices.
+
+    A slice is closed before it goes over the target cost or the maximum
+    number of files, so a file costing more than the target ends up alone.
+
+    :param costs: Sequence of the expected seconds of each file
+    :param float target_cost: Expected seconds of each slice
+    :param int max_files: Maximum number of files in a slice
+    :return: List of (start, num_files, cost) tuples
+    """
+    slices = []
+    start = 0
+    total = 0.0
+
+    for i, cost in enumerate(costs):
+        count = i - start
+        if count and (total + cost > target_cost or (max_files and count >= max_files)):
+            slices.append((start, count, total))
+            start, total = i, 0.0
+
+        total += cost
+
+    if len(costs) > start:
+        slices.append((start, len(costs) - start, total))
+
+    return slices
+
+
+class JobPlanner(object):
+    """
+    Plans the scan jobs for file lists.
+
+    :param level: Level of detail of the scan
+    :param float target_cost: Expected seconds of each job
+    :param int max_files: Maximum number of files in a job
+    :param bool calculate_md5: Whether the md5 checksum of the files is calculated
+    :param str timings_file: Path to the handler timings database, if any
+    :param int threads: Number of threads reading the size of the files
+    :param int block_size: Lines of a file list whose sizes are read by the same thread
+    """
+
+    def __init__(self, level, target_cost, max_files=None, calculate_md5=False, timings_file=None, threads=16,
+                 block_size=SIZE_BLOCK_SIZE):
+        timings = None
+
+        if timings_file and os.path.exists(timings_file):
+            try:
+                timings = HandlerTimings.load(timings_file)
+            except Exception as ex:
+                logger.error("Could not read handler timings from {}: {}".format(timings_file, ex))
+
+        self.model = CostModel(level, calculate_md5, timings)
+        self.target_cost = float(target_cost)
+        self.max_files = max_files
+        self.threads = threads
+        self.block_size = int(block_size)
+
+    def plan(self, filename):
+        """
+        The handler of each file is picked from its name, the sizes of the
+        files are read in parallel, a block at a time, while the list is read.
+
+        :param filename: Path to a file list
+        :return: List of (start, num_files, cost) tuples covering the list
+        """
+        handlers = {}
+        handler_ids = array('H')
+        block_sizes = []
+
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            block = []
+
+            for path in file_lists.iter_file_list(filename):
+                handler = self.model.handler_picker.get_handler_name(path)
+                handler_ids.append(handlers.setdefault(handler, len(handlers)))
+                block.append(path)
+
+                if len(block) == self.block_size:
+                    block_sizes.append(executor.submit(_get_sizes, block))
+                    block = []
+
+            if block:
+                block_sizes.append(executor.submit(_get_sizes, block))
+
+            sizes = array('q')
+            for future in block_sizes:
+                sizes.extend(future.result())
+
+        handler_names = list(handlers)
+        costs = array('d', (self.model.get_handler_file_cost(handler_names[handler_id], size)
+                            for handler_id, size in zip(handler_ids, sizes)))
+
+        return plan_slices(costs, self.target_cost, self.max_files)
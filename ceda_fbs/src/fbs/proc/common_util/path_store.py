@@ -0,0 +1,130 @@
+"""
+Memory compact container for millions of file paths.
+
+A Python list of paths holds a separate string object per path, each
+repeating the directory of the file. PathStore keeps each directory once in
+a table and packs the file names into a single buffer, with arrays giving
+the directory and the end of the name of each path. A path costs the bytes
+of its name plus 12 bytes, instead of around 150 bytes for a str.
+"""
+
+import os
+import hashlib
+from array import array
+
+import numpy as np
+
+
+def _hash(path):
+    """
+    64 bit hash of a path, stable between processes.
+    """
+    return int.from_bytes(hashlib.blake2b(path.encode('utf-8', 'surrogateescape'), digest_size=8).digest(),
+                          'little', signed=True)
+
+
+class PathStore(object):
+    """
+    Ordered, list like container of paths.
+
+    Supports len, indexing, slicing, iteration, membership tests and
+    set difference. Membership tests use a sorted array of path hashes
+    built on first use.
+
+    :param paths: Iterable of paths to add
+    """
+
+    def __init__(self, paths=()):
+        self.directories = []
+        self._directory_ids = {}
+        self._names = bytearray()
+        self._name_ends = array('Q')
+        self._path_directories = array('I')
+        self._lookup = None
+
+        self.extend(paths)
+
+    def append(self, path):
+        """
+        Add a path to the end of the store.
+        """
+        directory, name = os.path.split(path)
+
+        directory_id = self._directory_ids.get(directory)
+        if directory_id is None:
+            directory_id = len(self.directories)
+            self._directory_ids[directory] = directory_id
+            self.directories.append(directory)
+
+        self._names += name.encode('utf-8', 'surrogateescape')
+        self._name_ends.append(len(self._names))
+        self._path_directories.append(directory_id)
+        self._lookup = None
+
+    def extend(self, paths):
+        """
+        Add the paths to the end of the store.
+        """
+        for path in paths:
+            self.append(path)
+
+    def __len__(self):
+        return len(self._name_ends)
+
+    def _path(self, i):
+        start = self._name_ends[i - 1] if i else 0
+        name = self._names[start:self._name_ends[i]].decode('utf-8', 'surrogateescape')
+
+        return os.path.join(self.directories[self._path_directories[i]], name)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return PathStore(self._path(i) for i in range(*item.indices(len(self))))
+
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("PathStore index out of range")
+
+        return self._path(item)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._path(i)
+
+    def _build_lookup(self):
+        """
+        Sort the hashes of the paths along with their positions. The hashes
+        are sorted in a numpy buffer, so no Python object is kept per path.
+        """
+        hashes = np.fromiter((_hash(path) for path in self), dtype=np.int64, count=len(self))
+        positions = np.argsort(hashes, kind='stable')
+        self._lookup = (hashes[positions], positions)
+
+    def __contains__(self, path):
+        if self._lookup is None:
+            self._build_lookup()
+
+        hashes, positions = self._lookup
+        path_hash = _hash(path)
+        i = int(np.searchsorted(hashes, path_hash))
+
+        while i < len(hashes) and hashes[i] == path_hash:
+            if self._path(positions[i]) == path:
+                return True
+            i += 1
+
+        return False
+
+    def difference(self, other):
+        """
+        :param other: Container of paths supporting membership tests, e.g. a PathStore or a set
+        :return: PathStore of the paths which are not in other, in order
+        """
+        return PathStore(path for path in self if path not in other)
+
+    def __sub__(self, other):
+        return self.difference(other)
+
+    def __repr__(self):
+        return "<PathStore of {} paths in {} directories>".format(len(self), len(self.directories))
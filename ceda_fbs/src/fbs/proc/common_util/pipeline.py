@@ -0,0 +1,106 @@
+"""
+Helpers to run the stages of a scan concurrently.
+
+Each stage is a generator consuming the output of the previous one. Wrapping
+a stage in a BufferedStage runs it in its own thread and hands its output to
+the next stage through a bounded queue, so all the stages make progress at
+the same time while the number of items held between them stays bounded.
+"""
+
+import queue
+import threading
+
+
+class _Failure(object):
+    """
+    Carries an exception raised by a stage over to the consuming thread.
+    """
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+class BufferedStage(object):
+    """
+    Iterate over a stage in a background thread.
+
+    :param iterable: The stage to run, usually a generator
+    :param int maxsize: Maximum number of items waiting for the next stage
+    :param str name: Name given to the thread
+    :param threading.Event stop_event: Ends the iteration when set, even
+        while the stage is busy on an item, e.g. a file which is slow to read
+    """
+
+    _DONE = object()
+
+    # Seconds between checks of the stop event while waiting for an item.
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, iterable, maxsize=1000, name=None, stop_event=None):
+        self.iterable = iterable
+        self.name = name
+        self.queue = queue.Queue(maxsize=int(maxsize))
+        self.stop_event = stop_event
+        self._stop = threading.Event()
+
+    def _put(self, item):
+        """
+        Put an item on the queue unless the consumer has gone away.
+
+        :return: False if the stage should stop
+        """
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def _produce(self):
+        iterator = iter(self.iterable)
+
+        try:
+            for item in iterator:
+                if not self._put(item):
+                    return
+
+        except BaseException as ex:
+            self._put(_Failure(ex))
+            return
+
+        finally:
+            # Make sure upstream stages stop as well.
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+        self._put(self._DONE)
+
+    def __iter__(self):
+        thread = threading.Thread(target=self._produce, name=self.name, daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=self.POLL_INTERVAL)
+                except queue.Empty:
+                    # The stage thread is left behind, it stops at its next item.
+                    if self.stop_event is not None and self.stop_event.is_set():
+                        return
+                    continue
+
+                if item is self._DONE:
+                    break
+
+                if isinstance(item, _Failure):
+                    raise item.exception
+
+                yield item
+
+            thread.join()
+
+        finally:
+            self._stop.set()
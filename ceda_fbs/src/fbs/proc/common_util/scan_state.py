@@ -0,0 +1,104 @@
+"""
+Persistent record of the files indexed by previous scans.
+
+The record for each path holds the size, modification time and inode of
+the file along with the level and handler used to index it. Incremental
+scans use it to skip files which have not changed since they were last
+indexed.
+"""
+
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ScanStateStore(object):
+    """
+    SQLite backed store of per-file scan state.
+
+    Lookups are made one path at a time while the scan runs, updates are
+    buffered by the caller and written in one short transaction so that
+    many jobs can share the same state file.
+
+    :param str path: Path to the SQLite database file
+    :param int timeout: Seconds to wait for another job holding the write lock
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            level INTEGER NOT NULL,
+            handler TEXT NOT NULL
+        )
+    """
+
+    def __init__(self, path, timeout=60):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=timeout)
+
+        with self.conn:
+            self.conn.execute(self.SCHEMA)
+
+    @staticmethod
+    def make_record(path, file_stat, level, handler):
+        """
+        Build the record stored for a file.
+
+        :param str path: Path to the file
+        :param os.stat_result file_stat: Result of stat on the file
+        :param level: Level the file was scanned at
+        :param str handler: Name of the handler used to read the file
+        :return: Tuple matching the columns of the files table
+        """
+        return (path, file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino, int(level), handler)
+
+    def is_unchanged(self, path, file_stat, level, handler):
+        """
+        Check whether the file matches the record from a previous scan
+        made at the same or a higher level with the same handler.
+
+        :param str path: Path to the file
+        :param os.stat_result file_stat: Result of stat on the file
+        :param level: Level of the current scan
+        :param str handler: Name of the handler which would read the file
+        :return: True if the file does not need to be scanned again
+        """
+        row = self.conn.execute(
+            "SELECT size, mtime, inode, level, handler FROM files WHERE path = ?", (path,)
+        ).fetchone()
+
+        if row is None:
+            return False
+
+        size, mtime, inode, stored_level, stored_handler = row
+
+        return (size == file_stat.st_size
+                and mtime == file_stat.st_mtime_ns
+                and inode == file_stat.st_ino
+                and stored_level >= int(level)
+                and stored_handler == handler)
+
+    def update(self, records):
+        """
+        Write the given records to the store in a single transaction.
+
+        :param records: Iterable of tuples from make_record
+        """
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files (path, size, mtime, inode, level, handler) VALUES (?, ?, ?, ?, ?, ?)",
+                records
+            )
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,5 +1,89 @@
 import requests
 import os
+import functools
+
+
+class SpotResolver(object):
+    """
+    Resolves the spot of many files quickly. The spot paths are compiled
+    into a trie of path components and the spot of each directory is
+    memoised, so files in a directory already seen cost one dictionary
+    lookup. Gives the same answers as SpotMapping.get_spot.
+
+    :param dict path2spot: Dictionary of spot path to spot name
+    :param int memo_size: Number of directories kept in the memo
+    """
+
+    # Key of the spot name in a trie node, never a path component.
+    SPOT = None
+
+    def __init__(self, path2spot, memo_size=65536):
+        self.path2spot = dict(path2spot)
+        self.trie = {}
+
+        for path, spot in self.path2spot.items():
+            node = self.trie
+            components = [c for c in path.split('/') if c]
+
+            if not components:
+                # The root is never reported as a spot.
+                continue
+
+            for component in components:
+                node = node.setdefault(component, {})
+
+            node[self.SPOT] = spot
+
+        self.get_directory_spot = functools.lru_cache(maxsize=memo_size)(self._lookup)
+
+    def _lookup(self, directory):
+        """
+        Walk the trie along the directory and return the deepest spot found.
+        """
+        spot = None
+        node = self.trie
+
+        for component in directory.split('/'):
+            if not component:
+                continue
+
+            node = node.get(component)
+            if node is None:
+                break
+
+            spot = node.get(self.SPOT, spot)
+
+        return spot
+
+    def get_spot(self, path):
+        """
+        :param path: Provide a filename or directory
+        :return: Returns the spot which encompasses that file or directory.
+        """
+        spot = self.path2spot.get(path)
+
+        if spot is not None and path != '/':
+            return spot
+
+        return self.get_directory_spot(os.path.dirname(path))
+
+
+@functools.lru_cache(maxsize=65536)
+def _real_directory(directory):
+    return os.path.realpath(directory)
+
+
+def realpath(path):
+    """
+    os.path.realpath with the resolution of the parent directories memoised.
+    Only the last component is checked for a symbolic link on each call.
+    """
+    if os.path.islink(path):
+        return os.path.realpath(path)
+
+    directory, name = os.path.split(path)
+    return os.path.join(_real_directory(directory), name)
+
 
 class SpotMapping(object):
     """
@@ -84,7 +168,7 @@ class SpotMapping(object):
         return spot, suffix
 
     def get_archive_path(self, path):
-        storage_path = os.path.realpath(path)
+        storage_path = realpath(path)
 
         spot, suffix = self.get_spot_from_storage_path(storage_path)
 
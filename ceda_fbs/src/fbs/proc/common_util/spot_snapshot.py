@@ -0,0 +1,257 @@
+"""
+Precompiled snapshot of the spot mapping shared by all the scanning jobs.
+
+The snapshot is a binary file holding the spot paths sorted by their utf-8
+bytes, with the matching spot names, behind arrays of offsets. Jobs map the
+file into memory instead of parsing the spot file, so they start quickly
+and share the pages of the snapshot through the page cache.
+
+Layout::
+
+    header        magic, format version, mtime and size of the spot file
+                  it was built from, number of entries
+    path offsets  count + 1 unsigned 64 bit offsets into the path data
+    spot offsets  count + 1 unsigned 64 bit offsets into the spot data
+    path data     concatenated utf-8 paths, sorted
+    spot data     concatenated utf-8 spot names, in path order
+"""
+
+import os
+import mmap
+import struct
+import functools
+import logging
+from array import array
+
+from ceda_fbs.proc.common_util.spot_mapping import SpotResolver
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FBSSPOT\0"
+VERSION = 1
+HEADER = struct.Struct("<8sHxxqqI4x")
+
+
+def read_spot_file(spot_file):
+    """
+    Read a spot file as written by create_datasets_ini_from_spot.py.
+
+    :param str spot_file: File with one spot=path line per spot
+    :return: Dictionary of path to spot
+    """
+    path2spot = {}
+
+    with open(spot_file) as reader:
+        for line in reader:
+            if not line.strip():
+                continue
+
+            spot, path = line.strip().split('=', 1)
+            path2spot[path] = spot
+
+    return path2spot
+
+
+def write_snapshot(path2spot, snapshot_file, spot_file=None):
+    """
+    Write the snapshot of a spot mapping. The file is replaced atomically
+    as jobs may be reading the previous snapshot.
+
+    :param dict path2spot: Dictionary of path to spot
+    :param str snapshot_file: Path of the snapshot
+    :param str spot_file: Spot file the mapping was read from, recorded for the freshness check
+    """
+    source_mtime, source_size = _source_signature(spot_file)
+
+    entries = sorted((path.encode('utf-8'), spot.encode('utf-8')) for path, spot in path2spot.items())
+
+    path_offsets = array('Q', [0])
+    spot_offsets = array('Q', [0])
+
+    for path, spot in entries:
+        path_offsets.append(path_offsets[-1] + len(path))
+        spot_offsets.append(spot_offsets[-1] + len(spot))
+
+    tmp_file = "{}.{}.tmp".format(snapshot_file, os.getpid())
+
+    try:
+        with open(tmp_file, 'wb') as writer:
+            writer.write(HEADER.pack(MAGIC, VERSION, source_mtime, source_size, len(entries)))
+            writer.write(path_offsets.tobytes())
+            writer.write(spot_offsets.tobytes())
+
+            for path, _ in entries:
+                writer.write(path)
+
+            for _, spot in entries:
+                writer.write(spot)
+
+        os.replace(tmp_file, snapshot_file)
+
+    except OSError:
+        # Do not leave a partial file behind, e.g. when the disk is full.
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def _source_signature(spot_file):
+    """
+    Return the modification time and size of the spot file, zeros when unknown.
+    """
+    if spot_file is None:
+        return 0, 0
+
+    try:
+        file_stat = os.stat(spot_file)
+    except OSError:
+        return 0, 0
+
+    return file_stat.st_mtime_ns, file_stat.st_size
+
+
+class SpotSnapshot(object):
+    """
+    Read only spot mapping backed by a memory mapped snapshot file.
+    Offers the same get_spot lookup as SpotResolver, the spot of each
+    directory is memoised.
+
+    :param str snapshot_file: Path of the snapshot
+    :param int memo_size: Number of directories kept in the memo
+    """
+
+    def __init__(self, snapshot_file, memo_size=65536):
+        self.path = snapshot_file
+
+        with open(snapshot_file, 'rb') as reader:
+            self._mm = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mm) < HEADER.size:
+            raise ValueError("Spot snapshot {} is truncated.".format(snapshot_file))
+
+        magic, self.version, self.source_mtime, self.source_size, self.count = \
+            HEADER.unpack_from(self._mm, 0)
+
+        if magic != MAGIC:
+            raise ValueError("{} is not a spot snapshot.".format(snapshot_file))
+
+        offsets_size = (self.count + 1) * 8
+        view = memoryview(self._mm)
+
+        self._path_offsets = view[HEADER.size:HEADER.size + offsets_size].cast('Q')
+        self._spot_offsets = view[HEADER.size + offsets_size:HEADER.size + 2 * offsets_size].cast('Q')
+        self._path_data = HEADER.size + 2 * offsets_size
+        self._spot_data = self._path_data + (self._path_offsets[-1] if self.count else 0)
+
+        self.get_directory_spot = functools.lru_cache(maxsize=memo_size)(self._lookup_directory)
+
+    def __len__(self):
+        return self.count
+
+    def is_stale(self, spot_file):
+        """
+        A snapshot is stale when it was written by another version of this
+        module or when the spot file has changed since it was built.
+
+        :param str spot_file: Spot file the snapshot should match
+        """
+        if self.version != VERSION:
+            return True
+
+        if spot_file is None or not os.path.exists(spot_file):
+            return False
+
+        return (self.source_mtime, self.source_size) != _source_signature(spot_file)
+
+    def _path(self, i):
+        return self._mm[self._path_data + self._path_offsets[i]:self._path_data + self._path_offsets[i + 1]]
+
+    def _spot(self, i):
+        return self._mm[self._spot_data + self._spot_offsets[i]:self._spot_data + self._spot_offsets[i + 1]]
+
+    def _find(self, path):
+        """
+        Binary search for the spot of an exact path.
+        """
+        key = path.encode('utf-8')
+        lo, hi = 0, self.count
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._path(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        if lo < self.count and self._path(lo) == key:
+            return self._spot(lo).decode('utf-8')
+
+        return None
+
+    def _lookup_directory(self, directory):
+        """
+        Return the spot of the deepest spot path containing the directory.
+        """
+        while directory and directory != '/':
+            spot = self._find(directory)
+            if spot is not None:
+                return spot
+
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
+
+        return None
+
+    def get_spot(self, path):
+        """
+        :param path: Provide a filename or directory
+        :return: Returns the spot which encompasses that file or directory.
+        """
+        if path != '/':
+            spot = self._find(path)
+            if spot is not None:
+                return spot
+
+        return self.get_directory_spot(os.path.dirname(path))
+
+    def items(self):
+        """
+        Generator of (path, spot) tuples in path order.
+        """
+        for i in range(self.count):
+            yield self._path(i).decode('utf-8'), self._spot(i).decode('utf-8')
+
+
+def load_spot_snapshot(snapshot_file, spot_file):
+    """
+    Open the snapshot, first building it from the spot file if it is
+    missing or stale. When the snapshot can not be written the spot file
+    is used directly.
+
+    :param str snapshot_file: Path of the snapshot
+    :param str spot_file: Spot file the snapshot is built from
+    :return: SpotSnapshot, or SpotResolver if the snapshot could not be written
+    """
+    try:
+        snapshot = SpotSnapshot(snapshot_file)
+    except (OSError, ValueError) as ex:
+        logger.info("Building spot snapshot {}: {}".format(snapshot_file, ex))
+        snapshot = None
+
+    if snapshot is not None and not snapshot.is_stale(spot_file):
+        return snapshot
+
+    if snapshot is not None:
+        logger.info("Spot snapshot {} is stale, rebuilding it from {}.".format(snapshot_file, spot_file))
+
+    path2spot = read_spot_file(spot_file)
+
+    try:
+        write_snapshot(path2spot, snapshot_file, spot_file)
+    except OSError as ex:
+        logger.error("Could not write spot snapshot {}, using spot file {}: {}".format(snapshot_file, spot_file, ex))
+        return SpotResolver(path2spot)
+
+    return SpotSnapshot(snapshot_file)
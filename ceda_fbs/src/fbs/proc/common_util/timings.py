@@ -0,0 +1,106 @@
+"""
+Historical timings of the file handlers.
+
+Each scan adds up the time spent by every handler at each level, with the
+number and total size of the files read, and adds these totals to a SQLite
+database shared by all the jobs. The job planner uses them to estimate how
+long the files of a list will take to scan.
+"""
+
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class HandlerTimings(object):
+    """
+    Totals of files, seconds and bytes per handler and level.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS timings (
+            handler TEXT NOT NULL,
+            level INTEGER NOT NULL,
+            files INTEGER NOT NULL,
+            seconds REAL NOT NULL,
+            bytes INTEGER NOT NULL,
+            PRIMARY KEY (handler, level)
+        )
+    """
+
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, handler, level, seconds, size=0, files=1):
+        """
+        Record the time taken by a handler to read files.
+
+        :param str handler: Name of the handler class
+        :param level: Level of detail read
+        :param float seconds: Time taken
+        :param int size: Total size of the files in bytes
+        :param int files: Number of files
+        """
+        totals = self.totals.setdefault((handler, int(level)), [0, 0.0, 0])
+        totals[0] += files
+        totals[1] += seconds
+        totals[2] += size or 0
+
+    def get(self, handler, level):
+        """
+        :return: Tuple of (files, seconds, bytes) for the handler at the level, None if never recorded
+        """
+        totals = self.totals.get((handler, int(level)))
+        return tuple(totals) if totals else None
+
+    def __len__(self):
+        return len(self.totals)
+
+    def save(self, path, timeout=60):
+        """
+        Add the totals to the timings database and clear them.
+
+        :param str path: Path to the SQLite database file
+        :param int timeout: Seconds to wait for another job holding the write lock
+        """
+        if not self.totals:
+            return
+
+        conn = sqlite3.connect(path, timeout=timeout)
+
+        try:
+            with conn:
+                conn.execute(self.SCHEMA)
+                conn.executemany(
+                    "INSERT INTO timings (handler, level, files, seconds, bytes) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (handler, level) DO UPDATE SET files = files + excluded.files, "
+                    "seconds = seconds + excluded.seconds, bytes = bytes + excluded.bytes",
+                    [(handler, level, files, seconds, size)
+                     for (handler, level), (files, seconds, size) in self.totals.items()]
+                )
+        finally:
+            conn.close()
+
+        self.totals.clear()
+
+    @classmethod
+    def load(cls, path, timeout=60):
+        """
+        Read the totals from the timings database.
+
+        :param str path: Path to the SQLite database file
+        :return: HandlerTimings
+        """
+        timings = cls()
+        conn = sqlite3.connect(path, timeout=timeout)
+
+        try:
+            conn.execute(cls.SCHEMA)
+            for handler, level, files, seconds, size in conn.execute(
+                    "SELECT handler, level, files, seconds, bytes FROM timings"):
+                timings.add(handler, level, seconds, size, files)
+        finally:
+            conn.close()
+
+        return timings
@@ -3,6 +3,7 @@ Module containing useful functions for the command-line interfaces.
 """
 
 import os
+import stat
 import errno
 import sys
 import subprocess
@@ -11,15 +12,21 @@ import six
 import re
 import io
 import datetime
+import fcntl
+from concurrent.futures import ThreadPoolExecutor
 from dateutil import parser
 import hashlib
 import logging
 import ldap3
-from ldap3.core.exceptions import LDAPSessionTerminatedByServerError
+from ldap3.core.exceptions import LDAPSessionTerminatedByServerError, LDAPException
 from typing import Optional, Union, List
 from pwd import getpwuid
 from grp import getgrgid
 
+from ceda_fbs.proc.common_util.walker import walk_files
+import ceda_fbs.proc.common_util.file_list as file_lists
+from ceda_fbs.proc.common_util.path_store import PathStore
+
 # Python 2/3 compatibility
 if sys.version_info.major > 2:
     from configparser import RawConfigParser as ConfigParser
@@ -88,26 +95,94 @@ class FileFormatError(Exception):
     pass
 
 
+ARRAY_TASK_SCRIPT = """#!/bin/bash
+# Runs line SLURM_ARRAY_TASK_ID + offset of the task file.
+# Usage: lotus_array_task.sh <task_file> <offset>
+TASK=$(sed -n "$((SLURM_ARRAY_TASK_ID + $2 + 1))p" "$1")
+echo "Running task $((SLURM_ARRAY_TASK_ID + $2)): $TASK"
+eval "$TASK"
+"""
+
+
 class LotusRunner:
     """
     Class to handle running of tasks using the LOTUS scheduler
+
+    The tasks are written to a task file and submitted as a SLURM job array,
+    each array task running the line of the file given by SLURM_ARRAY_TASK_ID.
+    Task lists longer than the maximum array size are submitted as several
+    arrays, each one starting after the previous one so that the throttle
+    caps the number of tasks running at once across the whole list.
     """
-    def __init__(self, queue='par-single'):
+
+    def __init__(self, queue: str = 'par-single', throttle: Optional[int] = None,
+                 sbatch: str = 'sbatch', task_dir: str = 'lotus_tasks', max_array_size: int = 1000):
+        """
+        :param queue: LOTUS queue to submit to
+        :param throttle: Maximum number of tasks running at the same time
+        :param sbatch: Command used to submit the jobs, e.g. fake_sbatch.py to run the tasks locally
+        :param task_dir: Directory to write the task files to, which must be readable from LOTUS
+        :param max_array_size: Maximum number of tasks in one job array
+        """
         self.queue = queue
+        self.throttle = int(throttle) if throttle else None
+        self.sbatch = sbatch
+        self.task_dir = task_dir
+        self.max_array_size = int(max_array_size)
         self.task_list = []
 
     def _run_tasks_in_lotus(self) -> None:
         """
         Submit all tasks in task list
+
+        Stops at the first array which is not accepted, as the arrays after it
+        would otherwise start without waiting for the ones before.
         """
 
-        for task in self.task_list:
-            self._submit_job(task)
+        if not self.task_list:
+            return
+
+        task_file, script = self._write_task_file()
+
+        job_id = None
+        for offset in range(0, len(self.task_list), self.max_array_size):
+            size = min(self.max_array_size, len(self.task_list) - offset)
+            job_id = self._submit_array(task_file, script, offset, size, after=job_id)
+
+    def _write_task_file(self) -> tuple:
+        """
+        Write the task list and the array task script to the task directory
+
+        :return: Paths to the task file and script
+        """
+        os.makedirs(self.task_dir, exist_ok=True)
+        os.makedirs('lotus_errors', exist_ok=True)
+
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        task_file = os.path.abspath(os.path.join(self.task_dir, f'tasks_{timestamp}.txt'))
+        script = os.path.abspath(os.path.join(self.task_dir, 'lotus_array_task.sh'))
+
+        with open(task_file, 'w') as writer:
+            writer.writelines(task + '\n' for task in self.task_list)
 
-    def _submit_job(self, task: str) -> None:
+        with open(script, 'w') as writer:
+            writer.write(ARRAY_TASK_SCRIPT)
+        os.chmod(script, 0o755)
+
+        return task_file, script
+
+    def _submit_array(self, task_file: str, script: str, offset: int, size: int,
+                      after: Optional[str] = None) -> str:
         """
-        Submit the job to LOTUS
-        :param task: Task to submit
+        Submit a job array running the lines offset to offset + size of the task file
+
+        :param task_file: Path to the task file
+        :param script: Path to the array task script
+        :param offset: Line of the task file run by array task 0
+        :param size: Number of tasks in the array
+        :param after: Id of the job array to wait for before starting
+        :return: Id of the submitted job array
+        :raises subprocess.CalledProcessError: If the array is not accepted
         """
 
         if self.queue == 'short-serial':
@@ -115,11 +190,30 @@ class LotusRunner:
         else:
             wall_time = '48:00:00'
 
-        command = f'sbatch -p {self.queue} -t {wall_time} -e lotus_errors/%j.err {task}'
+        array = f'0-{size - 1}'
+        if self.throttle:
+            array += f'%{self.throttle}'
+
+        command = f'{self.sbatch} --parsable -p {self.queue} -t {wall_time} --array={array}' \
+                  f' -o lotus_errors/%A_%a.out -e lotus_errors/%A_%a.err'
+        if after:
+            command += f' --dependency=afterany:{after}'
+        command += f' {script} {task_file} {offset}'
 
         print(f'Executing command: {command}')
 
-        subprocess.call(command, shell=True)
+        try:
+            output = subprocess.check_output(command, shell=True, universal_newlines=True)
+        except subprocess.CalledProcessError as ex:
+            logger.error(f'Job array submission failed: {ex}')
+            raise
+
+        # --parsable prints the job id, followed by the cluster name on multi-cluster systems
+        job_id = output.strip().split(';')[0]
+        if not job_id:
+            raise RuntimeError(f'No job id returned by: {command}')
+
+        return job_id
 
     def read_task_file(self, filename: str) -> None:
         """
@@ -152,7 +246,8 @@ class LotusRunner:
     def run_tasks_file_in_lotus(self, filename: str) -> None:
         """
         Load the tasks from file and run in lotus
-        scheduler
+        scheduler. The file is only removed once every
+        array has been accepted.
 
         :param filename: Path to file containing list of tasks
         """
@@ -164,20 +259,278 @@ class LotusRunner:
         self.remove_task_file(filename)
 
 
+def get_lotus_runner(config: dict, queue: str = 'short-serial') -> LotusRunner:
+    """
+    Create a LotusRunner from the [lotus] section of the configuration
+
+    :param config: Configuration dictionary
+    :param queue: LOTUS queue to submit to
+    :return: LotusRunner
+    """
+    lotus = config.get('lotus', {})
+
+    return LotusRunner(queue=queue,
+                       throttle=lotus.get('array-throttle'),
+                       sbatch=lotus.get('sbatch', 'sbatch'),
+                       task_dir=lotus.get('task-dir', 'lotus_tasks'),
+                       max_array_size=lotus.get('max-array-size', 1000))
+
+
+class LocalRunner:
+    """
+    Class to handle running of tasks in parallel on the local host
+
+    Each task is a shell command. Up to workers tasks run at the same
+    time, each writing its output to its own log file in a directory
+    made for the run under log_dir. Tasks which exit with an error are
+    run again, up to retries times.
+    """
+
+    def __init__(self, workers: Optional[int] = None, retries: int = 0, log_dir: str = 'localhost_logs'):
+        """
+        :param workers: Maximum number of tasks running at the same time, 0 for the number of CPUs
+        :param retries: Number of times a failed task is run again
+        :param log_dir: Directory to write the logs of each run to
+        """
+        self.workers = int(workers or 0) or os.cpu_count() or 1
+        self.retries = int(retries)
+        self.log_dir = log_dir
+
+    def _run_task(self, index: int, task: str, run_log_dir: str) -> int:
+        """
+        Run a task until it succeeds or it has been retried too many times
+
+        :param index: Position of the task in the task list
+        :param task: Command to run
+        :param run_log_dir: Directory to write the log of the task to
+        :return: Exit code of the last attempt
+        """
+        log_path = os.path.join(run_log_dir, f'task_{index:06d}.log')
+
+        with open(log_path, 'w') as log:
+            for attempt in range(self.retries + 1):
+                log.write(f'Executing command (attempt {attempt + 1}): {task}\n')
+                log.flush()
+
+                exit_code = subprocess.call(task, shell=True, stdout=log, stderr=subprocess.STDOUT)
+
+                if exit_code == 0:
+                    break
+
+                logger.warning(f'Task {index} exited with {exit_code}, see {log_path}')
+
+        return exit_code
+
+    def run_tasks(self, task_list: list) -> List[int]:
+        """
+        Run the tasks on the local host
+
+        :param task_list: List of tasks to run
+        :return: Exit code of each task, in the order of the list
+        """
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        run_log_dir = os.path.join(self.log_dir, f'run_{timestamp}')
+        os.makedirs(run_log_dir)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self._run_task, i, task, run_log_dir) for i, task in enumerate(task_list)]
+
+            exit_codes = []
+            for i, future in enumerate(futures):
+                exit_codes.append(future.result())
+                print(f'Finished task {i + 1} of {len(task_list)}: exit code {exit_codes[-1]}')
+
+        failed = [i for i, code in enumerate(exit_codes) if code]
+        if failed:
+            print(f'{len(failed)} of {len(task_list)} tasks failed, see the logs in {run_log_dir}: {failed}')
+
+        return exit_codes
+
+
+def get_local_runner(config: dict) -> LocalRunner:
+    """
+    Create a LocalRunner from the [localhost] section of the configuration
+
+    :param config: Configuration dictionary
+    :return: LocalRunner
+    """
+    localhost = config.get('localhost', {})
+
+    return LocalRunner(workers=localhost.get('workers'),
+                       retries=localhost.get('retries', 0),
+                       log_dir=localhost.get('log-dir', 'localhost_logs'))
+
+
 class LDAPIdentifier:
     """
     Provides interface to interact with LDAP and get user names
     and group names. The results are cached, as this information
     doesn't change, to reduce load on LDAP.
+
+    When a cache file is given, all the users and groups are read from
+    LDAP in one bulk query and saved to the file, which is shared by all
+    the scanning jobs. The file is read instead of LDAP until it is older
+    than the cache TTL. The LDAP connection is only opened when needed.
     """
-    def __init__(self, **kwargs):
+
+    PEOPLE_BASE = 'ou=jasmin,ou=People,o=hpc,dc=rl,dc=ac,dc=uk'
+    GROUPS_BASE = 'ou=ceda,ou=Groups,o=hpc,dc=rl,dc=ac,dc=uk'
+
+    def __init__(self, cache_file: Optional[str] = None, cache_ttl: int = 86400, **kwargs):
         """
+        :param cache_file: Path to the shared uid/gid to name cache file
+        :param cache_ttl: Age in seconds after which the cache file is reloaded from LDAP
         :param kwargs: ldap3 Connection kwargs
         """
-        self.conn = ldap3.Connection(**kwargs)
+        self.connection_kwargs = kwargs
+        self._conn = None
+        self.cache_file = cache_file
+        self.cache_ttl = int(cache_ttl)
         self.users = {}
         self.groups = {}
 
+        if cache_file:
+            self.load_cache()
+
+    @property
+    def conn(self) -> ldap3.Connection:
+        """
+        LDAP connection, opened on first use.
+        """
+        if self._conn is None:
+            self._conn = ldap3.Connection(**self.connection_kwargs)
+
+        return self._conn
+
+    def _cache_is_fresh(self) -> bool:
+        """
+        :return: True if the cache file exists and is younger than the TTL
+        """
+        try:
+            age = datetime.datetime.now().timestamp() - os.path.getmtime(self.cache_file)
+        except OSError:
+            return False
+
+        return age < self.cache_ttl
+
+    def _read_cache(self) -> bool:
+        """
+        Read the users and groups from the cache file.
+
+        :return: True if the file could be read
+        """
+        try:
+            with open(self.cache_file) as reader:
+                cache = json.load(reader)
+
+            self.users.update((int(uid), name) for uid, name in cache['users'].items())
+            self.groups.update((int(gid), name) for gid, name in cache['groups'].items())
+            return True
+
+        except FileNotFoundError:
+            return False
+
+        except (OSError, ValueError, KeyError) as ex:
+            logger.warning("Could not read LDAP cache file {}: {}".format(self.cache_file, ex))
+            return False
+
+    def load_cache(self) -> None:
+        """
+        Load the users and groups from the cache file, refreshing the file
+        from LDAP when it is missing or older than the TTL.
+
+        Only one job refreshes the file at a time, holding a lock on the
+        file next to it. While the refresh runs, or if LDAP can not be
+        reached, the other jobs carry on with the stale file.
+        """
+        if self._cache_is_fresh() and self._read_cache():
+            return
+
+        stale = os.path.exists(self.cache_file)
+
+        try:
+            lock = open("{}.lock".format(self.cache_file), 'a')
+        except OSError as ex:
+            logger.warning("Could not open LDAP cache lock file: {}".format(ex))
+            lock = None
+
+        try:
+            if lock is not None:
+                try:
+                    # Only wait for the job refreshing the file when there is nothing to read yet.
+                    fcntl.flock(lock, fcntl.LOCK_EX if not stale else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logger.info("LDAP cache file {} is being refreshed, using the stale file.".format(
+                        self.cache_file))
+                    self._read_cache()
+                    return
+
+                # Another job may have refreshed the file while this one waited.
+                if self._cache_is_fresh() and self._read_cache():
+                    return
+
+            try:
+                self.refresh_cache()
+            except LDAPException as ex:
+                logger.error("Could not load users and groups from LDAP: {}".format(ex))
+
+                if self._read_cache():
+                    logger.warning("Using the stale LDAP cache file {}.".format(self.cache_file))
+
+        finally:
+            if lock is not None:
+                lock.close()
+
+    def _bulk_query(self, search_base: str, object_class: str, id_attr: str, name_attr: str) -> dict:
+        """
+        Read all the entries of an object class in pages.
+
+        :return: Dictionary of id to name
+        """
+        names = {}
+        entries = self.conn.extend.standard.paged_search(
+            search_base,
+            f'(objectClass={object_class})',
+            attributes=[id_attr, name_attr],
+            paged_size=1000,
+            generator=True
+        )
+
+        for entry in entries:
+            if entry.get('type') != 'searchResEntry':
+                continue
+
+            attributes = entry['attributes']
+            number = attributes.get(id_attr)
+            name = attributes.get(name_attr)
+
+            if isinstance(name, list):
+                name = name[0] if name else None
+
+            if number is not None and name:
+                names[int(number)] = name
+
+        return names
+
+    def refresh_cache(self) -> None:
+        """
+        Load all the users and groups from LDAP and save them to the cache file.
+        The file is replaced atomically as other jobs may be reading it.
+        """
+        self.users.update(self._bulk_query(self.PEOPLE_BASE, 'posixAccount', 'uidNumber', 'uid'))
+        self.groups.update(self._bulk_query(self.GROUPS_BASE, 'posixGroup', 'gidNumber', 'cn'))
+
+        tmp_file = "{}.{}.tmp".format(self.cache_file, os.getpid())
+
+        try:
+            with open(tmp_file, 'w') as writer:
+                json.dump({'users': self.users, 'groups': self.groups}, writer)
+
+            os.replace(tmp_file, self.cache_file)
+
+        except OSError as ex:
+            logger.error("Could not write LDAP cache file {}: {}".format(self.cache_file, ex))
+
     def _process_result(self, key: str) -> Optional[str]:
         """
         Process LDAP response object and return the first value for the
@@ -221,13 +574,13 @@ class LDAPIdentifier:
 
         except KeyError:
             self._ldap_query(
-                'ou=jasmin,ou=People,o=hpc,dc=rl,dc=ac,dc=uk',
+                self.PEOPLE_BASE,
                 f'(&(objectClass=posixAccount)(uidNumber={uid}))',
                 attributes='uid',
                 size_limit=1
             )
 
-            result = self._process_result('uid')
+            result = self._process_result('uid') or uid
 
         finally:
             self.users[uid] = result
@@ -247,16 +600,16 @@ class LDAPIdentifier:
 
         except KeyError:
             self._ldap_query(
-                'ou=ceda,ou=Groups,o=hpc,dc=rl,dc=ac,dc=uk',
+                self.GROUPS_BASE,
                 f'(&(objectClass=posixGroup)(gidNumber={gid}))',
                 attributes='cn',
                 size_limit=1
             )
 
-            result = self._process_result('cn')
+            result = self._process_result('cn') or gid
 
         finally:
-            self.users[gid] = result
+            self.groups[gid] = result
 
         return result
 
@@ -268,8 +621,8 @@ class LDAPIdentifier:
         """
 
         # Try the cache to see if the user ID is stored
-        if self.users.get(uid):
-            return self.users.get(uid)
+        if uid in self.users:
+            return self.users[uid]
 
         # Try to get the username from the filesystem
         # If the names are not mounted for the uids then
@@ -285,8 +638,8 @@ class LDAPIdentifier:
         """
 
         # Try the cache
-        if self.groups.get(gid):
-            return self.users.get(gid)
+        if gid in self.groups:
+            return self.groups[gid]
 
         # Try to get the group name from file system.
         # If names not mounted, query LDAP direct
@@ -392,33 +745,45 @@ def get_settings(conf_path, args):
     return defaults
 
 
-def build_file_list(path):
+def iter_file_list(path, threads=8, follow_links=False):
     """
+    Walks the directory with several threads, hidden files and
+    directories and symbolic links to files are skipped.
+
     :param path : A file path
-    :return: List of files contained within the specified directory.
+    :param threads : Number of directories listed at the same time
+    :param follow_links : Whether to walk into symbolic links to directories
+    :return: Generator of files contained within the specified directory.
     """
-    
-    file_list = []
-    for root, _, files in os.walk(path):
-        for each_file in files:
-            if each_file[0] == ".": continue
-            if os.path.islink(each_file): continue
 
-            file_list.append(os.path.join(root, each_file))
+    return walk_files(path, threads=threads, follow_links=follow_links)
 
-    return file_list
 
+def build_file_list(path, threads=8, follow_links=False):
+    """
+    :param path : A file path
+    :param threads : Number of directories listed at the same time
+    :param follow_links : Whether to walk into symbolic links to directories
+    :return: PathStore of files contained within the specified directory.
+    """
+
+    return PathStore(iter_file_list(path, threads, follow_links))
 
-def write_list_to_file(task_list, filename):
-    with open(filename, 'w') as writer:
-        writer.writelines(
-            map(lambda x: x + "\n", task_list)
-        )
 
-    return len(task_list)
+def write_list_to_file(task_list, filename, index=True):
+    """
+    :param task_list : Iterable of lines to write
+    :param filename : Name of the file to write
+    :param index : Whether to write the line index used to read slices of the file
+    :returns: The number of lines written.
+    """
+    return file_lists.write_file_list(task_list, filename, index=index)
 
 
 def read_file_into_list(filename):
+    if file_lists.is_compact(filename):
+        return [path + "\n" for path in file_lists.iter_file_list(filename)]
+
     content = []
     with open(filename) as fd:
         for line in fd:
@@ -491,15 +856,13 @@ def find_dataset(filename, dataset_id):
 
 def find_num_lines_in_file(filename):
     """
+    The count is read from the line index of the file, which is
+    built first if the file does not have one.
+
     :param filename : Name of the file to be read.
     :returns: The number of lines in the given file.
     """
-    num_lines = 0
-
-    with open(filename) as infp:
-        for line in infp:
-            num_lines += 1
-    return num_lines
+    return file_lists.count_lines(filename)
 
 
 def valid_attr_length(name, value):
@@ -671,6 +1034,25 @@ def date2iso(date):
     return iso_date
 
 
+def stat_file(filename, file_stat=None):
+    """
+    Return the status of a file, following a symbolic link, along with
+    whether the path is a link. A plain file costs a single lstat call.
+
+    :param filename: Path to the file
+    :param file_stat: Result of os.lstat for the file, if already known
+    :return: Tuple of (os.stat_result, is_link)
+    :raises OSError: If the file or the target of the link cannot be read
+    """
+    if file_stat is None:
+        file_stat = os.lstat(filename)
+
+    if stat.S_ISLNK(file_stat.st_mode):
+        return os.stat(filename), True
+
+    return file_stat, False
+
+
 def calculate_md5(filename):
     hash_md5 = hashlib.md5()
     with open(filename, 'rb') as f:
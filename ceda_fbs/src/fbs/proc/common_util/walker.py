@@ -0,0 +1,190 @@
+"""
+Multi-threaded directory walker.
+
+On parallel and network file systems most of the time spent walking a tree
+is waiting for directory listings. The walker lists several directories at
+once with os.scandir from a pool of threads and streams the files found to
+the caller as each directory is read, so the caller can start working on
+the first files while the rest of the tree is still being walked.
+"""
+
+import os
+import queue
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Failure(object):
+    """
+    Carries an unexpected exception raised by a worker over to the caller.
+    """
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+class ParallelWalker(object):
+    """
+    Walks a directory tree with a pool of threads.
+
+    Hidden files and directories, whose names start with a dot, are skipped,
+    as are symbolic links to files. Symbolic links to directories are only
+    followed when requested, each directory is then walked once.
+
+    :param str path: Top of the directory tree
+    :param int threads: Number of directories listed at the same time
+    :param bool follow_links: Whether to walk into symbolic links to directories
+    :param bool include_hidden: Whether to return hidden files and walk hidden directories
+    :param int maxsize: Maximum number of directory listings waiting for the caller
+    """
+
+    _DONE = object()
+
+    def __init__(self, path, threads=8, follow_links=False, include_hidden=False, maxsize=1000):
+        self.path = path
+        self.threads = max(1, int(threads))
+        self.follow_links = follow_links
+        self.include_hidden = include_hidden
+
+        self._directories = queue.Queue()
+        self._results = queue.Queue(maxsize=int(maxsize))
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._visited = set()
+
+    def _put(self, item):
+        """
+        Put a result on the queue unless the caller has gone away.
+        """
+        while not self._stop.is_set():
+            try:
+                self._results.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _add_directory(self, path, dir_stat=None):
+        """
+        Queue a directory to be listed, once.
+        """
+        if self.follow_links:
+            try:
+                dir_stat = dir_stat or os.stat(path)
+            except OSError as ex:
+                logger.error("Could not read directory {}: {}".format(path, ex))
+                return
+
+            key = (dir_stat.st_dev, dir_stat.st_ino)
+
+            with self._lock:
+                if key in self._visited:
+                    return
+                self._visited.add(key)
+
+        with self._lock:
+            self._pending += 1
+
+        self._directories.put(path)
+
+    def _scan_directory(self, path):
+        """
+        List a directory, queueing its sub-directories and returning its files.
+        """
+        files = []
+
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if not self.include_hidden and entry.name.startswith('.'):
+                        continue
+
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            self._add_directory(entry.path)
+
+                        elif entry.is_symlink():
+                            if self.follow_links and entry.is_dir():
+                                self._add_directory(entry.path, entry.stat())
+
+                        elif entry.is_file(follow_symlinks=False):
+                            files.append(entry.path)
+
+                    except OSError as ex:
+                        logger.error("Could not read {}: {}".format(entry.path, ex))
+
+        except OSError as ex:
+            logger.error("Could not read directory {}: {}".format(path, ex))
+
+        return files
+
+    def _work(self):
+        while True:
+            path = self._directories.get()
+
+            if path is None or self._stop.is_set():
+                return
+
+            try:
+                files = self._scan_directory(path)
+
+                if files:
+                    files.sort()
+                    self._put(files)
+
+            except Exception as ex:
+                # Raised in the caller, which would otherwise wait for this directory forever.
+                self._put(_Failure(ex))
+
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                    finished = self._pending == 0
+
+                if finished:
+                    for _ in range(self.threads):
+                        self._directories.put(None)
+                    self._put(self._DONE)
+
+    def __iter__(self):
+        self._add_directory(self.path)
+
+        workers = [threading.Thread(target=self._work, name="walker-{}".format(i), daemon=True)
+                   for i in range(self.threads)]
+        for worker in workers:
+            worker.start()
+
+        try:
+            while True:
+                files = self._results.get()
+
+                if files is self._DONE:
+                    break
+
+                if isinstance(files, _Failure):
+                    raise files.exception
+
+                yield from files
+
+        finally:
+            self._stop.set()
+
+            # Wake up the workers waiting for a directory.
+            for _ in workers:
+                self._directories.put(None)
+
+
+def walk_files(path, threads=8, follow_links=False, include_hidden=False):
+    """
+    :param path: A directory path
+    :param threads: Number of directories listed at the same time
+    :param follow_links: Whether to walk into symbolic links to directories
+    :param include_hidden: Whether to return hidden files and walk hidden directories
+    :return: Generator of the paths of the files within the directory tree.
+    """
+    if not os.path.isdir(path):
+        return iter(())
+
+    return iter(ParallelWalker(path, threads, follow_links, include_hidden))
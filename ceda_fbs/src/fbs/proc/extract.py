@@ -7,18 +7,110 @@ import logging
 import os
 import hashlib
 import socket
+import stat
+import time
+import threading
 from elasticsearch.exceptions import TransportError
 from ceda_elasticsearch_tools.core.log_reader import SpotMapping
-from elasticsearch.helpers import bulk
 
 import ceda_fbs.proc.common_util.util as util
+from ceda_fbs.proc.common_util.scan_state import ScanStateStore
+from ceda_fbs.proc.common_util.pipeline import BufferedStage
+from ceda_fbs.proc.common_util.spot_mapping import SpotResolver
+from ceda_fbs.proc.common_util.spot_snapshot import load_spot_snapshot
+from ceda_fbs.proc.common_util.checkpoint import ScanCheckpoint, ProgressTracker
+import ceda_fbs.proc.common_util.file_list as file_lists
+from ceda_fbs.proc.common_util.path_store import PathStore
+from ceda_fbs.proc.common_util.timings import HandlerTimings
 import ceda_fbs.proc.file_handlers.handler_picker as handler_picker
+from ceda_fbs.proc.file_handlers.file_signatures import read_header
+from ceda_fbs.proc import sandbox
 from .es_iface.factory import ElasticsearchClientFactory
 from .es_iface import index
+from .es_iface.bulk_sender import BulkSender
+from .es_iface.flow_control import FlowController
+from .es_iface.dead_letter import DeadLetterFile
 
 # Suppress requests logging messages
 logging.getLogger("requests").setLevel(logging.WARNING)
 
+logger = logging.getLogger(__name__)
+
+# Handler picker used by the sandbox worker processes.
+_worker_handler_picker = None
+
+
+def extract_file_metadata(handler_factory, filename, level, calculate_md5=False, file_stat=None, timings=None):
+    """
+    Returns metadata from the given file. The file status is read once
+    here and handed to the handler.
+
+    :param handler_factory: HandlerPicker used to choose the file handler
+    :param filename: Path to the file to process
+    :param level: Level of detail to retrieve
+    :param calculate_md5: Whether to calculate the md5 checksum of the file
+    :param file_stat: Result of util.stat_file or os.lstat for the file, if already known
+    :param timings: HandlerTimings to which the time taken by the handler is added
+    :return: Tuple of metadata returned by the handler or None
+    """
+    try:
+        if not isinstance(file_stat, tuple):
+            file_stat = util.stat_file(filename, file_stat)
+        file_stats, is_link = file_stat
+    except OSError:
+        file_stats, is_link = None, False
+
+    if file_stats is None or not stat.S_ISREG(file_stats.st_mode):
+        logger.error("{} Is not a file.".format(filename))
+        return None
+
+    try:
+        # Level 1 only reads the file status, so most files are not sniffed.
+        header = read_header(filename) if handler_factory.needs_header(filename, level) else None
+        handler = handler_factory.pick_best_handler(filename, header, sniff=header is not None)
+
+        if handler is not None:
+            start = time.monotonic()
+            handler_inst = handler(filename, level,
+                                   calculate_md5=calculate_md5,
+                                   file_stat=file_stats,
+                                   is_link=is_link,
+                                   header=header)  # Can this done within the HandlerPicker class.
+            metadata = handler_inst.get_metadata()
+            logger.debug("{} was read using handler {}.".format(filename, handler_inst.handler_id))
+
+            if timings is not None:
+                timings.add(handler.__name__, level, time.monotonic() - start, file_stats.st_size)
+
+            return metadata
+
+        else:
+            logger.error("{} could not be read by any handler.".format(filename))
+            return None
+
+    except Exception as ex:
+        logger.error("Could not process file: {}".format(ex))
+
+
+def _init_worker():
+    """
+    Initialise a sandbox worker process with its own handler picker.
+    """
+    global _worker_handler_picker
+    _worker_handler_picker = handler_picker.HandlerPicker()
+
+
+def _extract_in_worker(filename, level, calculate_md5, file_stat=None):
+    """
+    Extract the metadata for a single file inside a worker process.
+
+    :return: Tuple of the metadata and the HandlerTimings of the file
+    """
+    timings = HandlerTimings()
+    metadata = extract_file_metadata(_worker_handler_picker, filename, level, calculate_md5, file_stat, timings)
+
+    return metadata, timings
+
 
 class ExtractSeq(object):
     """
@@ -31,6 +123,7 @@ class ExtractSeq(object):
 
         self.configuration = conf
         self.logger = None
+        self.log_file = None
         self.handler_factory_inst = None
         self.file_list = []
 
@@ -38,15 +131,21 @@ class ExtractSeq(object):
         self.dataset_id = None
         self.dataset_dir = None
 
-        # Spot data
-        self.spots = SpotMapping(spot_file='ceda_all_datasets.ini')
+        # Spot data, loaded on first use.
+        self.spot_file = self.conf("scanning").get("spot-file", "ceda_all_datasets.ini")
+        self.spot_snapshot = self.conf("scanning").get("spot-snapshot")
+        self._spot_resolver = None
 
         # LDAP lookup
-        ldap_hosts = self.conf('ldap-configuration')['hosts'].split(',')
-        self.ldap_interface = util.LDAPIdentifier(server=ldap_hosts, auto_bind=True)
+        ldap_conf = self.conf('ldap-configuration')
+        ldap_hosts = ldap_conf['hosts'].split(',')
+        self.ldap_interface = util.LDAPIdentifier(cache_file=ldap_conf.get('cache-file'),
+                                                  cache_ttl=ldap_conf.get('cache-ttl', 86400),
+                                                  server=ldap_hosts, auto_bind=True)
 
         # Define constants
         self.blocksize = 800
+        self.mget_blocksize = 2000
         self.FILE_PROPERTIES_ERROR = "0"
         self.FILE_INDEX_ERROR = "-1"
         self.FILE_INDEXED = "1"
@@ -55,11 +154,39 @@ class ExtractSeq(object):
         self.database_errors = 0
         self.files_properties_errors = 0
         self.files_indexed = 0
+        self.files_unchanged = 0
         self.total_number_of_files = 0
 
+        # Incremental scan state, the store is written to by the thread indexing the documents.
+        self.scan_state = None
+        self._file_state = {}
+        self._state_records = []
+
+        # File status read while selecting the files, reused by the extraction.
+        self._file_stats = {}
+
+        # Time taken by the handlers, added to the timings file used by the job planner.
+        self.timings = HandlerTimings()
+
         # Database connection information.
         self.es_index = self.conf("es-configuration")["es-index"]
 
+        # Number of items held between the stages of the scan.
+        self.queue_size = int(self.conf("scanning").get("queue-size", 1000))
+
+        # Handlers run in supervised worker processes when a per-file timeout is set.
+        self.file_timeout = float(self.configuration.get("file-timeout") or 0)
+        self.files_per_worker = 4
+        self.quarantine = None
+
+        # Progress of a file list slice, see read_dataset_from_file_and_scan.
+        self.checkpoint = None
+        self.checkpoint_interval = float(self.conf("scanning").get("checkpoint-interval", 60))
+        self._checkpoint_offset = 0
+        self._checkpoint_time = 0
+        self._progress = None
+        self._stop_event = threading.Event()
+
     # General purpose methods
     def conf(self, conf_opt):
         """
@@ -72,9 +199,9 @@ class ExtractSeq(object):
             raise AttributeError(
                 "Mandatory configuration option not found: %s" % conf_opt)
 
-    def read_dataset(self):
+    def find_dataset_dir(self):
         """
-        Returns the files contained within a dataset.
+        Sets the directory of the dataset being scanned.
         """
 
         datasets_file = self.conf("filename")
@@ -85,37 +212,322 @@ class ExtractSeq(object):
         self.logger.debug(f'Datset directory: {self.dataset_dir}')
         print(f'Datset directory: {self.dataset_dir}')
 
-        if self.dataset_dir is not None:
+        return self.dataset_dir
+
+    def read_dataset(self):
+        """
+        Returns the files contained within a dataset.
+        """
+
+        if self.find_dataset_dir() is not None:
             self.logger.debug("Scannning files in directory {}.".format(self.dataset_dir))
-            return util.build_file_list(self.dataset_dir)
+            return util.build_file_list(self.dataset_dir, **self._walk_options())
         else:
             return None
 
-    def process_file_seq(self, filename, level):
+    def _walk_options(self):
         """
-        Returns metadata from the given file.
+        Returns the options of the directory walk.
         """
-        calculate_md5 = self.conf("calculate_md5")
-        if not os.path.isfile(filename):
-            self.logger.error("{} Is not a file.".format(filename))
+        return {
+            "threads": int(self.conf("scanning").get("walk-threads", 8)),
+            "follow_links": bool(self.configuration.get("followlinks"))
+        }
+
+    def walk_dataset(self):
+        """
+        Returns a generator of the files contained within a dataset,
+        counting them as they are found.
+        """
+
+        if self.find_dataset_dir() is None:
             return None
 
-        try:
-            handler = self.handler_factory_inst.pick_best_handler(filename)
+        self.logger.debug("Scannning files in directory {}.".format(self.dataset_dir))
+
+        def count_files(file_list):
+            for file in file_list:
+                self.total_number_of_files += 1
+                yield file
+
+        return count_files(util.iter_file_list(self.dataset_dir, **self._walk_options()))
 
-            if handler is not None:
-                handler_inst = handler(filename, level,
-                                       calculate_md5=calculate_md5)  # Can this done within the HandlerPicker class.
-                metadata = handler_inst.get_metadata()
-                self.logger.debug("{} was read using handler {}.".format(filename, handler_inst.handler_id))
-                return metadata
+    def process_file_seq(self, filename, level, file_stat=None):
+        """
+        Returns metadata from the given file.
+        """
+        return extract_file_metadata(self.handler_factory_inst, filename, level,
+                                     calculate_md5=self.conf("calculate_md5"),
+                                     file_stat=file_stat,
+                                     timings=self.timings)
 
+    @property
+    def spot_resolver(self):
+        """
+        Spot lookup for the scanned files. The shared snapshot is used when
+        configured, it is rebuilt from the spot file if it is stale.
+        """
+        if self._spot_resolver is None:
+            if self.spot_snapshot:
+                self._spot_resolver = load_spot_snapshot(self.spot_snapshot, self.spot_file)
             else:
-                self.logger.error("{} could not be read by any handler.".format(filename))
-                return None
+                spots = SpotMapping(spot_file=self.spot_file)
+                self._spot_resolver = SpotResolver(spots.path2spotmapping)
 
-        except Exception as ex:
-            self.logger.error("Could not process file: {}".format(ex))
+        return self._spot_resolver
+
+    def request_stop(self):
+        """
+        Stop the scan as soon as possible. No more files are read from the
+        file list and the files waiting between the stages of the scan are
+        dropped, only the bulk requests already sent are completed. A file
+        still being read by a handler is not waited for. The files dropped
+        have not been acknowledged, so the checkpoint leaves them for the
+        next run of the job.
+        """
+        self._stop_event.set()
+
+    @property
+    def stop_requested(self):
+        return self._stop_event.is_set()
+
+    def _read_files(self, file_list):
+        """
+        Read the file list until a stop is requested, registering each file
+        with the progress tracker.
+        """
+        for file in file_list:
+            if self.stop_requested:
+                self.logger.info("Stop requested, no more files will be read.")
+                break
+
+            if self._progress is not None:
+                self._progress.add(file)
+
+            yield file
+
+    def _until_stopped(self, items):
+        """
+        Pass on the items from the previous stage of the scan until a stop is requested.
+        """
+        for item in items:
+            if self.stop_requested:
+                break
+
+            yield item
+
+    def _file_done(self, file):
+        """
+        Acknowledge a file which needs no further work.
+        """
+        if self._progress is not None:
+            self._progress.done(file)
+
+    def _save_checkpoint(self, force=False):
+        """
+        Record the offset in the file list below which all files have been
+        dealt with. Unless forced this is done at most once per checkpoint interval.
+        """
+        if self.checkpoint is None:
+            return
+
+        now = time.monotonic()
+        if not force and now - self._checkpoint_time < self.checkpoint_interval:
+            return
+
+        self.checkpoint.save(self._checkpoint_offset + self._progress.acknowledged)
+        self._checkpoint_time = now
+
+    @staticmethod
+    def create_id(filename):
+        """
+        Return the elasticsearch document id for a file.
+        """
+        return hashlib.sha1(str(filename).encode('utf-8')).hexdigest()
+
+    def _select_files(self, file_list, level):
+        """
+        Drop the files which have not changed since the last scan. Change
+        is detected using the local scan state store and/or the documents
+        already in the index. All files are selected when neither is enabled.
+
+        :param file_list: File list to operate on
+        :param level: Level of detail to retrieve
+        :return: Iterable of files which need to be scanned
+        """
+        if self.scan_state is not None:
+            file_list = self._select_from_scan_state(file_list, level)
+
+        if self.configuration.get("changed-only"):
+            file_list = self._select_from_index(file_list, level)
+
+        return file_list
+
+    def _select_from_scan_state(self, file_list, level):
+        """
+        Drop the files which match their record in the scan state store.
+        The records are read through a connection of its own, as this stage
+        runs in its own thread and SQLite connections can only be used by
+        the thread which opened them.
+        """
+        with ScanStateStore(self.scan_state.path) as scan_state:
+            for file in file_list:
+                try:
+                    file_stat, is_link = util.stat_file(file)
+                    # Picked by name so the state check does not read the file or import the handler.
+                    handler = self.handler_factory_inst.get_handler_name(file)
+                except Exception:
+                    # Let the extraction report the problem with the file.
+                    yield file
+                    continue
+
+                if scan_state.is_unchanged(file, file_stat, level, handler):
+                    self.files_unchanged += 1
+                    self._file_done(file)
+                    continue
+
+                self._file_state[file] = ScanStateStore.make_record(file, file_stat, level, handler)
+                self._file_stats[file] = (file_stat, is_link)
+                yield file
+
+    def _select_from_index(self, file_list, level):
+        """
+        Drop the files whose size and modification time match the document
+        already in the index, when it was indexed at the same or a higher
+        level. The documents are fetched in blocks with mget.
+        """
+        block = []
+
+        for file in file_list:
+            block.append(file)
+
+            if len(block) >= self.mget_blocksize:
+                yield from self._changed_in_index(block, level)
+                block = []
+
+        if block:
+            yield from self._changed_in_index(block, level)
+
+    def _changed_in_index(self, files, level):
+        """
+        Return the files from the block which are missing from the index,
+        have changed since they were indexed or were indexed at a lower level.
+
+        :param files: Block of files to check
+        :param level: Level of detail to retrieve
+        :return: Generator of files which need to be scanned
+        """
+        try:
+            response = self.es.mget(
+                index=self.es_index,
+                body={'ids': [self.create_id(file) for file in files]},
+                _source_includes=['info.last_modified', 'info.size', 'info.scan_level']
+            )
+        except TransportError as ex:
+            self.logger.error("Could not check files against the index, scanning them all: {}".format(ex))
+            yield from files
+            return
+
+        for file, doc in zip(files, response['docs']):
+
+            if not doc.get('found'):
+                yield file
+                continue
+
+            try:
+                file_stat, is_link = self._file_stats.get(file) or util.stat_file(file)
+            except OSError:
+                # Let the extraction report the problem with the file.
+                yield file
+                continue
+
+            info = doc['_source'].get('info', {})
+            last_modified = datetime.datetime.fromtimestamp(file_stat.st_mtime).isoformat()
+
+            # Documents indexed before the level was recorded are taken to be level 1.
+            if info.get('size') == file_stat.st_size and info.get('last_modified') == last_modified \
+                    and info.get('scan_level', 1) >= int(level):
+                self.files_unchanged += 1
+                self._file_stats.pop(file, None)
+                self._file_done(file)
+                continue
+
+            self._file_stats[file] = (file_stat, is_link)
+            yield file
+
+    def _extract_files(self, file_list, level):
+        """
+        Extract the metadata for each file in the list.
+
+        :param file_list: File list to operate on
+        :param level: Level of detail to retrieve
+        :return: Generator of (filename, metadata) tuples in file list order
+        """
+        if self.file_timeout:
+            yield from self._extract_in_sandbox(file_list, level, workers=1)
+            return
+
+        quarantine = self._get_quarantine()
+
+        for file in file_list:
+            # Only read the file system metadata of files which hung or crashed a handler before.
+            yield file, self.process_file_seq(file, "1" if file in quarantine else level,
+                                              file_stat=self._file_stats.pop(file, None))
+
+    def _get_quarantine(self):
+        """
+        Return the list of files which hung or crashed the handlers.
+        """
+        if self.quarantine is None:
+            quarantine_file = self.conf("scanning").get("quarantine-file") \
+                              or os.path.join(self.conf("core")["log-path"], "quarantine.txt")
+            self.quarantine = sandbox.QuarantineList(quarantine_file)
+
+        return self.quarantine
+
+    def _extract_in_sandbox(self, file_list, level, workers):
+        """
+        Extract the metadata in supervised worker processes. Files which hang
+        or crash a worker are added to the quarantine list and indexed at
+        level 1. Files already in the quarantine list are only read at level 1.
+
+        :param file_list: File list to operate on
+        :param level: Level of detail to retrieve
+        :param workers: Number of worker processes
+        :return: Generator of (filename, metadata) tuples in file list order
+        """
+        calculate_md5 = self.conf("calculate_md5")
+        quarantine = self._get_quarantine()
+
+        def tasks():
+            for file in file_list:
+                file_level = "1" if file in quarantine else level
+                yield file, (file, file_level, calculate_md5, self._file_stats.pop(file, None))
+
+        handler_sandbox = sandbox.HandlerSandbox(_extract_in_worker,
+                                                 workers=workers,
+                                                 timeout=self.file_timeout or None,
+                                                 initializer=_init_worker,
+                                                 max_pending=workers * self.files_per_worker)
+
+        for file, status, result in handler_sandbox.map(tasks()):
+
+            if status == sandbox.OK:
+                metadata, timings = result
+                for (handler, file_level), (files, seconds, size) in timings.totals.items():
+                    self.timings.add(handler, file_level, seconds, size, files)
+
+                yield file, metadata
+
+            elif status in (sandbox.TIMEOUT, sandbox.CRASHED):
+                self.logger.error("Handler {} on file {}, adding it to quarantine list {}.".format(
+                    "timed out" if status == sandbox.TIMEOUT else "crashed", file, quarantine.path))
+                quarantine.add(file, status)
+                yield file, self.process_file_seq(file, "1")
+
+            else:
+                self.logger.error("Could not process file {}: {}".format(file, result))
+                yield file, None
 
     def is_valid_result(self, result):
 
@@ -157,20 +569,35 @@ class ExtractSeq(object):
         return doc
 
     def _generate_action_list(self, file_list, level):
+        """
+        Build the documents to index. Reading the file list, selecting the
+        files to scan and extracting their metadata each run as a separate
+        stage of the pipeline, while the documents are completed with the
+        spot and LDAP information here.
+
+        :param file_list: File list to operate on
+        :param level: Level of detail to retrieve
+        :return: Generator of (filename, bulk action) tuples
+        """
 
         self.logger.debug("Bulk indexing results")
         start = datetime.datetime.now()
 
-        for file in file_list:
+        file_list = BufferedStage(self._read_files(file_list), self.queue_size, name="read",
+                                  stop_event=self._stop_event)
+        selected = BufferedStage(self._select_files(self._until_stopped(file_list), level),
+                                 self.queue_size, name="select", stop_event=self._stop_event)
+        extracted = BufferedStage(self._extract_files(self._until_stopped(selected), level),
+                                  self.queue_size, name="extract", stop_event=self._stop_event)
 
-            metadata = self.process_file_seq(file, level)
+        for file, metadata in self._until_stopped(extracted):
 
             if metadata is not None:
 
                 # Get spot info
-                spot = self.spots.get_spot(file)
+                spot = self.spot_resolver.get_spot(file)
 
-                es_id = hashlib.sha1(str(file).encode('utf-8')).hexdigest()
+                es_id = self.create_id(file)
 
                 body = self.create_body(metadata)
 
@@ -178,6 +605,9 @@ class ExtractSeq(object):
                 if spot is not None:
                     body['info']['spot_name'] = spot
 
+                # Lets a later scan at a higher level find the files it has to read again.
+                body['info']['scan_level'] = int(level)
+
                 uid = body['info']['user']
                 gid = body['info']['group']
 
@@ -189,13 +619,16 @@ class ExtractSeq(object):
                     '_id': es_id,
                     '_source': body
                 }
-                yield doc
+                yield file, doc
 
             else:
+                self._file_state.pop(file, None)
+
                 end = datetime.datetime.now()
                 self.logger.error("%s|%s|%s|%s ms" % (
                 os.path.basename(file), os.path.dirname(file), self.FILE_PROPERTIES_ERROR, str(end - start)))
                 self.files_properties_errors = self.files_properties_errors + 1
+                self._file_done(file)
 
     def bulk_index(self, file_list, level):
         """
@@ -205,7 +638,93 @@ class ExtractSeq(object):
         :return:
         """
 
-        bulk(self.es, self._generate_action_list(file_list, level))
+        es_conf = self.conf("es-configuration")
+        flow_controller = FlowController(max_chunk_bytes=es_conf.get("bulk-max-chunk-bytes", 20 * 1024 ** 2),
+                                         max_retries=int(es_conf.get("bulk-max-retries", 8)))
+        sender = BulkSender(self.es,
+                            threads=es_conf.get("bulk-threads", 4),
+                            chunk_size=es_conf.get("bulk-chunk-size", 500),
+                            flow_controller=flow_controller)
+
+        # Documents which still fail after the retries are kept for replay_dead_letters.py
+        dead_letters = DeadLetterFile(self.get_dead_letter_path(), serializer=self.es.transport.serializer)
+
+        actions = BufferedStage(self._generate_action_list(file_list, level), self.queue_size, name="enrich",
+                                stop_event=self._stop_event)
+
+        with dead_letters:
+            # The path read from the file list is kept with the action as it is the key of the scan progress.
+            for ok, file, action, result in sender.send_keyed(self._until_stopped(actions)):
+                info = action['_source']['info']
+                state_record = self._file_state.pop(file, None)
+
+                if ok:
+                    self.files_indexed += 1
+
+                    # Only record the scan state once the document has been indexed.
+                    if state_record is not None:
+                        self._state_records.append(state_record)
+
+                        if len(self._state_records) >= self.blocksize:
+                            self._update_scan_state()
+                else:
+                    self.database_errors += 1
+                    self.logger.error("%s|%s|%s|%s" % (
+                        info['name'], info['directory'], self.FILE_INDEX_ERROR, result.get('error')))
+                    dead_letters.write(action, result)
+
+                # The document is either indexed or kept in the dead-letter file.
+                self._file_done(file)
+                self._save_checkpoint()
+
+        self._update_scan_state()
+
+        if dead_letters.count:
+            self.logger.info("{} documents written to dead-letter file {}.".format(
+                dead_letters.count, dead_letters.path))
+
+    def get_dead_letter_path(self):
+        """
+        Return the path of the dead-letter file, next to the log file.
+        """
+        if self.log_file is None:
+            return "{}_{}.deadletter.ndjson".format(self.es_index, self.dataset_id)
+
+        return "{}.deadletter.ndjson".format(os.path.splitext(self.log_file)[0])
+
+    def save_timings(self):
+        """
+        Add the handler timings of this scan to the shared timings file, if configured.
+        """
+        timings_file = self.conf("scanning").get("timings-file")
+
+        if timings_file:
+            try:
+                self.timings.save(timings_file)
+            except Exception as ex:
+                self.logger.error("Could not save handler timings to {}: {}".format(timings_file, ex))
+
+    def get_checkpoint_path(self):
+        """
+        Return the path of the checkpoint file for the file list slice. Unlike
+        the log file it does not depend on the host so that a job resubmitted
+        to another node finds it.
+        """
+        checkpoint_fname = "%s__%s_%s_%s.checkpoint" % (self.conf("es-configuration")["es-index"],
+                                                         os.path.basename(self.conf("filename")),
+                                                         self.conf("start"),
+                                                         self.conf("num-files"))
+
+        return os.path.join(self.conf("core")["log-path"], checkpoint_fname)
+
+    def _update_scan_state(self):
+        """
+        Write the buffered scan state records to the store.
+        """
+        if self.scan_state is not None and self._state_records:
+            self.scan_state.update(self._state_records)
+
+        self._state_records = []
 
     def scan_files(self):
         """
@@ -231,16 +750,35 @@ class ExtractSeq(object):
 
         level = self.conf("level")
 
-        self.logger.debug("File list contains {} files.".format(len(self.file_list)))
-        if len(self.file_list) > 0:
-            self.bulk_index(self.file_list, level)
+        if "state-file" in self.configuration:
+            self.logger.debug("Incremental scan using state file {}.".format(self.conf("state-file")))
+            self.scan_state = ScanStateStore(self.conf("state-file"))
+
+        if isinstance(self.file_list, (list, PathStore)):
+            self.logger.debug("File list contains {} files.".format(len(self.file_list)))
+
+        self.bulk_index(self.file_list, level)
 
+        if self.total_number_of_files > 0:
             # At the end print some statistical info.
             logging.getLogger().setLevel(logging.INFO)
             self.logger.info("Summary information for Dataset id : %s, files indexed : %s, database errors : %s,"
-                             " properties errors : %s, total files : %s "
+                             " properties errors : %s, total files : %s , files unchanged : %s "
                              % (self.dataset_id, str(self.files_indexed), str(self.database_errors),
-                                str(self.files_properties_errors), str(self.total_number_of_files)))
+                                str(self.files_properties_errors), str(self.total_number_of_files),
+                                str(self.files_unchanged)))
+
+        if self.scan_state is not None:
+            self.scan_state.close()
+
+        self.save_timings()
+
+        if self.checkpoint is not None:
+            if self.stop_requested:
+                self._save_checkpoint(force=True)
+                self.logger.info("Scan stopped, checkpoint written to {}.".format(self.checkpoint.path))
+            else:
+                self.checkpoint.remove()
 
     def prepare_logging_sdf(self):
         """
@@ -270,6 +808,7 @@ class ExtractSeq(object):
         logging.root.handlers = []
 
         logging.basicConfig(filename=fpath, filemode="a+", format=log_format, level=level)
+        self.log_file = fpath
 
         es_log = logging.getLogger("elasticsearch")
         es_log.setLevel(logging.ERROR)
@@ -328,6 +867,7 @@ class ExtractSeq(object):
 
         logging.root.handlers = []
         logging.basicConfig(filename=fpath, filemode="a+", format=log_format, level=level)
+        self.log_file = fpath
 
         es_log = logging.getLogger("elasticsearch")
         es_log.setLevel(logging.ERROR)
@@ -362,10 +902,9 @@ class ExtractSeq(object):
         self.dataset_id = os.path.splitext(filename)[0]
         self.logger.debug("Dataset id is  {}.".format(self.dataset_id))
 
-        content = util.read_file_into_list(file_containing_paths)
-
-        self.total_number_of_files = len(content)
-        self.logger.debug("{} lines read from file {}.".format((len(content)), file_containing_paths))
+        # Only the slice of the list scanned by this job is read, using the line index of the list.
+        self.total_number_of_files = util.find_num_lines_in_file(file_containing_paths)
+        self.logger.debug("{} lines in file {}.".format(self.total_number_of_files, file_containing_paths))
 
         if int(start_file) < 0 or int(start_file) > self.total_number_of_files:
             self.logger.error("Please correct start parameter value.")
@@ -376,13 +915,23 @@ class ExtractSeq(object):
             self.logger.error("Please correct num-files parameter value because it is out of range.")
             return
 
-        file_list = content[int(start_file):end_file]
-        content = None
+        # Carry on from where a previous run of this job stopped.
+        self.checkpoint = ScanCheckpoint(self.get_checkpoint_path(), file_containing_paths, start_file, num_of_files)
+        resume_offset = self.checkpoint.load()
+
+        if resume_offset is not None and int(start_file) <= resume_offset <= end_file:
+            self.logger.info("Resuming from line {} using checkpoint {}.".format(resume_offset, self.checkpoint.path))
+        else:
+            resume_offset = int(start_file)
+
+        self._checkpoint_offset = resume_offset
+        self._checkpoint_time = time.monotonic()
+        self._progress = ProgressTracker()
 
-        self.logger.debug("{} files copied in local file list.".format(len(file_list)))
+        self.file_list = PathStore(path.rstrip() for path in
+                                   file_lists.iter_slice(file_containing_paths, resume_offset, end_file))
 
-        for path in file_list:
-            self.file_list.append(path.rstrip())
+        self.logger.debug("{} files copied in local file list.".format(len(self.file_list)))
 
         # at the end extract metadata.
         self.scan_files()
@@ -424,6 +973,7 @@ class ExtractSeq(object):
                             format=log_format,
                             level=level
                             )
+        self.log_file = fpath
         """
         extract_logger = logging.getLogger(__name__)
 
@@ -453,8 +1003,36 @@ class ExtractSeq(object):
         self.logger.debug("***Scanning started.***.")
         self.handler_factory_inst = handler_picker.HandlerPicker()
 
-        self.file_list = self.read_dataset()
-        self.total_number_of_files = len(self.file_list)
+        # Files are scanned as they are found by the directory walk.
+        self.file_list = self.walk_dataset()
 
         # Extract metadata.
         self.scan_files()
+
+
+class ExtractParallel(ExtractSeq):
+    """
+    File crawler and metadata extractor class.
+    Metadata extraction is spread over a pool of supervised worker
+    processes, the results are collected in file list order and indexed
+    from the main process.
+    """
+
+    def __init__(self, conf):
+        super().__init__(conf)
+
+        self.workers = int(self.conf("workers"))
+
+    def _extract_files(self, file_list, level):
+        """
+        Extract the metadata for each file in the list using the worker processes.
+        The number of files submitted ahead of the indexer is bounded so
+        that very long file lists do not all sit in memory.
+
+        :param file_list: File list to operate on
+        :param level: Level of detail to retrieve
+        :return: Generator of (filename, metadata) tuples in file list order
+        """
+        self.logger.debug("Extracting metadata with {} worker processes.".format(self.workers))
+
+        yield from self._extract_in_sandbox(file_list, level, workers=self.workers)
@@ -18,11 +18,16 @@ class BadcCsvFile(GenericFile):
         self.FILE_FORMAT = self.get_file_format()
 
     def get_file_format(self):
-        with open(self.file_path, encoding='utf-8', errors='ignore') as fp:
-            if 'BADC-CSV' in fp.readline():
-                return 'BADC CSV'
-            else:
-                return 'CSV'
+        if self.header is not None:
+            first_line = self.header.split(b'\n', 1)[0].decode('utf-8', errors='ignore')
+        else:
+            with open(self.file_path, encoding='utf-8', errors='ignore') as fp:
+                first_line = fp.readline()
+
+        if 'BADC-CSV' in first_line:
+            return 'BADC CSV'
+        else:
+            return 'CSV'
 
     def csv_parse(self, fp):
 
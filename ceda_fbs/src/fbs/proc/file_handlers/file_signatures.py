@@ -0,0 +1,69 @@
+"""
+Recognise the format of a file from its first bytes.
+
+The first block of the file is read once and checked against the signatures
+of the formats the handlers can read. The same bytes are then given to the
+handler, so detecting the format costs one small read per file.
+"""
+
+import re
+
+# Number of bytes read from the start of each file.
+HEADER_SIZE = 4096
+
+# (format, offset, signature) of the binary formats.
+SIGNATURES = [
+    ('netcdf', 0, b'CDF\x01'),
+    ('netcdf', 0, b'CDF\x02'),
+    ('netcdf', 0, b'CDF\x05'),
+    ('hdf5', 0, b'\x89HDF\r\n\x1a\n'),
+    # HDF5 files may start with a user block of 512 bytes or a larger power of two.
+    ('hdf5', 512, b'\x89HDF\r\n\x1a\n'),
+    ('hdf5', 1024, b'\x89HDF\r\n\x1a\n'),
+    ('hdf5', 2048, b'\x89HDF\r\n\x1a\n'),
+    ('hdf4', 0, b'\x0e\x03\x13\x01'),
+    ('grib', 0, b'GRIB'),
+    ('zip', 0, b'PK\x03\x04'),
+]
+
+BADC_CSV_CONVENTION = b'Conventions,G,BADC-CSV'
+
+# First line of a NASA Ames file: number of header lines and the file format index.
+NASA_AMES_FIRST_LINE = re.compile(rb'^\s*(\d+)\s+(\d{4})\s*\r?$')
+NASA_AMES_FFI = {1001, 1010, 1020, 2010, 2110, 2160, 2310, 3010, 4010}
+
+
+def read_header(filename, size=HEADER_SIZE):
+    """
+    :param filename: Path to the file
+    :param size: Number of bytes to read
+    :return: The first size bytes of the file, empty if it can not be read
+    """
+    try:
+        with open(filename, 'rb') as reader:
+            return reader.read(size)
+    except (IOError, OSError):
+        return b''
+
+
+def sniff_format(header):
+    """
+    :param bytes header: First bytes of a file, from read_header
+    :return: Name of the format of the file, None if it is not recognised
+    """
+    if not header:
+        return None
+
+    for file_format, offset, signature in SIGNATURES:
+        if header.startswith(signature, offset):
+            return file_format
+
+    if BADC_CSV_CONVENTION in header:
+        return 'badc-csv'
+
+    first_line = header.split(b'\n', 1)[0]
+    match = NASA_AMES_FIRST_LINE.match(first_line)
+    if match and int(match.group(2)) in NASA_AMES_FFI:
+        return 'nasa-ames'
+
+    return None
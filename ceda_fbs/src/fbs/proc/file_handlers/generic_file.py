@@ -1,4 +1,5 @@
 import os
+import stat
 import datetime
 
 import ceda_fbs.proc.common_util.util as util
@@ -15,18 +16,38 @@ class GenericFile(object):
         "3": 'get_metadata_level3',
     }
 
-    def __init__(self, file_path, level, calculate_md5=False):
+    def __init__(self, file_path, level, calculate_md5=False, file_stat=None, is_link=None, header=None):
+        """
+        :param file_path: Path to the file
+        :param level: Level of detail to retrieve
+        :param calculate_md5: Whether to calculate the md5 checksum of the file
+        :param file_stat: os.stat or os.lstat result of the file, if already known
+        :param is_link: Whether the path is a symbolic link, required with an os.stat result
+        :param header: First bytes of the file, if already read by the HandlerPicker
+        """
         self.file_path = file_path
         self.level = str(level)
         self.handler_id = None
         self.calculate_md5 = calculate_md5
+        self.file_stat = file_stat
+        self.is_link = is_link
+        self.header = header
+
+    def _get_file_stat(self):
+        """
+        Return the status of the file and whether it is a link, using the
+        status given to the handler when there is one.
+        """
+        if self.file_stat is None or self.is_link is None:
+            self.file_stat, self.is_link = util.stat_file(self.file_path, self.file_stat)
+
+        return self.file_stat, self.is_link
 
     def _get_file_ownership(self):
 
-        uid = os.stat(self.file_path).st_uid
-        gid = os.stat(self.file_path).st_gid
+        file_stats, _ = self._get_file_stat()
 
-        return uid, gid
+        return file_stats.st_uid, file_stats.st_gid
 
     def get_metadata_level1(self):
         """
@@ -37,19 +58,21 @@ class GenericFile(object):
 
         self.handler_id = "Generic level 1."
 
-        #Do the basic checking, if file exists 
-        #and that it is not a symbolic link.
-        if ( self.file_path is None
-             or not os.path.isfile(self.file_path)
-             # or os.path.islink(self.file_path)
-           ):
+        #Do the basic checking, if file exists.
+        if self.file_path is None:
+            return None
+
+        try:
+            file_stats, is_link = self._get_file_stat()
+        except OSError:
+            return None
+
+        if not stat.S_ISREG(file_stats.st_mode):
             return None
 
         file_info = {}
         info = {}
 
-        file_stats = os.stat(self.file_path)
-
         #Basic information. 
         info["name"] = os.path.basename(self.file_path) #ntpath.basename(file_path)
         info["name_auto"] = info["name"]
@@ -60,11 +83,11 @@ class GenericFile(object):
         info["user"] = uid
         info["group"] = gid
 
-        info["is_link"] = os.path.islink(self.file_path)
+        info["is_link"] = is_link
 
         info["last_modified"] = datetime.datetime.fromtimestamp(file_stats.st_mtime).isoformat()
 
-        info["size"] = os.path.getsize(self.file_path)
+        info["size"] = file_stats.st_size
 
         file_type = os.path.splitext(info["name"])[1]
         if len(file_type) == 0:
@@ -1,128 +1,151 @@
 import os
-import re
-import magic as magic_number_reader
-import six
-
-import ceda_fbs.proc.common_util.util as util
-from ceda_fbs.proc.common_util.util import FileFormatError
-import .generic_file as generic_file
-import .netcdf_file as netcdf_file
-import .nasaames_file as nasaames_file
-import .pp_file as pp_file
-import .grib_file as grib_file
-import .esasafe_file as esasafe_file
-import .kmz_file as kmz_file
-import .hdf_file as hdf_file
-import .badc_csv_file as badc_csv_file
-import .metadata_tags_json_file as metadata_tags_json_file
+import logging
+import importlib
+from importlib.metadata import entry_points
+
+from .file_signatures import read_header, sniff_format
+
+logger = logging.getLogger(__name__)
+
+# Entry point group of the handlers provided by other packages. The name of
+# each entry point is the file extension it handles, e.g.
+#   [tool.poetry.plugins."ceda_fbs.handlers"]
+#   ".xyz" = "my_package.xyz_file:XyzFile"
+ENTRY_POINT_GROUP = 'ceda_fbs.handlers'
 
 
 class HandlerPicker(object):
     """
     Returns a file handler for the supplied file.
+
+    Handlers are given as 'module:Class' strings, modules relative to this
+    package, and only imported the first time a matching file is met, so
+    the libraries reading each format are not loaded until needed.
     """
 
     HANDLER_MAP = {
-        '.nc': netcdf_file.NetCdfFile,
-        '.na': nasaames_file.NasaAmesFile,
-        '.pp': pp_file.PpFile,
-        '.grb':  grib_file.GribFile,
-        '.grib': grib_file.GribFile,
-        '.manifest': esasafe_file.EsaSafeFile,
-        '.kmz': kmz_file.KmzFile,
-        '.hdf': hdf_file.HdfFile
+        '.nc': '.netcdf_file:NetCdfFile',
+        '.csv': '.badc_csv_file:BadcCsvFile',
+        '.na': '.nasaames_file:NasaAmesFile',
+        '.pp': '.pp_file:PpFile',
+        '.grb': '.grib_file:GribFile',
+        '.grib': '.grib_file:GribFile',
+        '.manifest': '.esasafe_file:EsaSafeFile',
+        '.kmz': '.kmz_file:KmzFile',
+        '.hdf': '.hdf_file:HdfFile'
     }
 
-    def __init__(self):
-        self.handlers_and_dirs = {}
-        self.NETCDF_PYTHON_MAGIC_NUM_RES = "NetCDF Data Format data"
-        self.ASCII_PYTHON_MAGIC_NUM_RES = "ASCII text"
-        self.DATA_PYTHON_MAGIC_NUM_RES = "data"
+    # Handlers for the formats recognised from the header of the file.
+    # Zip files are only handled when named .kmz.
+    FORMAT_MAP = {
+        'netcdf': '.netcdf_file:NetCdfFile',
+        'hdf4': '.hdf_file:HdfFile',
+        'grib': '.grib_file:GribFile',
+        'badc-csv': '.badc_csv_file:BadcCsvFile',
+        'nasa-ames': '.nasaames_file:NasaAmesFile',
+    }
 
-    def pick_best_handler(self, filename):
-        """
-        :param filename : the file to be scanned.
-        :returns handler: Returns an appropriate handler
-        for the given file.
-        """
+    # HDF5 files are only read as netCDF-4 when named as netCDF files,
+    # other HDF5 files, e.g. HDF-EOS5, are picked by their extension.
+    NETCDF4_EXTENSIONS = ('.nc', '.nc4')
+    NETCDF4_HANDLER = '.netcdf_file:NetCdfFile'
 
-        file_dir = os.path.dirname(filename)
-        file_basename = os.path.basename(filename)
+    # Extensions of the handlers which read the start of the file at every
+    # level, so the header is read for them at level 1 too and handed over.
+    HEADER_EXTENSIONS = ('.csv',)
 
-        if file_basename == "metadata_tags.json":
-            handler = metadata_tags_json_file.MetadataTagsJsonFile
+    GENERIC_HANDLER = '.generic_file:GenericFile'
+    METADATA_TAGS_HANDLER = '.metadata_tags_json_file:MetadataTagsJsonFile'
 
-        else:
-            # Try returning a handler based on file extension.
-            extension = os.path.splitext(filename)[1]
-            extension = extension.lower()
+    def __init__(self):
+        self.handler_map = dict(self.HANDLER_MAP)
+        self._handlers = {}
 
-            if extension == '.csv':
-                try:
-                    header = util.get_bytes_from_file(filename, 500)
-                    pattern_to_search = "Conventions,G,BADC-CSV"
-                    res = header.find(pattern_to_search)
+        # Plugins are registered by name only, they are loaded like the other handlers.
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            extension = '.' + entry_point.name.lower().lstrip('.')
+            self.handler_map[extension] = entry_point
 
-                    if res != -1:
-                        handler = badc_csv_file.BadcCsvFile
-                    else:
-                        handler = generic_file.GenericFile
+    def get_handler(self, spec):
+        """
+        Import the handler the first time it is used.
 
-                except Exception:  # catch everything... if there is an error just return the generic handler.
-                    handler = generic_file.GenericFile
+        :param spec: 'module:Class' string or entry point
+        :returns: The handler class
+        """
+        handler = self._handlers.get(spec)
 
+        if handler is None:
+            if isinstance(spec, str):
+                module_name, class_name = spec.split(':')
+                handler = getattr(importlib.import_module(module_name, __package__), class_name)
             else:
-                handler = self.HANDLER_MAP.get(extension, generic_file.GenericFile)
+                handler = spec.load()
 
-        if handler is not None:
-            self.handlers_and_dirs[file_dir] = handler
-            return handler
+            logger.debug("Loaded handler {} for {}".format(handler.__name__, spec))
+            self._handlers[spec] = handler
 
-        # Try returning a handler based on file's magic number.
-        try:
-            res = magic_number_reader.from_file(filename)
+        return handler
 
-            if res == self.NETCDF_PYTHON_MAGIC_NUM_RES:
-                handler = netcdf_file.NetCdfFile
+    def needs_header(self, filename, level):
+        """
+        :param filename : the file to be scanned.
+        :param level : level of detail of the scan.
+        :returns: Whether to read the header of the file. Level 1 only
+        reads the file status, so the header is only read for the handlers
+        which would otherwise open the file themselves.
+        """
+        if str(level) != "1":
+            return True
 
-            elif res == self.ASCII_PYTHON_MAGIC_NUM_RES:
-                # ok lets see if it is a na file.
-                first_line = util.get_file_header(filename)
-                tokens = first_line.split(" ")
+        return os.path.splitext(filename)[1].lower() in self.HEADER_EXTENSIONS
 
-                if len(tokens) >= 2:
-                    if tokens[0].isdigit() and tokens[1].isdigit():
-                        handler = nasaames_file.NasaAmesFile
-                else:
-                    handler = generic_file.GenericFile
+    def get_handler_name(self, filename):
+        """
+        :param filename : the file to be scanned.
+        :returns: Name of the handler class picked from the name of the
+        file, without importing it.
+        """
+        if os.path.basename(filename) == "metadata_tags.json":
+            spec = self.METADATA_TAGS_HANDLER
+        else:
+            extension = os.path.splitext(filename)[1].lower()
+            spec = self.handler_map.get(extension, self.GENERIC_HANDLER)
 
-            # This can be a grb file.
-            elif res == self.DATA_PYTHON_MAGIC_NUM_RES:
-                res = util.get_bytes_from_file(filename, 4)
+        return spec.split(':')[1] if isinstance(spec, str) else spec.attr
 
-                if res == "GRIB":
-                    handler = grib_file.GribFile
-                else:
-                    handler = generic_file.GenericFile
+    def pick_best_handler(self, filename, header=None, sniff=True):
+        """
+        The format recognised from the header of the file takes precedence
+        over the extension, so misnamed files are still read.
 
-        except Exception:  # catch everything... if there is an error just return the generic handler.
-            handler = generic_file.GenericFile
+        :param filename : the file to be scanned.
+        :param header : the first bytes of the file, read here if not given.
+        :param sniff : whether to read the header, if False the handler is
+        picked from the name of the file only.
+        :returns handler: Returns an appropriate handler
+        for the given file.
+        """
 
-        if handler is not None:
-            self.handlers_and_dirs[file_dir] = handler
-            return handler
+        if os.path.basename(filename) == "metadata_tags.json":
+            return self.get_handler(self.METADATA_TAGS_HANDLER)
 
-        # Try to return last handler used in this directory.
-        if file_dir in self.handlers_and_dirs.keys():
-            handler = self.handlers_and_dirs[file_dir]
+        if header is None and sniff:
+            header = read_header(filename)
 
-        if handler is not None:
-            return handler
+        extension = os.path.splitext(filename)[1].lower()
+        file_format = sniff_format(header)
 
-        # Nothing worked, return the generic handler.
-        handler = generic_file.GenericFile
+        if file_format == 'hdf5' and extension in self.NETCDF4_EXTENSIONS:
+            spec = self.NETCDF4_HANDLER
+        else:
+            spec = self.FORMAT_MAP.get(file_format)
 
-        return handler
+        if spec is None:
+            # Fall back to the file extension.
+            spec = self.handler_map.get(extension, self.GENERIC_HANDLER)
+
+        return self.get_handler(spec)
 
     def __enter__(self):
         return self
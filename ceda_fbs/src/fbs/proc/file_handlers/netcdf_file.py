@@ -1,4 +1,6 @@
 import netCDF4
+import numpy as np
+import numpy.ma as ma
 import six
 from dateutil.parser import parse
 import re
@@ -11,6 +13,13 @@ import ceda_fbs.proc.common_util.geojson as geojson
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of values read from a variable at once when streaming through it.
+MAX_READ_SIZE = 1000000
+
+# Range of the latitude and longitude values kept when building the extent.
+LATITUDE_DOMAIN = (-90.0, 90.0)
+LONGITUDE_DOMAIN = (-180.0, 180.0)
+
 
 def time_order(time1, time2):
     """
@@ -47,6 +56,282 @@ def sanitise_float(value):
     return float(value)
 
 
+def iter_hyperslabs(variable, max_size=None):
+    """
+    Read a variable in slabs along its first dimension, each holding about
+    max_size values, so that memory stays bounded for large variables.
+
+    :param netCDF4.Variable variable: Variable to read
+    :param int max_size: Number of values to read at once, MAX_READ_SIZE by default
+    :return: Generator of masked arrays
+    """
+    max_size = max_size or MAX_READ_SIZE
+
+    if not variable.shape:
+        yield ma.atleast_1d(variable[...])
+        return
+
+    row_size = int(np.prod(variable.shape[1:])) or 1
+    step = max(1, max_size // row_size)
+
+    for start in range(0, variable.shape[0], step):
+        yield ma.asarray(variable[start:start + step])
+
+
+def is_coordinate_variable(variable):
+    """
+    CF coordinate variables are 1-D, named after their dimension and monotonic.
+
+    :param netCDF4.Variable variable: Variable to check
+    """
+    return variable.dimensions == (variable.name,)
+
+
+def get_bounds_variable(variable):
+    """
+    :param netCDF4.Variable variable: Coordinate variable
+    :return: The variable holding the cell bounds of the coordinate, None if there is none
+    """
+    bounds_name = getattr(variable, 'bounds', None)
+
+    if bounds_name:
+        return variable.group().variables.get(bounds_name)
+
+
+def read_ends(variable):
+    """
+    Read the first and last values of a monotonic coordinate, or the outer
+    edges of its cells when it has bounds.
+
+    :param netCDF4.Variable variable: 1-D coordinate variable
+    :return: Masked array of the values read
+    """
+    bounds = get_bounds_variable(variable)
+
+    if bounds is not None and bounds.ndim == 2 and bounds.shape[0] == variable.size:
+        return ma.concatenate([ma.atleast_1d(bounds[0]), ma.atleast_1d(bounds[-1])])
+
+    return ma.concatenate([ma.atleast_1d(variable[0]), ma.atleast_1d(variable[-1])])
+
+
+def in_domain(values, domain):
+    """
+    :return: True if all the values are set and within the (min, max) domain
+    """
+    return not ma.is_masked(values) and bool(np.all((values >= domain[0]) & (values <= domain[1])))
+
+
+def normalise_longitudes(values):
+    """
+    Move longitudes from the 0 to 360 convention into -180 to 180.
+    """
+    return ma.where(values > 180.0, values - 360.0, values)
+
+
+class LongitudeExtent(object):
+    """
+    Streaming summary of longitude values.
+
+    Keeps the smallest and largest value seen in each 1 degree band, so
+    the gaps between bands, used to place the bounding box around the
+    antimeridian, are kept while memory stays at 360 bands.
+    """
+
+    def __init__(self):
+        self.band_min = np.full(360, np.inf)
+        self.band_max = np.full(360, -np.inf)
+
+    def add(self, values):
+        """
+        :param values: Array of longitudes, masked values are ignored
+        """
+        values = np.asarray(ma.compressed(normalise_longitudes(ma.asarray(values, dtype=float))))
+        values = values[(values >= LONGITUDE_DOMAIN[0]) & (values <= LONGITUDE_DOMAIN[1])]
+
+        bands = np.clip(np.floor(values).astype(int) + 180, 0, 359)
+        np.minimum.at(self.band_min, bands, values)
+        np.maximum.at(self.band_max, bands, values)
+
+    def values(self):
+        """
+        :return: Array of the smallest and largest longitude of each band
+        """
+        used = np.isfinite(self.band_min)
+        return np.concatenate([self.band_min[used], self.band_max[used]])
+
+
+class LatitudeExtent(object):
+    """
+    Streaming minimum and maximum of latitude values.
+    """
+
+    def __init__(self):
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values):
+        """
+        :param values: Array of latitudes, masked values are ignored
+        """
+        values = np.asarray(ma.compressed(ma.asarray(values, dtype=float)))
+        values = values[(values >= LATITUDE_DOMAIN[0]) & (values <= LATITUDE_DOMAIN[1])]
+
+        if values.size:
+            self.min = min(self.min, values.min())
+            self.max = max(self.max, values.max())
+
+    def values(self):
+        """
+        :return: Array of the smallest and largest latitude
+        """
+        if np.isfinite(self.min):
+            return np.array([self.min, self.max])
+        return np.array([])
+
+
+def get_coordinate_extent(variable, longitude=False):
+    """
+    Return a small set of values spanning the extent of a latitude or
+    longitude variable, reading as little of it as possible:
+
+    1. the actual_range attribute
+    2. the end points, or outer cell bounds, of a 1-D coordinate variable
+    3. the minimum and maximum, streamed through the variable in slabs
+
+    Values outside the valid_min, valid_max or valid_range attributes are
+    masked by netCDF4 when reading and so ignored.
+
+    :param netCDF4.Variable variable: Latitude or longitude variable
+    :param bool longitude: Whether the variable holds longitudes
+    :return: numpy array of values
+    """
+    domain = LONGITUDE_DOMAIN if longitude else LATITUDE_DOMAIN
+
+    if variable.size == 0:
+        return np.array([])
+
+    actual_range = getattr(variable, 'actual_range', None)
+    if actual_range is not None and np.size(actual_range) == 2:
+        values = np.sort(np.asarray(actual_range, dtype=float).ravel())
+        if in_domain(values, domain):
+            return values
+
+    if is_coordinate_variable(variable):
+        values = read_ends(variable)
+        if in_domain(values, domain):
+            return np.array([values.min(), values.max()], dtype=float)
+
+    extent = LongitudeExtent() if longitude else LatitudeExtent()
+    for values in iter_hyperslabs(variable):
+        extent.add(values)
+
+    return extent.values()
+
+
+def read_perimeter(variable):
+    """
+    Read the four edges of a 2-D variable, going round the grid.
+
+    :param netCDF4.Variable variable: 2-D variable
+    :return: Masked array of the values on the edges, in order round the grid
+    """
+    rows, columns = variable.shape
+
+    if rows == 1 or columns == 1:
+        return ma.asarray(variable[:]).ravel()
+
+    top = ma.asarray(variable[0, :])
+    right = ma.asarray(variable[:, -1])
+    bottom = ma.asarray(variable[-1, :])
+    left = ma.asarray(variable[:, 0])
+
+    return ma.concatenate([top, right[1:], bottom[::-1][1:], left[::-1][1:-1]])
+
+
+def get_perimeter_extent(lat_variable, lon_variable):
+    """
+    Find the extent of a curvilinear grid, such as a satellite swath or a
+    rotated pole grid, from the edges of its 2-D latitudes and longitudes.
+
+    A grid whose edge goes all the way round a pole covers the pole, so
+    its extent reaches the pole at every longitude.
+
+    :param netCDF4.Variable lat_variable: 2-D latitudes
+    :param netCDF4.Variable lon_variable: 2-D longitudes on the same grid
+    :return: Tuple of (latitudes, longitudes) arrays on the edges, None if the edges are mostly missing
+    """
+    lats = read_perimeter(lat_variable)
+    lons = normalise_longitudes(read_perimeter(lon_variable))
+
+    valid = ~(ma.getmaskarray(lats) | ma.getmaskarray(lons))
+    valid &= (lats >= LATITUDE_DOMAIN[0]).filled(False) & (lats <= LATITUDE_DOMAIN[1]).filled(False)
+    valid &= (lons >= LONGITUDE_DOMAIN[0]).filled(False) & (lons <= LONGITUDE_DOMAIN[1]).filled(False)
+
+    # Swaths with missing values along their edges do not give their extent.
+    if valid.sum() < len(valid) / 2.0:
+        return None
+
+    lats = np.asarray(lats[valid], dtype=float)
+    lons = np.asarray(lons[valid], dtype=float)
+
+    # Sum the steps in longitude round the closed edge: +-360 when it circles a pole.
+    steps = (np.diff(np.append(lons, lons[0])) + 180.0) % 360.0 - 180.0
+    if abs(steps.sum()) > 180.0:
+        pole = 90.0 if lats.mean() > 0 else -90.0
+        edge = lats.min() if pole > 0 else lats.max()
+        return np.array([edge, pole]), np.array(LONGITUDE_DOMAIN)
+
+    return lats, lons
+
+
+def get_time_range(variable):
+    """
+    Return the first and last times of a time variable, in its units,
+    reading as little of it as possible:
+
+    1. the end points, or outer cell bounds, of a 1-D coordinate variable
+    2. the minimum and maximum, streamed through the variable, or its
+       bounds, in slabs
+
+    :param netCDF4.Variable variable: Time variable
+    :return: numpy array of the first and last times, None if there are no times
+    """
+    if variable.size == 0:
+        return None
+
+    if is_coordinate_variable(variable):
+        values = read_ends(variable)
+        if not ma.is_masked(values):
+            return np.array([values.min(), values.max()])
+
+    bounds = get_bounds_variable(variable)
+    if bounds is not None:
+        variable = bounds
+
+    first, last = np.inf, -np.inf
+    for values in iter_hyperslabs(variable):
+        values = ma.compressed(values)
+        if values.size:
+            first = min(first, values.min())
+            last = max(last, values.max())
+
+    if np.isfinite(first):
+        return np.array([first, last])
+
+
+def pair_coordinates(lats, lons):
+    """
+    Repeat the shorter array so both have the same length, as the
+    GeoJSONGenerator pairs latitudes and longitudes by position.
+    """
+    size = max(len(lats), len(lons))
+
+    if not len(lats) or not len(lons):
+        return np.array([]), np.array([])
+
+    return np.resize(lats, size), np.resize(lons, size)
+
+
 class NetCdfFile(GenericFile):
     """
     Simple class for returning basic information about the content
@@ -94,8 +379,20 @@ class NetCdfFile(GenericFile):
                 "lon": [sanitise_float(lon_min), sanitise_float(lon_max)]
             }
 
-        lats = ncdf.variables[lat_name][:].ravel()
-        lons = ncdf.variables[lon_name][:].ravel()
+        lat_variable = ncdf.variables[lat_name]
+        lon_variable = ncdf.variables[lon_name]
+        extent = None
+
+        # Curvilinear grids are bounded by their edges.
+        if lat_variable.ndim == 2 and lat_variable.shape == lon_variable.shape and lat_variable.size:
+            extent = get_perimeter_extent(lat_variable, lon_variable)
+
+        if extent is None:
+            extent = (get_coordinate_extent(lat_variable),
+                      get_coordinate_extent(lon_variable, longitude=True))
+
+        lats, lons = pair_coordinates(*extent)
+
         return {
             "type": "track",
             "lat": lats,
@@ -138,8 +435,13 @@ class NetCdfFile(GenericFile):
         # coordinate, if we have a coordinate name
         if not all([start_time, end_time]) and time_name:
             try:
-                times = list(netCDF4.num2date(list(ncdf.variables[time_name]),
-                                              ncdf.variables[time_name].units))
+                time_variable = ncdf.variables[time_name]
+                time_range = get_time_range(time_variable)
+
+                # Only the first and last times are decoded.
+                if time_range is not None:
+                    times = list(netCDF4.num2date(time_range, time_variable.units,
+                                                  getattr(time_variable, 'calendar', 'standard')))
             except AttributeError:
                 pass
 
@@ -0,0 +1,241 @@
+"""
+Supervised worker processes for running the file handlers.
+
+Some corrupt files make the underlying libraries hang or crash the
+interpreter. Running the handlers in worker processes watched by a
+supervisor means such a file only costs a worker, which is replaced,
+instead of the whole scan.
+"""
+
+import os
+import time
+import logging
+import multiprocessing
+from multiprocessing.connection import wait
+
+logger = logging.getLogger(__name__)
+
+# Status of each item returned by HandlerSandbox.map
+OK = "ok"
+ERROR = "error"
+TIMEOUT = "timeout"
+CRASHED = "crashed"
+
+# Workers are started while the scan runs other threads, so they are not
+# forked from the scanning process: a lock held by another thread at the
+# time of the fork, e.g. in logging, would never be released in the child.
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _worker_main(conn, func, initializer):
+    """
+    Loop run by each worker process: receive a task, run it, send back the result.
+    """
+    if initializer is not None:
+        initializer()
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+
+        if task is None:
+            break
+
+        seq, args = task
+
+        try:
+            result = (OK, func(*args))
+        except Exception as ex:
+            result = (ERROR, repr(ex))
+
+        conn.send((seq, result))
+
+
+class QuarantineList(object):
+    """
+    Files which hung or crashed a worker. The list is kept in a text file
+    shared by all the jobs, with one tab separated path and reason per line,
+    so that later runs can avoid opening these files again.
+
+    :param str path: Path to the quarantine file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.files = set()
+
+        if os.path.exists(path):
+            with open(path) as reader:
+                for line in reader:
+                    self.files.add(line.rstrip("\n").split("\t")[0])
+
+    def __contains__(self, filename):
+        return filename in self.files
+
+    def add(self, filename, reason):
+        """
+        Add a file to the quarantine list.
+
+        :param str filename: Path to the file
+        :param str reason: Why the file was quarantined
+        """
+        self.files.add(filename)
+
+        with open(self.path, "a") as writer:
+            writer.write("{}\t{}\n".format(filename, reason))
+
+
+class _Worker(object):
+    """
+    A worker process and the task it is running.
+    """
+
+    def __init__(self, context, func, initializer):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, func, initializer), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+        self.seq = None
+        self.deadline = None
+
+    def submit(self, seq, args, timeout):
+        self.seq = seq
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.conn.send((seq, args))
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+
+        self.process.join(1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+
+        self.process.join()
+        self.conn.close()
+
+
+class HandlerSandbox(object):
+    """
+    Runs a function over a stream of items in supervised worker processes.
+    A worker which exceeds the timeout for an item is killed, as is one
+    which dies, and a new worker takes its place. Results are returned in
+    the order of the items.
+
+    :param func: Module level function run in the workers
+    :param int workers: Number of worker processes
+    :param float timeout: Wall clock limit in seconds for each item, None for no limit
+    :param initializer: Module level function run once in each worker when it starts
+    :param int max_pending: Maximum number of items taken ahead of the results returned
+    :param str start_method: How the worker processes are started, defaults to START_METHOD
+    """
+
+    def __init__(self, func, workers=1, timeout=None, initializer=None, max_pending=None, start_method=None):
+        self.func = func
+        self.workers = int(workers)
+        self.timeout = timeout
+        self.initializer = initializer
+        self.max_pending = max_pending or self.workers * 4
+        self.context = multiprocessing.get_context(start_method or START_METHOD)
+
+    def _start_worker(self):
+        return _Worker(self.context, self.func, self.initializer)
+
+    def map(self, items):
+        """
+        Run the function on each item.
+
+        :param items: Iterable of (key, args) tuples, args being passed to the function
+        :return: Generator of (key, status, result) tuples in item order. Status is one
+                 of OK, ERROR, TIMEOUT or CRASHED and result is None unless status is OK
+                 or ERROR.
+        """
+        items = iter(items)
+        workers = [self._start_worker() for _ in range(self.workers)]
+        keys = {}
+        results = {}
+        next_seq = 0
+        next_result = 0
+        exhausted = False
+
+        try:
+            while True:
+                # Hand out items to the idle workers.
+                for worker in workers:
+                    if exhausted or next_seq - next_result >= self.max_pending:
+                        break
+
+                    if worker.seq is not None:
+                        continue
+
+                    try:
+                        key, args = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+
+                    keys[next_seq] = key
+                    worker.submit(next_seq, args, self.timeout)
+                    next_seq += 1
+
+                # Return the results which are ready, in order.
+                while next_result in results:
+                    status, result = results.pop(next_result)
+                    yield keys.pop(next_result), status, result
+                    next_result += 1
+
+                busy = [worker for worker in workers if worker.seq is not None]
+
+                if not busy:
+                    if exhausted:
+                        break
+                    continue
+
+                deadlines = [worker.deadline for worker in busy if worker.deadline is not None]
+                wait_time = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+
+                ready = wait([worker.conn for worker in busy] + [worker.process.sentinel for worker in busy],
+                             timeout=wait_time)
+
+                for i, worker in enumerate(workers):
+                    if worker.seq is None:
+                        continue
+
+                    if worker.conn in ready:
+                        try:
+                            seq, result = worker.conn.recv()
+                        except (EOFError, OSError):
+                            # The worker died before sending its result.
+                            logger.error("Worker crashed while processing {}.".format(keys[worker.seq]))
+                            results[worker.seq] = (CRASHED, None)
+                            worker.kill()
+                            workers[i] = self._start_worker()
+                            continue
+
+                        results[seq] = result
+                        worker.seq = None
+
+                    elif worker.process.sentinel in ready:
+                        logger.error("Worker crashed while processing {}.".format(keys[worker.seq]))
+                        results[worker.seq] = (CRASHED, None)
+                        worker.kill()
+                        workers[i] = self._start_worker()
+
+                    elif worker.deadline is not None and time.monotonic() >= worker.deadline:
+                        logger.error("Worker timed out after {}s processing {}.".format(
+                            self.timeout, keys[worker.seq]))
+                        results[worker.seq] = (TIMEOUT, None)
+                        worker.kill()
+                        workers[i] = self._start_worker()
+
+        finally:
+            for worker in workers:
+                worker.stop()
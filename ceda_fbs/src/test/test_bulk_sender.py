@@ -0,0 +1,123 @@
+# encoding: utf-8
+"""
+Check BulkSender reports the result of every action, in order, with a fake elasticsearch client
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import json
+import threading
+import unittest
+from elasticsearch.exceptions import TransportError
+from ceda_fbs.src.fbs.es_iface.bulk_sender import BulkSender
+from ceda_fbs.src.fbs.es_iface.flow_control import FlowController
+
+
+class FakeElasticsearch(object):
+    """
+    Answers bulk requests with the status given for each document id,
+    201 by default. A list of statuses is used up one request at a time.
+    """
+
+    class transport(object):
+        serializer = json
+
+    def __init__(self, statuses=None, error=None):
+        self.statuses = statuses or {}
+        self.error = error
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def _status(self, doc_id):
+        status = self.statuses.get(doc_id, 201)
+
+        if isinstance(status, list):
+            return status.pop(0) if len(status) > 1 else status[0]
+
+        return status
+
+    def bulk(self, body):
+        if self.error is not None:
+            raise self.error
+
+        with self._lock:
+            headers = [json.loads(line) for line in body.splitlines()[::2]]
+            self.requests.append([header['index']['_id'] for header in headers])
+
+            items = []
+            for header in headers:
+                doc_id = header['index']['_id']
+                status = self._status(doc_id)
+                item = {'_id': doc_id, 'status': status}
+
+                if status >= 300:
+                    item['error'] = 'es_rejected_execution_exception' if status == 429 else 'mapper_parsing_exception'
+
+                items.append({'index': item})
+
+        return {'items': items}
+
+
+class TestBulkSender(unittest.TestCase):
+    ACTIONS = [{'_index': 'fbs', '_id': str(i), '_source': {'info': {'name': 'file_{}.nc'.format(i)}}}
+               for i in range(50)]
+
+    def send(self, es, actions=None):
+        flow = FlowController(initial_backoff=0.001, max_backoff=0.001, max_retries=2)
+        sender = BulkSender(es, threads=3, chunk_size=7, flow_controller=flow)
+
+        return list(sender.send(self.ACTIONS if actions is None else actions))
+
+    def test_all_indexed(self):
+        es = FakeElasticsearch()
+        results = self.send(es)
+
+        self.assertEqual([action for _, action, _ in results], self.ACTIONS)
+        self.assertTrue(all(ok for ok, _, _ in results))
+        self.assertEqual(len(es.requests), 8)
+        self.assertTrue(all(len(request) <= 7 for request in es.requests))
+
+    def test_failed_documents(self):
+        es = FakeElasticsearch({'3': 400, '20': 400})
+        results = self.send(es)
+
+        failed = [action['_id'] for ok, action, _ in results if not ok]
+        self.assertEqual(failed, ['3', '20'])
+        self.assertEqual(results[3][2]['error'], 'mapper_parsing_exception')
+
+        # Documents which are not worth retrying are only sent once.
+        self.assertEqual(sum(request.count('3') for request in es.requests), 1)
+
+    def test_rejected_documents_retried(self):
+        es = FakeElasticsearch({'5': [429, 201], '6': [429, 429, 429, 201]})
+        results = dict((action['_id'], (ok, result)) for ok, action, result in self.send(es))
+
+        self.assertTrue(results['5'][0])
+        self.assertFalse(results['6'][0])
+        self.assertEqual(results['6'][1]['status'], 429)
+
+        # Only the rejected documents are sent again.
+        retries = [request for request in es.requests if len(request) < 7 and request != ['49']]
+        self.assertEqual(retries, [['5', '6'], ['6']])
+
+    def test_failed_request(self):
+        results = self.send(FakeElasticsearch(error=TransportError(400, 'bad request')))
+
+        self.assertEqual(len(results), len(self.ACTIONS))
+        self.assertFalse(any(ok for ok, _, _ in results))
+        self.assertEqual(results[0][2]['status'], 400)
+
+    def test_keys(self):
+        es = FakeElasticsearch({'2': 400})
+        sender = BulkSender(es, threads=2, chunk_size=2)
+        keyed = [('/badc//file_{}.nc'.format(action['_id']), action) for action in self.ACTIONS[:5]]
+
+        results = [(ok, key) for ok, key, _, _ in sender.send_keyed(keyed)]
+
+        self.assertEqual(results, [(action['_id'] != '2', key) for key, action in keyed])
+
+
+if __name__ == '__main__':
+    unittest.main()
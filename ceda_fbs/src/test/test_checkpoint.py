@@ -0,0 +1,76 @@
+# encoding: utf-8
+"""
+Check the progress of a file list slice is tracked and saved for the next run of the job
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import os
+import shutil
+import tempfile
+import unittest
+from ceda_fbs.src.fbs.proc.common_util.checkpoint import ProgressTracker, ScanCheckpoint
+
+
+class TestProgressTracker(unittest.TestCase):
+
+    def test_out_of_order(self):
+        tracker = ProgressTracker()
+        for path in ['a', 'b', 'c', 'd']:
+            tracker.add(path)
+
+        tracker.done('b')
+        tracker.done('d')
+        self.assertEqual(tracker.acknowledged, 0)
+
+        tracker.done('a')
+        self.assertEqual(tracker.acknowledged, 2)
+
+        tracker.done('c')
+        self.assertEqual(tracker.acknowledged, 4)
+
+    def test_repeated_and_unknown_paths(self):
+        tracker = ProgressTracker()
+        for path in ['a', 'b', 'a']:
+            tracker.add(path)
+
+        tracker.done('unknown')
+        tracker.done('a')
+        tracker.done('a')
+        self.assertEqual(tracker.acknowledged, 1)
+
+        tracker.done('b')
+        self.assertEqual(tracker.acknowledged, 3)
+
+
+class TestScanCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'slice.checkpoint')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_save_and_load(self):
+        checkpoint = ScanCheckpoint(self.path, 'list.txt', 100, 50)
+        self.assertIsNone(checkpoint.load())
+
+        checkpoint.save(120)
+        self.assertEqual(ScanCheckpoint(self.path, 'list.txt', 100, 50).load(), 120)
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+        checkpoint.remove()
+        self.assertIsNone(checkpoint.load())
+
+    def test_other_slice(self):
+        ScanCheckpoint(self.path, 'list.txt', 100, 50).save(120)
+
+        self.assertIsNone(ScanCheckpoint(self.path, 'list.txt', 0, 100).load())
+        self.assertIsNone(ScanCheckpoint(self.path, 'other_list.txt', 100, 50).load())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# encoding: utf-8
+"""
+Check documents written to a dead-letter file are sent again by replay_dead_letters.py
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from ceda_fbs.src.fbs.es_iface.dead_letter import DeadLetterFile, read_dead_letters
+from ceda_fbs.src.fbs.cmdline import replay_dead_letters
+
+
+class FakeElasticsearch(object):
+    """
+    Accepts bulk requests, rejecting the documents whose id is in reject.
+    """
+
+    class transport(object):
+        serializer = json
+
+    def __init__(self, reject=()):
+        self.reject = set(reject)
+        self.indexed = []
+
+    def bulk(self, body):
+        lines = body.splitlines()
+        items = []
+
+        for header, source in zip(lines[::2], lines[1::2]):
+            doc_id = json.loads(header)['index']['_id']
+
+            if doc_id in self.reject:
+                items.append({'index': {'_id': doc_id, 'status': 400, 'error': 'mapper_parsing_exception'}})
+            else:
+                self.indexed.append((doc_id, json.loads(source)))
+                items.append({'index': {'_id': doc_id, 'status': 201}})
+
+        return {'items': items}
+
+
+class TestDeadLetters(unittest.TestCase):
+    ACTIONS = [{'_index': 'fbs', '_id': str(i), '_source': {'info': {'name': 'file_{}.nc'.format(i)}}}
+               for i in range(5)]
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'scan.deadletter.ndjson')
+
+        with DeadLetterFile(self.path) as dead_letters:
+            for action in self.ACTIONS:
+                dead_letters.write(action, {'status': 429, 'error': 'rejected'})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def replay(self, es):
+        config = {'filename': self.path, 'es-configuration': {}}
+
+        with mock.patch.object(replay_dead_letters, 'ElasticsearchClientFactory') as factory:
+            factory.return_value.get_client.return_value = es
+            replay_dead_letters.replay_dead_letters(config)
+
+    def test_read(self):
+        records = list(read_dead_letters(self.path))
+
+        self.assertEqual([action for action, _ in records], self.ACTIONS)
+        self.assertEqual(records[0][1], {'status': 429, 'error': 'rejected'})
+
+    def test_replay(self):
+        es = FakeElasticsearch()
+        self.replay(es)
+
+        self.assertEqual(es.indexed, [(action['_id'], action['_source']) for action in self.ACTIONS])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_replay_keeps_failures(self):
+        # A file left behind by an earlier replay which did not finish.
+        with open(self.path + '.tmp', 'w') as writer:
+            writer.write('{"action": {}, "error": "stale"}\n')
+
+        self.replay(FakeElasticsearch(reject={'1', '3'}))
+
+        records = list(read_dead_letters(self.path))
+        self.assertEqual([action['_id'] for action, _ in records], ['1', '3'])
+        self.assertEqual(records[0][1]['error'], 'mapper_parsing_exception')
+
+
+if __name__ == '__main__':
+    unittest.main()
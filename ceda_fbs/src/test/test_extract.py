@@ -0,0 +1,380 @@
+# encoding: utf-8
+"""
+Check the stages of a scan made by ExtractSeq, using fake elasticsearch clients
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import os
+import json
+import shutil
+import logging
+import datetime
+import tempfile
+import time
+import threading
+import unittest
+from unittest import mock
+from docopt import docopt
+from ceda_fbs.src.fbs.proc import extract
+from ceda_fbs.src.fbs.proc.extract import ExtractSeq, ExtractParallel
+from ceda_fbs.src.fbs.proc.common_util.checkpoint import ProgressTracker
+from ceda_fbs.src.fbs.proc.common_util.scan_state import ScanStateStore
+from ceda_fbs.src.fbs.proc.common_util.spot_mapping import SpotResolver
+from ceda_fbs.src.fbs.proc.file_handlers import badc_csv_file
+from ceda_fbs.src.fbs.proc.file_handlers.handler_picker import HandlerPicker
+
+
+def make_extractor(tmp_dir, extractor_class=ExtractSeq, **options):
+    config = {
+        'core': {'log-path': tmp_dir},
+        'scanning': {},
+        'es-configuration': {'es-index': 'fbs'},
+        'ldap-configuration': {'hosts': 'ldap.example.com'},
+        'calculate_md5': False,
+        'level': '1',
+    }
+    config.update(options)
+
+    extractor = extractor_class(config)
+    extractor.logger = logging.getLogger(__name__)
+    extractor.handler_factory_inst = HandlerPicker()
+    extractor._spot_resolver = SpotResolver({})
+
+    return extractor
+
+
+def make_files(directory, count):
+    paths = []
+
+    for i in range(count):
+        path = os.path.join(directory, 'file_{}.txt'.format(i))
+        with open(path, 'w') as writer:
+            writer.write('data')
+        paths.append(path)
+
+    return paths
+
+
+class FakeMgetElasticsearch(object):
+    """
+    Returns the given documents to mget requests.
+    """
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def mget(self, index, body, _source_includes):
+        return {'docs': [{'found': True, '_source': self.docs[doc_id]} if doc_id in self.docs else {'found': False}
+                         for doc_id in body['ids']]}
+
+
+class FakeBulkElasticsearch(object):
+    """
+    Accepts all bulk requests, keeping the indexed documents.
+    """
+
+    class transport(object):
+        serializer = json
+
+    def __init__(self, on_request=None):
+        self.indexed = {}
+        self.on_request = on_request
+
+    def bulk(self, body):
+        if self.on_request is not None:
+            self.on_request(self)
+
+        lines = body.splitlines()
+        items = []
+
+        for header, source in zip(lines[::2], lines[1::2]):
+            doc_id = json.loads(header)['index']['_id']
+            self.indexed[doc_id] = json.loads(source)
+            items.append({'index': {'_id': doc_id, 'status': 201}})
+
+        return {'items': items}
+
+
+class TestBulkIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.extractor = make_extractor(self.tmp_dir)
+        self.extractor.es = FakeBulkElasticsearch()
+        self.extractor._progress = ProgressTracker()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_paths_not_normalised(self):
+        files = [path.replace(self.tmp_dir, self.tmp_dir + '//./') for path in make_files(self.tmp_dir, 10)]
+
+        self.extractor.bulk_index(files, '1')
+
+        self.assertEqual(self.extractor.files_indexed, 10)
+        self.assertEqual(len(self.extractor.es.indexed), 10)
+        self.assertEqual(self.extractor._progress.acknowledged, 10)
+
+
+class TestFileMetadata(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_level_1_csv_read_once(self):
+        formats = {}
+
+        for name, content in [('badc.csv', 'Conventions,G,BADC-CSV,1\ndata\n'), ('plain.csv', 'a,b\n1,2\n')]:
+            path = os.path.join(self.tmp_dir, name)
+            with open(path, 'w') as writer:
+                writer.write(content)
+
+            # The handler is given the header instead of opening the file.
+            with mock.patch.object(badc_csv_file, 'open', side_effect=AssertionError('file opened again'), create=True):
+                metadata = extract.extract_file_metadata(HandlerPicker(), path, '1')
+
+            formats[name] = metadata[0]['info']['format']
+
+        self.assertEqual(formats, {'badc.csv': 'BADC CSV', 'plain.csv': 'CSV'})
+
+
+class TestWorkerProcesses(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_extract_in_workers(self):
+        files = make_files(self.tmp_dir, 10)
+        extractor = make_extractor(self.tmp_dir, ExtractParallel, workers=2)
+
+        results = list(extractor._extract_files(files, '1'))
+
+        self.assertEqual([file for file, _ in results], files)
+        self.assertEqual([metadata[0]['info']['name'] for _, metadata in results],
+                         [os.path.basename(file) for file in files])
+        self.assertEqual(extractor.timings.get('GenericFile', 1)[0], 10)
+
+    def scan(self, extractor_class, files, **options):
+        extractor = make_extractor(self.tmp_dir, extractor_class, **options)
+        extractor.es = FakeBulkElasticsearch()
+        extractor._progress = ProgressTracker()
+
+        extractor.bulk_index(files, '1')
+
+        return {
+            'indexed': extractor.files_indexed,
+            'properties errors': extractor.files_properties_errors,
+            'database errors': extractor.database_errors,
+            'timed files': {key: total[0] for key, total in extractor.timings.totals.items()},
+        }
+
+    def test_totals_match_sequential(self):
+        files = make_files(self.tmp_dir, 20)
+        # Files which have gone since the list was made are counted as errors.
+        files[3:3] = [os.path.join(self.tmp_dir, 'missing_{}.txt'.format(i)) for i in range(3)]
+
+        sequential = self.scan(ExtractSeq, files)
+        parallel = self.scan(ExtractParallel, files, workers=3)
+
+        self.assertEqual(parallel, sequential)
+        self.assertEqual(sequential['indexed'], 20)
+        self.assertEqual(sequential['properties errors'], 3)
+
+    def test_workers_option(self):
+        # The script catches the stop signals when it is imported.
+        with mock.patch('signal.signal'):
+            from ceda_fbs.src.fbs.cmdline import scan_dataset
+
+        argv = ['-f', os.path.join(self.tmp_dir, 'file_list.txt'), '-l', '1', '-w', '3']
+        config = scan_dataset.get_stat_and_defs(scan_dataset.util.sanitise_args(docopt(scan_dataset.__doc__, argv)))[0]
+        config['ldap-configuration'].pop('cache-file', None)
+
+        extractor = scan_dataset.get_extractor(config)
+
+        self.assertEqual(type(extractor).__name__, 'ExtractParallel')
+        self.assertEqual(extractor.workers, 3)
+
+
+class TestScanState(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.files = make_files(self.tmp_dir, 20)
+        self.state_file = os.path.join(self.tmp_dir, 'state.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def scan(self):
+        extractor = make_extractor(self.tmp_dir)
+        extractor.es = FakeBulkElasticsearch()
+        extractor.scan_state = ScanStateStore(self.state_file)
+
+        try:
+            extractor.bulk_index(self.files, '1')
+        finally:
+            extractor.scan_state.close()
+
+        return extractor
+
+    def test_action_list(self):
+        extractor = make_extractor(self.tmp_dir)
+        extractor.scan_state = ScanStateStore(self.state_file)
+
+        try:
+            actions = list(extractor._generate_action_list(self.files, '1'))
+        finally:
+            extractor.scan_state.close()
+
+        self.assertEqual([file for file, _ in actions], self.files)
+        self.assertEqual(len(extractor._file_state), len(self.files))
+
+    def test_unchanged_files_skipped(self):
+        first = self.scan()
+        self.assertEqual(first.files_indexed, 20)
+
+        with open(self.files[3], 'a') as writer:
+            writer.write('more data')
+
+        second = self.scan()
+        self.assertEqual(second.files_indexed, 1)
+        self.assertEqual(second.files_unchanged, 19)
+        self.assertEqual(list(second.es.indexed), [second.create_id(self.files[3])])
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.files = make_files(self.tmp_dir, 100)
+        self.file_list = os.path.join(self.tmp_dir, 'file_list.txt')
+
+        with open(self.file_list, 'w') as writer:
+            writer.writelines(file + '\n' for file in self.files)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def scan(self, stop_after_requests=None, hang_on=None):
+        """
+        Scan lines 10 to 90 of the file list, requesting a stop when the given
+        number of bulk requests have been made, or when the handler reading
+        the hang_on file hangs.
+        """
+        extractor = make_extractor(self.tmp_dir, filename=self.file_list, start='10', **{'num-files': '80'})
+        extractor.queue_size = 20
+        extractor.configuration['es-configuration'].update({'bulk-chunk-size': 5, 'bulk-threads': 1})
+
+        requests = []
+
+        def on_request(es):
+            requests.append(1)
+            if len(requests) == stop_after_requests:
+                extractor.request_stop()
+
+        es = FakeBulkElasticsearch(on_request)
+
+        release = threading.Event()
+        process_file_seq = ExtractSeq.process_file_seq
+
+        def hanging_process_file_seq(self, filename, level, file_stat=None):
+            if filename == hang_on:
+                extractor.request_stop()
+                release.wait(30)
+            return process_file_seq(self, filename, level, file_stat)
+
+        with mock.patch.object(ExtractSeq, 'prepare_logging_rdf'), \
+                mock.patch.object(ExtractSeq, 'process_file_seq', hanging_process_file_seq), \
+                mock.patch.object(extract, 'ElasticsearchClientFactory') as factory, \
+                mock.patch.object(extract.index, 'create_index'):
+            factory.return_value.get_client.return_value = es
+            try:
+                extractor.read_dataset_from_file_and_scan()
+            finally:
+                release.set()
+
+        return extractor, [doc['info']['name'] for doc in es.indexed.values()]
+
+    def test_stop_and_resume(self):
+        stopped, first_names = self.scan(stop_after_requests=3)
+
+        offset = stopped.checkpoint.load()
+        self.assertTrue(os.path.exists(stopped.checkpoint.path))
+
+        # The files waiting between the stages are dropped, not scanned.
+        self.assertTrue(25 <= offset < 40)
+        self.assertLess(len(first_names), 30)
+        self.assertTrue(set(os.path.basename(file) for file in self.files[10:offset]) <= set(first_names))
+
+        resumed, second_names = self.scan()
+
+        self.assertEqual(sorted(second_names), sorted(os.path.basename(file) for file in self.files[offset:90]))
+        self.assertFalse(os.path.exists(resumed.checkpoint.path))
+
+    def test_stop_while_handler_hangs(self):
+        start = time.monotonic()
+        stopped, names = self.scan(hang_on=self.files[10])
+
+        # The scan does not wait for the hung handler before writing the checkpoint.
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(stopped.checkpoint.load(), 10)
+        self.assertEqual(names, [])
+
+
+class TestIndexSelection(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.files = []
+
+        for i in range(4):
+            path = os.path.join(self.tmp_dir, 'file_{}.nc'.format(i))
+            with open(path, 'w') as writer:
+                writer.write('data')
+            self.files.append(path)
+
+        self.extractor = make_extractor(self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def indexed(self, path, **info):
+        file_stat = os.stat(path)
+        doc = {
+            'size': file_stat.st_size,
+            'last_modified': datetime.datetime.fromtimestamp(file_stat.st_mtime).isoformat()
+        }
+        doc.update(info)
+
+        return self.extractor.create_id(path), {'info': doc}
+
+    def test_changed_files(self):
+        self.extractor.es = FakeMgetElasticsearch(dict([
+            self.indexed(self.files[0], scan_level=2),
+            self.indexed(self.files[1], size=1),
+            self.indexed(self.files[2], scan_level=1),
+        ]))
+
+        selected = list(self.extractor._select_from_index(self.files, '2'))
+
+        self.assertEqual(selected, self.files[1:])
+        self.assertEqual(self.extractor.files_unchanged, 1)
+
+    def test_documents_without_level(self):
+        self.extractor.es = FakeMgetElasticsearch(dict(self.indexed(path) for path in self.files))
+
+        self.assertEqual(list(self.extractor._select_from_index(self.files, '1')), [])
+        self.assertEqual(list(self.extractor._select_from_index(self.files, '3')), self.files)
+
+
+if __name__ == '__main__':
+    unittest.main()
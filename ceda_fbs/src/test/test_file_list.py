@@ -0,0 +1,78 @@
+# encoding: utf-8
+"""
+Check reading slices of the file lists written by scan_dataset.py
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import os
+import shutil
+import tempfile
+import unittest
+from ceda_fbs.src.fbs.proc.common_util import file_list
+
+
+class TestFileList(unittest.TestCase):
+    PATHS = ['/badc/dataset/data/{:04d}/file_{}.nc'.format(i // 7, i) for i in range(5000)]
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'dataset.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_write_and_count(self):
+        self.assertEqual(file_list.write_file_list(self.PATHS, self.filename, stride=100), len(self.PATHS))
+        self.assertTrue(os.path.exists(file_list.index_path(self.filename)))
+        self.assertEqual(file_list.count_lines(self.filename), len(self.PATHS))
+
+    def test_read_slice(self):
+        file_list.write_file_list(self.PATHS, self.filename, stride=100)
+
+        for start, stop in [(0, 10), (99, 101), (150, 1150), (4990, 5100), (5000, 5100)]:
+            with self.subTest(start=start, stop=stop):
+                self.assertEqual(file_list.read_slice(self.filename, start, stop), self.PATHS[start:stop])
+
+    def test_index_rebuilt_for_plain_list(self):
+        with open(self.filename, 'w') as writer:
+            writer.writelines(path + '\n' for path in self.PATHS[:300])
+
+        self.assertEqual(file_list.read_slice(self.filename, 290, 300), self.PATHS[290:300])
+
+        # A list changed after its index was written gets a new index.
+        with open(self.filename, 'a') as writer:
+            writer.write('/badc/dataset/data/extra.nc\n')
+
+        self.assertEqual(file_list.count_lines(self.filename), 301)
+
+    def test_compact_list(self):
+        filename = os.path.join(self.tmp_dir, 'dataset' + file_list.COMPACT_EXTENSION)
+        paths = sorted(self.PATHS)
+
+        self.assertEqual(file_list.write_file_list(reversed(paths), filename), len(paths))
+        self.assertTrue(file_list.is_compact(filename))
+        self.assertLess(os.path.getsize(filename), sum(len(path) + 1 for path in paths) // 10)
+
+        self.assertEqual(file_list.count_lines(filename), len(paths))
+        self.assertEqual(list(file_list.iter_file_list(filename)), paths)
+        self.assertEqual(file_list.read_slice(filename, 4000, 4200), paths[4000:4200])
+
+    def test_compact_random_access(self):
+        filename = os.path.join(self.tmp_dir, 'dataset' + file_list.COMPACT_EXTENSION)
+        paths = sorted(self.PATHS)
+        file_list.write_compact_file_list(paths, filename, block_size=100)
+
+        compact = file_list.CompactFileList(filename)
+
+        for i in [0, 99, 100, 1234, len(paths) - 1, -1]:
+            with self.subTest(i=i):
+                self.assertEqual(compact[i], paths[i])
+
+        self.assertEqual(compact[95:305], paths[95:305])
+
+
+if __name__ == '__main__':
+    unittest.main()
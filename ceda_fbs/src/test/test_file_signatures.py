@@ -0,0 +1,49 @@
+# encoding: utf-8
+"""
+Check file formats are recognised from the first bytes of the files
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import os
+import tempfile
+import unittest
+from ceda_fbs.src.fbs.proc.file_handlers.file_signatures import read_header, sniff_format
+
+
+class TestSniffFormat(unittest.TestCase):
+    HEADERS = {
+        'netcdf': [b'CDF\x01\x00\x00\x00\x00', b'CDF\x02\x00', b'CDF\x05\x00'],
+        'hdf5': [b'\x89HDF\r\n\x1a\n\x00\x00', b'\x00' * 512 + b'\x89HDF\r\n\x1a\n'],
+        'hdf4': [b'\x0e\x03\x13\x01\x00\x00'],
+        'grib': [b'GRIB\x00\x01\x02\x02'],
+        'zip': [b'PK\x03\x04\x14\x00'],
+        'badc-csv': [b'Conventions,G,BADC-CSV,1\ntitle,G,Some data\n'],
+        'nasa-ames': [b'42 1001\nSmith, Richard\n', b'  18   2010\r\nCEDA\r\n'],
+        None: [b'', b'Some notes about the data\n', b'a,b,c\n1,2,3\n', b'42 1234\n', b'CDF\x03'],
+    }
+
+    def test_headers(self):
+        for file_format, headers in self.HEADERS.items():
+            for header in headers:
+                with self.subTest(header=header[:20]):
+                    self.assertEqual(sniff_format(header), file_format)
+
+    def test_read_header(self):
+        with tempfile.NamedTemporaryFile(suffix='.dat', delete=False) as writer:
+            writer.write(b'CDF\x01' + b'\x00' * 10000)
+
+        try:
+            header = read_header(writer.name)
+            self.assertEqual(len(header), 4096)
+            self.assertEqual(sniff_format(header), 'netcdf')
+        finally:
+            os.remove(writer.name)
+
+        self.assertEqual(read_header(writer.name), b'')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# encoding: utf-8
+"""
+Check the flow controller backs off and shrinks bulk requests when elasticsearch rejects them
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import unittest
+from elasticsearch.exceptions import TransportError
+from ceda_fbs.src.fbs.es_iface.flow_control import FlowController
+
+
+class TestFlowController(unittest.TestCase):
+
+    def setUp(self):
+        self.flow = FlowController(initial_chunk_bytes=1024, min_chunk_bytes=128, max_chunk_bytes=4096,
+                                   target_latency=1.0, initial_backoff=0.001, max_backoff=0.004, max_retries=3)
+
+    def test_rejections(self):
+        self.assertTrue(self.flow.should_retry(429))
+        self.assertTrue(self.flow.should_retry(400, {'type': 'es_rejected_execution_exception'}))
+        self.assertTrue(self.flow.should_retry(503))
+        self.assertFalse(self.flow.should_retry(400, {'type': 'mapper_parsing_exception'}))
+
+    def test_backoff(self):
+        backoffs = []
+        for _ in range(4):
+            self.flow.on_rejected()
+            backoffs.append(self.flow.backoff)
+
+        self.assertEqual(backoffs, [0.001, 0.002, 0.004, 0.004])
+
+        self.flow.on_success(0.1)
+        self.assertEqual(self.flow.backoff, 0.002)
+
+    def test_chunk_size(self):
+        self.flow.on_rejected()
+        self.assertEqual(self.flow.chunk_bytes, 512)
+
+        for _ in range(10):
+            self.flow.on_rejected()
+        self.assertEqual(self.flow.chunk_bytes, 128)
+
+        self.flow.on_success(0.1)
+        self.assertEqual(self.flow.chunk_bytes, 256)
+
+        self.flow.on_success(5.0)
+        self.assertEqual(self.flow.chunk_bytes, 192)
+
+    def test_call_retries(self):
+        responses = [TransportError(429, 'rejected'), TransportError(503, 'unavailable'), 'ok']
+
+        def request():
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        self.assertEqual(self.flow.call(request), 'ok')
+        self.assertEqual(self.flow.chunk_bytes, 256 + 128)
+
+    def test_call_gives_up(self):
+        calls = []
+
+        def request():
+            calls.append(1)
+            raise TransportError(429, 'rejected')
+
+        with self.assertRaises(TransportError):
+            self.flow.call(request)
+
+        self.assertEqual(len(calls), self.flow.max_retries + 1)
+
+    def test_call_does_not_retry_bad_request(self):
+        calls = []
+
+        def request():
+            calls.append(1)
+            raise TransportError(400, 'mapper_parsing_exception')
+
+        with self.assertRaises(TransportError):
+            self.flow.call(request)
+
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# encoding: utf-8
+"""
+Check the handler modules are only imported when a matching file is met
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import sys
+import unittest
+from ceda_fbs.src.fbs.proc.file_handlers.handler_picker import HandlerPicker
+
+PACKAGE = 'ceda_fbs.src.fbs.proc.file_handlers'
+
+
+class TestHandlerRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.handler_picker = HandlerPicker()
+
+    def test_handler_name_without_import(self):
+        sys.modules.pop(PACKAGE + '.netcdf_file', None)
+
+        self.assertEqual(self.handler_picker.get_handler_name('/badc/data/file.nc'), 'NetCdfFile')
+        self.assertEqual(self.handler_picker.get_handler_name('/badc/data/00README'), 'GenericFile')
+        self.assertEqual(self.handler_picker.get_handler_name('/badc/data/metadata_tags.json'),
+                         'MetadataTagsJsonFile')
+        self.assertNotIn(PACKAGE + '.netcdf_file', sys.modules)
+
+    def test_only_matching_handler_imported(self):
+        sys.modules.pop(PACKAGE + '.netcdf_file', None)
+
+        handler = self.handler_picker.pick_best_handler('/badc/data/notes.txt', header=b'Some notes\n')
+
+        self.assertEqual(handler.__name__, 'GenericFile')
+        self.assertNotIn(PACKAGE + '.netcdf_file', sys.modules)
+        self.assertIs(self.handler_picker.pick_best_handler('/badc/data/other.txt', sniff=False), handler)
+
+    def test_csv_by_name(self):
+        handler = self.handler_picker.pick_best_handler('/badc/data/file.csv', sniff=False)
+
+        self.assertEqual(handler.__name__, 'BadcCsvFile')
+
+    def test_needs_header(self):
+        self.assertTrue(self.handler_picker.needs_header('/badc/data/file.nc', '2'))
+        self.assertFalse(self.handler_picker.needs_header('/badc/data/file.nc', '1'))
+        self.assertTrue(self.handler_picker.needs_header('/badc/data/file.CSV', '1'))
+
+    def test_hdf5_by_name(self):
+        header = b'\x89HDF\r\n\x1a\n' + b'\x00' * 8
+
+        self.assertEqual(self.handler_picker.pick_best_handler('/badc/data/file.nc', header).__name__, 'NetCdfFile')
+        self.assertEqual(self.handler_picker.pick_best_handler('/badc/data/file.nc4', header).__name__, 'NetCdfFile')
+        self.assertEqual(self.handler_picker.pick_best_handler('/badc/data/file.he5', header).__name__, 'GenericFile')
+
+
+if __name__ == '__main__':
+    unittest.main()
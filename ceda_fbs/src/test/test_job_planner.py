@@ -0,0 +1,130 @@
+# encoding: utf-8
+"""
+Check the scan jobs are planned by expected runtime
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from ceda_fbs.src.fbs.proc.common_util import job_planner
+from ceda_fbs.src.fbs.proc.common_util.job_planner import CostModel, JobPlanner, plan_slices, MD5_COST
+from ceda_fbs.src.fbs.proc.common_util.timings import HandlerTimings
+
+
+class TestPlanSlices(unittest.TestCase):
+
+    def test_equal_cost_slices(self):
+        slices = plan_slices([1.0] * 10, target_cost=3)
+
+        self.assertEqual([(start, count) for start, count, _ in slices], [(0, 3), (3, 3), (6, 3), (9, 1)])
+
+    def test_giant_file_isolated(self):
+        slices = plan_slices([1, 1, 50, 1, 1], target_cost=10)
+
+        self.assertEqual([(start, count) for start, count, _ in slices], [(0, 2), (2, 1), (3, 2)])
+
+    def test_max_files(self):
+        slices = plan_slices([0.001] * 25, target_cost=100, max_files=10)
+
+        self.assertEqual([count for _, count, _ in slices], [10, 10, 5])
+
+
+class TestCostModel(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_calibrated_by_history(self):
+        default = CostModel(3).get_cost('/badc/data/file.nc', 10 ** 9)
+
+        timings_file = os.path.join(self.tmp_dir, 'timings.sqlite')
+        timings = HandlerTimings()
+        for _ in range(100):
+            timings.add('NetCdfFile', 3, default * 2, 10 ** 9)
+        timings.save(timings_file)
+
+        calibrated = CostModel(3, timings=HandlerTimings.load(timings_file))
+
+        self.assertAlmostEqual(calibrated.get_cost('/badc/data/file.nc', 10 ** 9), default * 2)
+        self.assertEqual(calibrated.get_cost('/badc/data/file.txt', 10 ** 9),
+                         CostModel(3).get_cost('/badc/data/file.txt', 10 ** 9))
+
+    def test_md5_counted_once(self):
+        size = 10 ** 9
+        timings = HandlerTimings()
+        for _ in range(100):
+            timings.add('NetCdfFile', 3, 10.0, size)
+
+        calibrated = CostModel(3, calculate_md5=True, timings=timings)
+        self.assertAlmostEqual(calibrated.get_cost('/badc/data/file.nc', size), 10.0)
+
+        # Handlers without history are not timed with their checksums.
+        self.assertAlmostEqual(calibrated.get_cost('/badc/data/file.txt', size),
+                               CostModel(3).get_cost('/badc/data/file.txt', size) + size * MD5_COST)
+
+    def test_level_1_ignores_handler(self):
+        model = CostModel(1)
+
+        self.assertEqual(model.get_cost('/badc/data/file.nc', 10 ** 9), model.get_cost('/badc/data/file.txt', 10))
+
+
+class TestJobPlanner(unittest.TestCase):
+    GIANT = 1234
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_list = os.path.join(self.tmp_dir, 'file_list.txt')
+
+        with open(self.file_list, 'w') as writer:
+            for i in range(2500):
+                path = os.path.join(self.tmp_dir, 'file_{}.nc'.format(i))
+                writer.write(path + '\n')
+
+                # One giant file among small ones.
+                with open(path, 'wb') as data:
+                    data.truncate(10 ** 11 if i == self.GIANT else 10)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_all_sizes_read(self):
+        planner = JobPlanner(3, target_cost=20, block_size=500)
+        stats = []
+
+        def get_size(path):
+            stats.append(path)
+            return os.stat(path).st_size
+
+        with mock.patch.object(job_planner, '_get_size', get_size):
+            jobs = planner.plan(self.file_list)
+
+        self.assertEqual(len(stats), 2500)
+
+        # The slices cover the list in order.
+        self.assertEqual([start for start, _, _ in jobs],
+                         [0] + [start + count for start, count, _ in jobs[:-1]])
+        self.assertEqual(sum(count for _, count, _ in jobs), 2500)
+
+    def test_giant_file_isolated(self):
+        jobs = JobPlanner(3, target_cost=20, block_size=1000).plan(self.file_list)
+
+        self.assertIn(self.GIANT, [start for start, count, _ in jobs if count == 1])
+        self.assertTrue(all(count > 1 for start, count, _ in jobs if start != self.GIANT))
+
+    def test_empty_list(self):
+        open(self.file_list, 'w').close()
+
+        self.assertEqual(JobPlanner(3, target_cost=20).plan(self.file_list), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# encoding: utf-8
+"""
+Check the shared LDAP cache file is refreshed once it expires and used when LDAP can not be reached
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import os
+import json
+import time
+import fcntl
+import shutil
+import tempfile
+import unittest
+from ldap3.core.exceptions import LDAPException
+from ceda_fbs.src.fbs.proc.common_util.util import LDAPIdentifier
+
+
+class FakeLDAPIdentifier(LDAPIdentifier):
+    """
+    Answers the bulk queries with the given names instead of querying LDAP.
+    """
+
+    def __init__(self, names, **kwargs):
+        self.names = names
+        self.queries = 0
+        super().__init__(**kwargs)
+
+    def _bulk_query(self, search_base, object_class, id_attr, name_attr):
+        self.queries += 1
+
+        if self.names is None:
+            raise LDAPException('LDAP server unreachable')
+
+        return dict(self.names[object_class])
+
+
+class TestLDAPCache(unittest.TestCase):
+    NAMES = {'posixAccount': {1001: 'alice'}, 'posixGroup': {2001: 'badc'}}
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.tmp_dir, 'ldap_cache.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def load(self, names=NAMES, ttl=3600):
+        return FakeLDAPIdentifier(names, cache_file=self.cache_file, cache_ttl=ttl)
+
+    def write_cache(self, age=0):
+        with open(self.cache_file, 'w') as writer:
+            json.dump({'users': {'1002': 'bob'}, 'groups': {'2002': 'neodc'}}, writer)
+
+        mtime = time.time() - age
+        os.utime(self.cache_file, (mtime, mtime))
+
+    def test_refresh(self):
+        ldap = self.load()
+
+        self.assertEqual(ldap.queries, 2)
+        self.assertEqual(ldap.users, {1001: 'alice'})
+
+        with open(self.cache_file) as reader:
+            self.assertEqual(json.load(reader), {'users': {'1001': 'alice'}, 'groups': {'2001': 'badc'}})
+
+        # The file is written under a temporary name and moved into place.
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['ldap_cache.json', 'ldap_cache.json.lock'])
+
+    def test_fresh_cache(self):
+        self.write_cache(age=60)
+        ldap = self.load()
+
+        self.assertEqual(ldap.queries, 0)
+        self.assertEqual(ldap.users, {1002: 'bob'})
+        self.assertEqual(ldap.groups, {2002: 'neodc'})
+
+    def test_expired_cache(self):
+        self.write_cache(age=7200)
+        ldap = self.load()
+
+        self.assertEqual(ldap.queries, 2)
+        self.assertEqual(ldap.users[1001], 'alice')
+        self.assertTrue(time.time() - os.path.getmtime(self.cache_file) < 60)
+
+    def test_stale_cache_when_ldap_unreachable(self):
+        self.write_cache(age=7200)
+        ldap = self.load(names=None)
+
+        self.assertEqual(ldap.queries, 1)
+        self.assertEqual(ldap.users, {1002: 'bob'})
+
+    def test_stale_cache_while_refreshing(self):
+        self.write_cache(age=7200)
+
+        # Another job holds the lock while it refreshes the file.
+        with open(self.cache_file + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            ldap = self.load()
+
+        self.assertEqual(ldap.queries, 0)
+        self.assertEqual(ldap.users, {1002: 'bob'})
+
+    def test_no_cache_when_ldap_unreachable(self):
+        ldap = self.load(names=None)
+
+        self.assertEqual(ldap.users, {})
+        self.assertFalse(os.path.exists(self.cache_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
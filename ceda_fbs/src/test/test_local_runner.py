@@ -0,0 +1,62 @@
+# encoding: utf-8
+"""
+Check tasks run by LocalRunner are logged, retried and their exit codes collected
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import os
+import shutil
+import tempfile
+import unittest
+from ceda_fbs.src.fbs.proc.common_util.util import LocalRunner
+
+
+class TestLocalRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.log_dir = os.path.join(self.tmp_dir, 'logs')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_exit_codes_and_logs(self):
+        runner = LocalRunner(workers=4, log_dir=self.log_dir)
+        exit_codes = runner.run_tasks(['echo task_{}; exit {}'.format(i, i % 3) for i in range(9)])
+
+        self.assertEqual(exit_codes, [i % 3 for i in range(9)])
+
+        run_log_dir = os.path.join(self.log_dir, os.listdir(self.log_dir)[0])
+        self.assertEqual(len(os.listdir(run_log_dir)), 9)
+
+        with open(os.path.join(run_log_dir, 'task_000004.log')) as reader:
+            self.assertIn('task_4', reader.read())
+
+    def test_run_log_dirs(self):
+        runner = LocalRunner(log_dir=self.log_dir)
+        runner.run_tasks(['echo first'])
+        runner.run_tasks(['echo second'])
+
+        # Each run keeps its own logs.
+        logs = []
+        for run_log_dir in sorted(os.listdir(self.log_dir)):
+            with open(os.path.join(self.log_dir, run_log_dir, 'task_000000.log')) as reader:
+                logs.append(reader.read().splitlines()[-1])
+
+        self.assertEqual(logs, ['first', 'second'])
+
+    def test_retries(self):
+        marker = os.path.join(self.tmp_dir, 'marker')
+        # Fails the first time, succeeds once the marker exists.
+        task = 'test -e {0} || (touch {0}; exit 1)'.format(marker)
+
+        self.assertEqual(LocalRunner(log_dir=self.log_dir).run_tasks([task]), [1])
+        os.remove(marker)
+        self.assertEqual(LocalRunner(retries=1, log_dir=self.log_dir).run_tasks([task]), [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# encoding: utf-8
+"""
+Check job arrays submitted by LotusRunner run every task, using the local fake sbatch
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import unittest
+from ceda_fbs.src.fbs.proc.common_util.util import LotusRunner
+from ceda_fbs.src.fbs.cmdline.fake_sbatch import parse_array
+
+FAKE_SBATCH = os.path.join(os.path.dirname(__file__), '..', 'fbs', 'cmdline', 'fake_sbatch.py')
+
+
+class TestLotusRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parse_array(self):
+        self.assertEqual(parse_array('0-4%2'), ([0, 1, 2, 3, 4], 2))
+        self.assertEqual(parse_array('1,3,5-6'), ([1, 3, 5, 6], None))
+
+    def test_all_tasks_run(self):
+        output = os.path.join(self.tmp_dir, 'out')
+        os.mkdir(output)
+        tasks = ['touch {}/task_{}'.format(output, i) for i in range(25)]
+
+        runner = LotusRunner(throttle=3, sbatch='{} {}'.format(sys.executable, FAKE_SBATCH), max_array_size=10)
+        runner.run_tasks_in_lotus(tasks)
+
+        self.assertEqual(sorted(os.listdir(output)), sorted('task_{}'.format(i) for i in range(25)))
+
+    def test_failed_submission(self):
+        output = os.path.join(self.tmp_dir, 'out')
+        os.mkdir(output)
+        commands_file = os.path.join(self.tmp_dir, 'commands.txt')
+        with open(commands_file, 'w') as writer:
+            writer.writelines('touch {}/task_{}\n'.format(output, i) for i in range(25))
+
+        # Accepts the first array and rejects the ones after it.
+        sbatch = os.path.join(self.tmp_dir, 'sbatch.sh')
+        with open(sbatch, 'w') as writer:
+            writer.write('#!/bin/bash\n'
+                         'echo "$@" >> {0}/submitted\n'
+                         '[ $(wc -l < {0}/submitted) -eq 1 ] || exit 1\n'
+                         'exec {1} {2} "$@"\n'.format(self.tmp_dir, sys.executable, FAKE_SBATCH))
+        os.chmod(sbatch, 0o755)
+
+        runner = LotusRunner(sbatch=sbatch, max_array_size=10)
+        with self.assertRaises(subprocess.CalledProcessError):
+            runner.run_tasks_file_in_lotus(commands_file)
+
+        with open(os.path.join(self.tmp_dir, 'submitted')) as reader:
+            self.assertEqual(len(reader.readlines()), 2)
+
+        self.assertEqual(len(os.listdir(output)), 10)
+        self.assertTrue(os.path.exists(commands_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+# encoding: utf-8
+"""
+Check the NetCDF handler finds the spatial and temporal extent without reading whole coordinates
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import netCDF4
+import numpy as np
+
+from ceda_fbs.src.fbs.proc.common_util.geojson import GeoJSONGenerator
+from ceda_fbs.src.fbs.proc.file_handlers import netcdf_file
+from ceda_fbs.src.fbs.proc.file_handlers.netcdf_file import NetCdfFile
+
+
+class TestNetCdfExtent(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.tmp_dir, 'test.nc')
+        self.handler = NetCdfFile(self.file_path, 3)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def add_coordinate(self, ncdf, name, standard_name, values, bounds=None):
+        ncdf.createDimension(name, len(values))
+        var = ncdf.createVariable(name, 'f8', (name,))
+        var.standard_name = standard_name
+        var[:] = values
+
+        if bounds is not None:
+            if 'bnds' not in ncdf.dimensions:
+                ncdf.createDimension('bnds', 2)
+            var.bounds = name + '_bnds'
+            ncdf.createVariable(name + '_bnds', 'f8', (name, 'bnds'))[:] = bounds
+
+    def get_envelope(self):
+        with netCDF4.Dataset(self.file_path) as ncdf:
+            geo_info = self.handler.get_geospatial(ncdf)
+
+        return GeoJSONGenerator(geo_info['lat'], geo_info['lon']).get_elasticsearch_geojson()['geometries']['search']
+
+    def test_coordinate_ends(self):
+        with netCDF4.Dataset(self.file_path, 'w') as ncdf:
+            self.add_coordinate(ncdf, 'lat', 'latitude', np.linspace(60, 50, 11))
+            self.add_coordinate(ncdf, 'lon', 'longitude', np.linspace(-10, 2, 13))
+
+        self.assertEqual(self.get_envelope()['coordinates'], [[-10.0, 60.0], [2.0, 50.0]])
+
+    def test_cell_bounds(self):
+        lats = np.arange(50.5, 60, 1.0)
+        with netCDF4.Dataset(self.file_path, 'w') as ncdf:
+            self.add_coordinate(ncdf, 'lat', 'latitude', lats, np.stack([lats - 0.5, lats + 0.5], axis=1))
+            self.add_coordinate(ncdf, 'lon', 'longitude', np.linspace(-10, 2, 13))
+
+        self.assertEqual(self.get_envelope()['coordinates'], [[-10.0, 60.0], [2.0, 50.0]])
+
+    def test_actual_range(self):
+        with netCDF4.Dataset(self.file_path, 'w') as ncdf:
+            self.add_coordinate(ncdf, 'lat', 'latitude', np.linspace(50, 60, 11))
+            self.add_coordinate(ncdf, 'lon', 'longitude', np.linspace(-10, 2, 13))
+            ncdf.variables['lat'].actual_range = [51.0, 59.0]
+
+        self.assertEqual(self.get_envelope()['coordinates'], [[-10.0, 59.0], [2.0, 51.0]])
+
+    def test_streamed_extent(self):
+        # Auxiliary coordinates crossing the antimeridian, read in small slabs.
+        netcdf_file.MAX_READ_SIZE, max_read_size = 7, netcdf_file.MAX_READ_SIZE
+
+        try:
+            with netCDF4.Dataset(self.file_path, 'w') as ncdf:
+                ncdf.createDimension('obs', 100)
+                lat = ncdf.createVariable('lat', 'f8', ('obs',), fill_value=-999.0)
+                lat.standard_name = 'latitude'
+                lat[:] = np.linspace(-20, 20, 100)
+                lat[5] = np.ma.masked
+                lon = ncdf.createVariable('lon', 'f8', ('obs',))
+                lon.standard_name = 'longitude'
+                lon[:] = np.linspace(170, 190, 100)
+
+            envelope = self.get_envelope()
+        finally:
+            netcdf_file.MAX_READ_SIZE = max_read_size
+
+        self.assertEqual(envelope['coordinates'], [[170.0, 20.0], [-170.0, -20.0]])
+
+    def write_curvilinear(self, lats, lons):
+        with netCDF4.Dataset(self.file_path, 'w') as ncdf:
+            ncdf.createDimension('y', lats.shape[0])
+            ncdf.createDimension('x', lats.shape[1])
+            for name, standard_name, values in [('lat', 'latitude', lats), ('lon', 'longitude', lons)]:
+                var = ncdf.createVariable(name, 'f8', ('y', 'x'))
+                var.standard_name = standard_name
+                var[:] = values
+
+    def test_curvilinear_edges(self):
+        lons, lats = np.meshgrid(np.linspace(170, 195, 30), np.linspace(-10, 10, 20))
+        # Interior values are never read, only the edges bound the grid.
+        lats[5:15, 5:25] = -80
+
+        self.write_curvilinear(lats, lons)
+
+        self.assertEqual(self.get_envelope()['coordinates'], [[170.0, 10.0], [-165.0, -10.0]])
+
+    def test_curvilinear_pole(self):
+        # Polar grid whose edge circles the north pole.
+        x, y = np.meshgrid(np.linspace(-1, 1, 21), np.linspace(-1, 1, 21))
+        lats = 90 - 30 * np.hypot(x, y)
+        lons = np.degrees(np.arctan2(y, x))
+
+        self.write_curvilinear(lats, lons)
+
+        self.assertEqual(self.get_envelope()['coordinates'], [[-180.0, 90.0], [180.0, round(lats.min(), 3)]])
+
+
+class TestNetCdfTemporal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.tmp_dir, 'test.nc')
+        self.handler = NetCdfFile(self.file_path, 3)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def get_temporal(self):
+        with netCDF4.Dataset(self.file_path) as ncdf:
+            temporal = self.handler.get_temporal(ncdf)
+
+        return temporal['start_time'], temporal['end_time']
+
+    def test_coordinate_ends(self):
+        with netCDF4.Dataset(self.file_path, 'w') as ncdf:
+            ncdf.createDimension('time', None)
+            time = ncdf.createVariable('time', 'f8', ('time',))
+            time.standard_name = 'time'
+            time.units = 'hours since 1980-01-01 00:00:00'
+            time[:] = np.arange(24 * (366 + 365 * 3))
+
+        self.assertEqual(self.get_temporal(), ('1980-01-01T00:00:00', '1983-12-31T23:00:00'))
+
+    def test_bounds_and_calendar(self):
+        with netCDF4.Dataset(self.file_path, 'w') as ncdf:
+            ncdf.createDimension('time', 12)
+            ncdf.createDimension('bnds', 2)
+            time = ncdf.createVariable('time', 'f8', ('time',))
+            time.standard_name = 'time'
+            time.units = 'days since 2000-01-01'
+            time.calendar = '360_day'
+            time.bounds = 'time_bnds'
+            time[:] = np.arange(12) * 30 + 15
+            ncdf.createVariable('time_bnds', 'f8', ('time', 'bnds'))[:] = \
+                np.stack([np.arange(12) * 30, np.arange(1, 13) * 30], axis=1)
+
+        self.assertEqual(self.get_temporal(), ('2000-01-01T00:00:00', '2001-01-01T00:00:00'))
+
+    def test_auxiliary_time(self):
+        with netCDF4.Dataset(self.file_path, 'w') as ncdf:
+            ncdf.createDimension('y', 4)
+            ncdf.createDimension('x', 5)
+            time = ncdf.createVariable('scan_time', 'f8', ('y', 'x'), fill_value=-1.0)
+            time.standard_name = 'time'
+            time.units = 'seconds since 2020-06-01'
+            time[:] = np.arange(20)[::-1].reshape(4, 5) * 60
+            time[0, 0] = np.ma.masked
+
+        self.assertEqual(self.get_temporal(), ('2020-06-01T00:00:00', '2020-06-01T00:18:00'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+# encoding: utf-8
+"""
+Check the compact path container behaves like a list of paths
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import unittest
+from ceda_fbs.src.fbs.proc.common_util.path_store import PathStore
+
+
+class TestPathStore(unittest.TestCase):
+    PATHS = ['/badc/dataset/data/{:03d}/file_{}.nc'.format(i % 13, i) for i in range(1000)] + \
+            ['/neodc/café/file.nc', 'relative_file.txt']
+
+    def setUp(self):
+        self.store = PathStore(self.PATHS)
+
+    def test_list_behaviour(self):
+        self.assertEqual(len(self.store), len(self.PATHS))
+        self.assertEqual(list(self.store), self.PATHS)
+        self.assertEqual(self.store[0], self.PATHS[0])
+        self.assertEqual(self.store[-1], self.PATHS[-1])
+        self.assertEqual(len(self.store.directories), 15)
+
+        with self.assertRaises(IndexError):
+            self.store[len(self.PATHS)]
+
+    def test_slicing(self):
+        sliced = self.store[10:500:3]
+
+        self.assertIsInstance(sliced, PathStore)
+        self.assertEqual(list(sliced), self.PATHS[10:500:3])
+
+    def test_membership_and_difference(self):
+        self.assertIn('/neodc/café/file.nc', self.store)
+        self.assertNotIn('/badc/dataset/data/000/missing.nc', self.store)
+
+        other = PathStore(self.PATHS[::2])
+        self.assertEqual(list(self.store - other), self.PATHS[1::2])
+        self.assertEqual(list(self.store.difference(set(self.PATHS[1:]))), self.PATHS[:1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# encoding: utf-8
+"""
+Check the handler sandbox replaces workers which hang or crash and keeps the results in order
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from ceda_fbs.src.fbs.proc import sandbox
+
+
+def process_item(action, value):
+    """
+    Run in the workers: return, raise, hang or crash depending on the action.
+    """
+    if action == 'hang':
+        time.sleep(60)
+    elif action == 'crash':
+        os._exit(1)
+    elif action == 'raise':
+        raise ValueError(value)
+
+    return value * 2, os.getpid()
+
+
+class TestHandlerSandbox(unittest.TestCase):
+
+    def run_items(self, actions, workers=2, timeout=2):
+        handler_sandbox = sandbox.HandlerSandbox(process_item, workers=workers, timeout=timeout)
+        items = [(i, (action, i)) for i, action in enumerate(actions)]
+
+        return list(handler_sandbox.map(items))
+
+    def test_results_in_order(self):
+        results = self.run_items(['ok'] * 20, workers=3)
+
+        self.assertEqual([key for key, _, _ in results], list(range(20)))
+        self.assertEqual([result[0] for _, _, result in results], [i * 2 for i in range(20)])
+        self.assertTrue(all(status == sandbox.OK for _, status, _ in results))
+
+    def test_error(self):
+        results = self.run_items(['ok', 'raise', 'ok'])
+
+        self.assertEqual([status for _, status, _ in results], [sandbox.OK, sandbox.ERROR, sandbox.OK])
+        self.assertIn('ValueError', results[1][2])
+
+    def test_timeout(self):
+        start = time.monotonic()
+        results = self.run_items(['ok', 'hang', 'ok', 'ok'], timeout=1)
+
+        self.assertEqual([status for _, status, _ in results],
+                         [sandbox.OK, sandbox.TIMEOUT, sandbox.OK, sandbox.OK])
+        self.assertIsNone(results[1][2])
+        self.assertLess(time.monotonic() - start, 30)
+
+    def test_crash_replaces_worker(self):
+        results = self.run_items(['ok', 'crash', 'ok', 'crash', 'ok', 'ok'], workers=1)
+
+        self.assertEqual([status for _, status, _ in results],
+                         [sandbox.OK, sandbox.CRASHED, sandbox.OK, sandbox.CRASHED, sandbox.OK, sandbox.OK])
+
+        # Each crash costs the worker, the items after it are run by its replacement.
+        pids = [result[1] for _, status, result in results if status == sandbox.OK]
+        self.assertEqual(len(set(pids)), 3)
+
+    def test_workers_not_forked(self):
+        self.assertIn(sandbox.HandlerSandbox(process_item).context.get_start_method(), ('forkserver', 'spawn'))
+
+
+class TestQuarantineList(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'quarantine.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_shared_between_runs(self):
+        quarantine = sandbox.QuarantineList(self.path)
+        self.assertNotIn('/badc/file.nc', quarantine)
+
+        quarantine.add('/badc/file.nc', sandbox.TIMEOUT)
+        quarantine.add('/badc/other file.nc', sandbox.CRASHED)
+        self.assertIn('/badc/file.nc', quarantine)
+
+        later_run = sandbox.QuarantineList(self.path)
+        self.assertEqual(later_run.files, {'/badc/file.nc', '/badc/other file.nc'})
+
+        with open(self.path) as reader:
+            self.assertEqual(reader.readline(), '/badc/file.nc\ttimeout\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
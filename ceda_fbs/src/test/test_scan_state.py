@@ -0,0 +1,73 @@
+# encoding: utf-8
+"""
+Check the scan state store only reports files as unchanged when their record matches
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import os
+import shutil
+import tempfile
+import unittest
+from ceda_fbs.src.fbs.proc.common_util.scan_state import ScanStateStore
+
+
+class TestScanStateStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.data_file = os.path.join(self.tmp_dir, 'data.nc')
+        self.state_file = os.path.join(self.tmp_dir, 'state.db')
+
+        with open(self.data_file, 'w') as writer:
+            writer.write('data')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def record(self, level=2, handler='NetCdfFile'):
+        with ScanStateStore(self.state_file) as store:
+            store.update([ScanStateStore.make_record(self.data_file, os.stat(self.data_file), level, handler)])
+
+    def is_unchanged(self, level=2, handler='NetCdfFile'):
+        with ScanStateStore(self.state_file) as store:
+            return store.is_unchanged(self.data_file, os.stat(self.data_file), level, handler)
+
+    def test_unknown_file(self):
+        self.assertFalse(self.is_unchanged())
+
+    def test_recorded_file(self):
+        self.record()
+
+        self.assertTrue(self.is_unchanged())
+        self.assertTrue(self.is_unchanged(level=1))
+
+    def test_higher_level(self):
+        self.record(level=1)
+
+        self.assertFalse(self.is_unchanged(level=2))
+
+    def test_other_handler(self):
+        self.record()
+
+        self.assertFalse(self.is_unchanged(handler='GenericFile'))
+
+    def test_modified_file(self):
+        self.record()
+
+        with open(self.data_file, 'a') as writer:
+            writer.write('more data')
+
+        self.assertFalse(self.is_unchanged())
+
+    def test_record_replaced(self):
+        self.record(level=1)
+        self.record(level=3)
+
+        self.assertTrue(self.is_unchanged(level=3))
+
+
+if __name__ == '__main__':
+    unittest.main()
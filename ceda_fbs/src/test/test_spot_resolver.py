@@ -0,0 +1,52 @@
+# encoding: utf-8
+"""
+Check that the compiled spot resolver agrees with SpotMapping.get_spot
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import unittest
+from ceda_fbs.src.fbs.proc.common_util.spot_mapping import SpotMapping, SpotResolver
+
+
+class TestSpotResolver(unittest.TestCase):
+    PATH2SPOT = {
+        '/badc/accacia': 'spot-1400-accacia',
+        '/badc/accacia/data/extra': 'spot-1401-accacia-extra',
+        '/badc/abacus': 'abacus',
+        '/neodc/sentinel1a': 'spot-9999-sentinel1a',
+    }
+
+    PATHS = [
+        '/badc/accacia/data/file.nc',
+        '/badc/accacia/data/extra/file.nc',
+        '/badc/accacia/data/extra',
+        '/badc/accacia',
+        '/badc/accacia-other/file.nc',
+        '/badc/abacus/file.nc',
+        '/badc/file.nc',
+        '/neodc/sentinel1a/data/2020/01/01/S1A.zip',
+        '/',
+    ]
+
+    def setUp(self):
+        self.mapping = SpotMapping(test=True)
+        self.mapping.path2spotmapping = dict(self.PATH2SPOT)
+        self.resolver = SpotResolver(self.PATH2SPOT)
+
+    def test_matches_spot_mapping(self):
+        for path in self.PATHS:
+            with self.subTest(path=path):
+                self.assertEqual(self.resolver.get_spot(path), self.mapping.get_spot(path))
+
+    def test_directory_memo(self):
+        self.resolver.get_spot('/badc/abacus/a.nc')
+        self.resolver.get_spot('/badc/abacus/b.nc')
+
+        self.assertEqual(self.resolver.get_directory_spot.cache_info().hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# encoding: utf-8
+"""
+Check the shared spot snapshot is rebuilt when stale and agrees with SpotResolver
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import os
+import shutil
+import tempfile
+import unittest
+from ceda_fbs.src.fbs.proc.common_util.spot_mapping import SpotResolver
+from ceda_fbs.src.fbs.proc.common_util.spot_snapshot import SpotSnapshot, load_spot_snapshot
+
+
+class TestSpotSnapshot(unittest.TestCase):
+    PATH2SPOT = {
+        '/badc/accacia': 'spot-1400-accacia',
+        '/badc/accacia/data/extra': 'spot-1401-accacia-extra',
+        '/badc/abacus': 'abacus',
+        '/neodc/café': 'spot-2000-café',
+    }
+
+    PATHS = [
+        '/badc/accacia/data/file.nc',
+        '/badc/accacia/data/extra/file.nc',
+        '/badc/accacia',
+        '/badc/accacia-other/file.nc',
+        '/badc/abacus/file.nc',
+        '/badc/file.nc',
+        '/neodc/café/données.nc',
+        '/',
+    ]
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.spot_file = os.path.join(self.tmp_dir, 'ceda_all_datasets.ini')
+        self.snapshot_file = os.path.join(self.tmp_dir, 'spots.snapshot')
+        self.write_spot_file(self.PATH2SPOT)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_spot_file(self, path2spot):
+        with open(self.spot_file, 'w') as writer:
+            for path, spot in path2spot.items():
+                writer.write('{}={}\n'.format(spot, path))
+
+    def test_lookups(self):
+        snapshot = load_spot_snapshot(self.snapshot_file, self.spot_file)
+        resolver = SpotResolver(self.PATH2SPOT)
+
+        self.assertIsInstance(snapshot, SpotSnapshot)
+        self.assertEqual(len(snapshot), len(self.PATH2SPOT))
+        self.assertEqual(dict(snapshot.items()), self.PATH2SPOT)
+
+        for path in self.PATHS:
+            self.assertEqual(snapshot.get_spot(path), resolver.get_spot(path), path)
+
+    def test_stale_snapshot_rebuilt(self):
+        load_spot_snapshot(self.snapshot_file, self.spot_file)
+
+        path2spot = dict(self.PATH2SPOT, **{'/badc/new-dataset': 'spot-3000-new-dataset'})
+        self.write_spot_file(path2spot)
+
+        self.assertTrue(SpotSnapshot(self.snapshot_file).is_stale(self.spot_file))
+
+        snapshot = load_spot_snapshot(self.snapshot_file, self.spot_file)
+        self.assertFalse(snapshot.is_stale(self.spot_file))
+        self.assertEqual(snapshot.get_spot('/badc/new-dataset/file.nc'), 'spot-3000-new-dataset')
+
+    def test_snapshot_not_writable(self):
+        snapshot_file = os.path.join(self.tmp_dir, 'missing', 'spots.snapshot')
+
+        resolver = load_spot_snapshot(snapshot_file, self.spot_file)
+
+        self.assertEqual(type(resolver).__name__, 'SpotResolver')
+        self.assertEqual(resolver.get_spot('/badc/accacia/data/file.nc'), 'spot-1400-accacia')
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['ceda_all_datasets.ini'])
+
+    def test_not_a_snapshot(self):
+        with open(self.snapshot_file, 'w') as writer:
+            writer.write('not a snapshot' * 10)
+
+        snapshot = load_spot_snapshot(self.snapshot_file, self.spot_file)
+        self.assertEqual(snapshot.get_spot('/badc/abacus/file.nc'), 'abacus')
+
+
+if __name__ == '__main__':
+    unittest.main()
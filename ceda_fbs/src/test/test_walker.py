@@ -0,0 +1,143 @@
+# encoding: utf-8
+"""
+Check the threaded directory walker finds the same files as os.walk
+"""
+__date__ = '18 Oct 2026'
+__copyright__ = 'Copyright 2018 United Kingdom Research and Innovation'
+__license__ = 'BSD - see LICENSE file in top-level package directory'
+__contact__ = 'richard.d.smith@stfc.ac.uk'
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from ceda_fbs.src.fbs.proc.common_util import walker
+from ceda_fbs.src.fbs.proc.common_util.walker import walk_files
+
+
+class TestWalker(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.files = []
+
+        for i in range(5):
+            for j in range(4):
+                directory = os.path.join(self.tmp_dir, 'dir_{}'.format(i), 'sub_{}'.format(j))
+                os.makedirs(directory)
+
+                for k in range(6):
+                    self.files.append(self.touch(os.path.join(directory, 'file_{}.nc'.format(5 - k))))
+
+        self.files.append(self.touch(os.path.join(self.tmp_dir, 'top.nc')))
+
+        self.hidden = [
+            self.touch(os.path.join(self.tmp_dir, '.hidden.nc')),
+            self.touch(os.path.join(self.tmp_dir, 'dir_0', '.hidden_dir', 'file.nc'))
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @staticmethod
+    def touch(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as writer:
+            writer.write('data')
+        return path
+
+    def walk(self, *args, **kwargs):
+        """
+        Walk in another thread, so a walker which never finishes fails the test.
+        """
+        result = {}
+
+        def run():
+            try:
+                result['files'] = list(walk_files(self.tmp_dir, *args, **kwargs))
+            except Exception as ex:
+                result['error'] = ex
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(30)
+        self.assertFalse(thread.is_alive(), 'The walk did not finish')
+
+        if 'error' in result:
+            raise result['error']
+
+        return result['files']
+
+    def test_all_files(self):
+        for threads in (1, 8):
+            files = self.walk(threads=threads)
+
+            self.assertEqual(len(files), len(self.files))
+            self.assertEqual(set(files), set(self.files))
+
+    def test_order(self):
+        files = self.walk(threads=8)
+
+        # The files of each directory are returned together, sorted.
+        directories = [os.path.dirname(file) for file in files]
+        runs = [directory for i, directory in enumerate(directories) if i == 0 or directory != directories[i - 1]]
+        self.assertEqual(len(runs), len(set(runs)))
+
+        for directory in runs:
+            names = [file for file in files if os.path.dirname(file) == directory]
+            self.assertEqual(names, sorted(names))
+
+    def test_hidden_files(self):
+        self.assertFalse(set(self.hidden) & set(self.walk()))
+        self.assertEqual(set(self.walk(include_hidden=True)), set(self.files + self.hidden))
+
+    def test_follow_links(self):
+        os.symlink(os.path.join(self.tmp_dir, 'dir_1', 'sub_1'), os.path.join(self.tmp_dir, 'dir_2', 'link'))
+        os.symlink(self.files[0], os.path.join(self.tmp_dir, 'link.nc'))
+
+        self.assertEqual(set(self.walk()), set(self.files))
+
+        # Each directory is walked once, whichever way it is reached.
+        files = self.walk(follow_links=True)
+        self.assertEqual(len(files), len(self.files))
+        self.assertEqual(set(os.path.realpath(file) for file in files), set(self.files))
+
+    def test_symlink_loop(self):
+        os.symlink(self.tmp_dir, os.path.join(self.tmp_dir, 'dir_3', 'sub_3', 'loop'))
+        os.symlink(os.path.join(self.tmp_dir, 'dir_4'), os.path.join(self.tmp_dir, 'dir_4', 'sub_0', 'parent'))
+
+        files = self.walk(follow_links=True)
+        self.assertEqual(sorted(files), sorted(self.files))
+
+    def test_unreadable_directory(self):
+        unreadable = os.path.join(self.tmp_dir, 'dir_1')
+        scandir = os.scandir
+
+        def fake_scandir(path):
+            if path == unreadable:
+                raise PermissionError(13, 'Permission denied', path)
+            return scandir(path)
+
+        with mock.patch.object(walker.os, 'scandir', fake_scandir):
+            files = self.walk(threads=4)
+
+        self.assertEqual(set(files), set(file for file in self.files if not file.startswith(unreadable + os.sep)))
+
+    def test_unexpected_error(self):
+        failing = os.path.join(self.tmp_dir, 'dir_2', 'sub_2')
+        scandir = os.scandir
+
+        def fake_scandir(path):
+            if path == failing:
+                raise UnicodeEncodeError('utf-8', 'name', 0, 1, 'surrogates not allowed')
+            return scandir(path)
+
+        with mock.patch.object(walker.os, 'scandir', fake_scandir):
+            with self.assertRaises(UnicodeEncodeError):
+                self.walk(threads=4)
+
+
+if __name__ == '__main__':
+    unittest.main()